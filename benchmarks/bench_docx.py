@@ -0,0 +1,71 @@
+"""Сравнение потокового парсера DOCX с реализацией на python-docx.
+
+Запуск из корня репозитория::
+
+    python benchmarks/bench_docx.py --paragraphs 20000 --tables 200
+
+Скрипт создаёт во временном каталоге документ с заданным числом абзацев и
+таблиц и для каждого парсера печатает время разбора, пик выделенной памяти
+(tracemalloc) и объём извлечённого текста. tracemalloc не видит память,
+выделенную lxml внутри python-docx, поэтому для неё пик занижен.
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Iterable
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from docx import Document  # noqa: E402
+
+from file_utils import iter_text_docx, iter_text_docx_python  # noqa: E402
+
+
+def build_document(path: Path, paragraphs: int, tables: int) -> None:
+    doc = Document()
+    doc.sections[0].header.paragraphs[0].text = "Header"
+    per_table = max(1, paragraphs // max(1, tables))
+    for idx in range(paragraphs):
+        doc.add_paragraph(f"Paragraph {idx}: lorem ipsum dolor sit amet, consectetur adipiscing elit.")
+        if tables and idx % per_table == 0:
+            table = doc.add_table(rows=5, cols=4)
+            for row in table.rows:
+                for cell in row.cells:
+                    cell.text = f"cell {idx}"
+    doc.save(path)
+
+
+def measure(name: str, parse: Callable[[Path], Iterable[str]], path: Path) -> None:
+    tracemalloc.start()
+    started = time.perf_counter()
+    chars = sum(len(chunk) for chunk in parse(path))
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:<12} {elapsed:8.3f} s  peak {peak / 1024 / 1024:8.1f} MiB  {chars:>10} chars")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--paragraphs", type=int, default=20000)
+    parser.add_argument("--tables", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "bench.docx"
+        build_document(path, args.paragraphs, args.tables)
+        print(f"{path.stat().st_size / 1024:.0f} KiB, {args.paragraphs} paragraphs, {args.tables} tables")
+        for _ in range(args.repeat):
+            measure("stream", iter_text_docx, path)
+            measure("python-docx", iter_text_docx_python, path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Сравнение потоковой сборки PDF с прежней реализацией merge_images_to_pdf.
+
+Запуск из корня репозитория::
+
+    python benchmarks/bench_merge_pdf.py --images 40 --width 4000 --height 3000
+
+Скрипт создаёт во временном каталоге серию JPEG-«фотографий» и собирает из
+них PDF двумя способами: прежним (все изображения декодируются, дополняются
+до общего размера и сохраняются через Pillow) и :func:`file_utils.merge_images_to_pdf`.
+Каждый способ запускается в отдельном процессе, для него печатаются время,
+пиковый RSS процесса и размер PDF. tracemalloc здесь не подходит: память
+изображений Pillow выделяет в обход аллокатора Python.
+"""
+
+from __future__ import annotations
+
+import argparse
+import multiprocessing
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from PIL import Image, ImageDraw, ImageOps  # noqa: E402
+
+
+def legacy_merge(paths: List[Path], out: Path) -> None:
+    images = []
+    max_w = max_h = 0
+    for path in paths:
+        with Image.open(path) as img:
+            if img.mode != "RGB":
+                img = img.convert("RGB")
+            img.load()
+            max_w = max(max_w, img.width)
+            max_h = max(max_h, img.height)
+            images.append(img)
+    normalized = [
+        ImageOps.pad(img, (max_w, max_h), color=(255, 255, 255)) if img.size != (max_w, max_h) else img
+        for img in images
+    ]
+    first, *rest = normalized
+    first.save(out, save_all=True, append_images=rest, format="PDF")
+
+
+def streaming_merge(paths: List[Path], out: Path) -> None:
+    from file_utils import merge_images_to_pdf
+
+    merge_images_to_pdf(paths).replace(out)
+
+
+def _measure(name: str, paths: List[Path], out: Path, queue) -> None:
+    func = legacy_merge if name == "legacy" else streaming_merge
+    started = time.perf_counter()
+    func(paths, out)
+    elapsed = time.perf_counter() - started
+    # ru_maxrss в Linux — килобайты
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    queue.put((elapsed, peak, out.stat().st_size))
+
+
+def build_images(base: Path, count: int, width: int, height: int) -> List[Path]:
+    paths = []
+    for idx in range(count):
+        # Половина снимков — портретные, чтобы прежняя реализация дополняла их
+        size = (width, height) if idx % 2 else (height, width)
+        img = Image.effect_noise(size, 40).convert("RGB")
+        ImageDraw.Draw(img).text((20, 20), f"page {idx}", fill=(0, 0, 0))
+        path = base / f"{idx:03d}.jpg"
+        img.save(path, quality=85)
+        paths.append(path)
+    return paths
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--images", type=int, default=40)
+    parser.add_argument("--width", type=int, default=4000)
+    parser.add_argument("--height", type=int, default=3000)
+    args = parser.parse_args()
+
+    ctx = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as tmp:
+        base = Path(tmp)
+        paths = build_images(base, args.images, args.width, args.height)
+        print(f"{args.images} JPEG images {args.width}x{args.height}")
+        for name in ("legacy", "streaming"):
+            queue = ctx.Queue()
+            proc = ctx.Process(target=_measure, args=(name, paths, base / f"{name}.pdf", queue))
+            proc.start()
+            elapsed, peak, size = queue.get()
+            proc.join()
+            print(
+                f"{name:<10} {elapsed:8.2f} s  peak RSS {peak / 1024 / 1024:8.1f} MiB  "
+                f"PDF {size / 1024 / 1024:8.1f} MiB"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""Сравнение предобработки ocr_pipeline с прежней реализацией по стадиям.
+
+Запуск из корня репозитория::
+
+    python benchmarks/bench_ocr_pipeline.py --dpi 600
+
+Скрипт рисует страницу A4 с повёрнутыми строками текста, сохраняет её в PNG с
+указанным разрешением и прогоняет полную предобработку двумя способами:
+прежними функциями (цветное изображение, DPI всегда считается равным 72,
+угол наклона по всем пикселям текста в полном разрешении) и :class:`ocr_pipeline.Preprocessor`. Для каждой
+стадии печатается время и пик выделенной памяти (tracemalloc видит буферы
+NumPy, в том числе созданные OpenCV).
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+import cv2
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+import ocr_pipeline  # noqa: E402
+
+
+# ---------- Прежняя реализация стадий ----------
+
+def legacy_resize_to_dpi(image: np.ndarray, dpi: int = 300) -> np.ndarray:
+    pil_img = Image.fromarray(image)
+    orig_dpi = pil_img.info.get("dpi", (72, 72))[0] or 72
+    scale = dpi / orig_dpi
+    if scale == 1:
+        return image
+    new_size = (int(pil_img.width * scale), int(pil_img.height * scale))
+    return cv2.resize(image, new_size, interpolation=cv2.INTER_CUBIC)
+
+
+def legacy_deskew(image: np.ndarray) -> np.ndarray:
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)[1]
+    coords = np.column_stack(np.where(thresh > 0))
+    if coords.size == 0:
+        return image
+    angle = cv2.minAreaRect(coords)[-1]
+    if angle > 45:
+        angle -= 90
+    angle = -(90 + angle) if angle < -45 else -angle
+    h, w = image.shape[:2]
+    m = cv2.getRotationMatrix2D((w // 2, h // 2), angle, 1.0)
+    return cv2.warpAffine(image, m, (w, h), flags=cv2.INTER_CUBIC, borderMode=cv2.BORDER_REPLICATE)
+
+
+def legacy_binarize(image: np.ndarray) -> np.ndarray:
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    return cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
+
+
+def legacy_pipeline(dpi: int) -> List[Tuple[str, Callable[[np.ndarray], np.ndarray]]]:
+    return [
+        ("resized", lambda img: legacy_resize_to_dpi(img, dpi)),
+        ("contrast", lambda img: cv2.convertScaleAbs(img, alpha=1.5, beta=0.0)),
+        ("denoised", lambda img: cv2.medianBlur(img, 3)),
+        ("deskewed", legacy_deskew),
+        ("cropped", ocr_pipeline.crop_margins),
+        ("binarized", legacy_binarize),
+    ]
+
+
+# ---------- Измерения ----------
+
+class StageMeter:
+    """Время и пик памяти между соседними вызовами :meth:`mark`."""
+
+    def __init__(self) -> None:
+        self.rows: Dict[str, Tuple[float, int]] = {}
+        self._started = 0.0
+
+    def start(self) -> None:
+        tracemalloc.start()
+        self._started = time.perf_counter()
+
+    def mark(self, stage: str, image: np.ndarray) -> None:
+        elapsed = time.perf_counter() - self._started
+        _, peak = tracemalloc.get_traced_memory()
+        self.rows[stage] = (elapsed, peak)
+        tracemalloc.reset_peak()
+        self._started = time.perf_counter()
+
+    def stop(self) -> None:
+        tracemalloc.stop()
+
+
+def run_legacy(path: Path, dpi: int) -> Tuple[StageMeter, Tuple[int, ...]]:
+    meter = StageMeter()
+    meter.start()
+    image = cv2.imread(str(path))
+    meter.mark("original", image)
+    for name, stage in legacy_pipeline(dpi):
+        image = stage(image)
+        meter.mark(name, image)
+    meter.stop()
+    return meter, image.shape
+
+
+def run_fused(path: Path, dpi: int, preprocessor: ocr_pipeline.Preprocessor) -> Tuple[StageMeter, Tuple[int, ...]]:
+    meter = StageMeter()
+    meter.start()
+    image = cv2.imread(str(path), cv2.IMREAD_GRAYSCALE)
+    source_dpi = ocr_pipeline.page_dpi(image, ocr_pipeline.read_dpi(path))
+    result = preprocessor.run(image, dpi=dpi, source_dpi=source_dpi, on_stage=meter.mark)
+    meter.stop()
+    return meter, result.shape
+
+
+def build_page(path: Path, dpi: int, skew: float) -> None:
+    width, height = int(8.27 * dpi), int(11.69 * dpi)
+    page = np.full((height, width, 3), 250, dtype=np.uint8)
+    scale = dpi / 150
+    line = int(40 * scale)
+    for idx, y in enumerate(range(line * 3, height - line * 3, line)):
+        text = f"{idx:03d} Lorem ipsum dolor sit amet, consectetur adipiscing elit"
+        cv2.putText(page, text, (line * 2, y), cv2.FONT_HERSHEY_SIMPLEX, scale, (30, 30, 30), max(1, int(scale * 2)))
+    m = cv2.getRotationMatrix2D((width // 2, height // 2), skew, 1.0)
+    page = cv2.warpAffine(page, m, (width, height), borderValue=(250, 250, 250))
+    Image.fromarray(page).save(path, dpi=(dpi, dpi))
+
+
+def report(title: str, meter: StageMeter, shape: Tuple[int, ...]) -> None:
+    total = sum(elapsed for elapsed, _ in meter.rows.values())
+    peak = max(peak for _, peak in meter.rows.values())
+    print(f"{title}: {total:.3f} s, peak {peak / 1024 / 1024:.1f} MiB, result {shape}")
+    for stage, (elapsed, stage_peak) in meter.rows.items():
+        print(f"  {stage:<10} {elapsed:8.3f} s  peak {stage_peak / 1024 / 1024:8.1f} MiB")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dpi", type=int, default=600, help="Resolution of the generated page")
+    parser.add_argument("--target-dpi", type=int, default=300, help="DPI passed to the pipeline")
+    parser.add_argument("--skew", type=float, default=3.0, help="Skew of the text lines, degrees")
+    parser.add_argument("--repeat", type=int, default=2)
+    args = parser.parse_args()
+
+    preprocessor = ocr_pipeline.Preprocessor()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "page.png"
+        build_page(path, args.dpi, args.skew)
+        print(f"A4 page at {args.dpi} dpi, target {args.target_dpi} dpi")
+        for _ in range(args.repeat):
+            report("legacy", *run_legacy(path, args.target_dpi))
+            report("fused", *run_fused(path, args.target_dpi, preprocessor))
+
+
+if __name__ == "__main__":
+    main()
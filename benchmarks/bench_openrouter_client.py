@@ -0,0 +1,118 @@
+"""Сравнение общего пула соединений OpenRouter с клиентом на каждый запрос.
+
+Запуск из корня репозитория::
+
+    python benchmarks/bench_openrouter_client.py --requests 200
+    python benchmarks/bench_openrouter_client.py --certfile cert.pem --keyfile key.pem
+
+Скрипт поднимает локальную заглушку ``/chat/completions`` (HTTP/1.1 с
+keep-alive, с ``--certfile``/``--keyfile`` — по TLS) и отправляет в неё
+последовательные запросы через :func:`services.openrouter.chat` двумя
+способами: без открытого пула (новый клиент и новое соединение на каждый
+вызов, как раньше) и внутри :func:`services.openrouter.client_session`.
+Печатаются медиана, p95 и число установленных соединений.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import ssl
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from services import openrouter  # noqa: E402
+
+_REPLY = json.dumps(
+    {"choices": [{"message": {"content": "ok"}}], "usage": {"total_tokens": 1}}
+).encode()
+
+
+class StandIn(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    connections = 0
+
+    def setup(self) -> None:
+        super().setup()
+        StandIn.connections += 1
+
+    def do_POST(self) -> None:  # noqa: N802 - имя задано http.server
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(_REPLY)))
+        self.end_headers()
+        self.wfile.write(_REPLY)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+def start_server(certfile: Optional[str], keyfile: Optional[str]) -> tuple[ThreadingHTTPServer, str]:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandIn)
+    scheme = "http"
+    if certfile:
+        ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        ctx.load_cert_chain(certfile, keyfile)
+        server.socket = ctx.wrap_socket(server.socket, server_side=True)
+        scheme = "https"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"{scheme}://127.0.0.1:{server.server_port}/api/v1"
+
+
+async def run(base_url: str, count: int, pooled: bool) -> List[float]:
+    messages = [{"role": "user", "content": "hi"}]
+    timings = []
+
+    async def once() -> None:
+        started = time.perf_counter()
+        await openrouter.chat(messages, api_key="bench", base_url=base_url)
+        timings.append(time.perf_counter() - started)
+
+    if pooled:
+        async with openrouter.client_session():
+            for _ in range(count):
+                await once()
+    else:
+        for _ in range(count):
+            await once()
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--certfile")
+    parser.add_argument("--keyfile")
+    args = parser.parse_args()
+
+    # Заглушка отвечает только по HTTP/1.1; самоподписанный сертификат не проверяется
+    openrouter.config.openrouter_http2 = False
+    if args.certfile:
+        create = openrouter.create_client
+        openrouter.create_client = lambda **kw: create(verify=False, **kw)
+
+    server, base_url = start_server(args.certfile, args.keyfile)
+    try:
+        for name, pooled in (("per-call", False), ("pooled", True)):
+            StandIn.connections = 0
+            timings = asyncio.run(run(base_url, args.requests, pooled))
+            p95 = statistics.quantiles(timings, n=20)[-1]
+            print(
+                f"{name:<9} p50 {statistics.median(timings) * 1000:7.2f} ms  "
+                f"p95 {p95 * 1000:7.2f} ms  connections {StandIn.connections}"
+            )
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -14,6 +14,10 @@ class Config(BaseSettings):
     log_level: str = "INFO"
     tesseract_lang: str = "eng"
     tesseract_cmd: Optional[str] = None
+    tesseract_engine: str = "auto"
+    tesseract_lib: Optional[str] = None
+    tessdata_prefix: Optional[str] = None
+    ocr_detect_layout: bool = True
     output_dir: str = "Archive"
     general_folder_name: str = "Shared"
     openrouter_api_key: Optional[str] = None
@@ -21,8 +25,48 @@ class Config(BaseSettings):
     openrouter_model: Optional[str] = None
     openrouter_site_url: Optional[str] = None
     openrouter_site_name: Optional[str] = None
+    openrouter_http2: bool = True
+    openrouter_max_connections: int = 20
+    openrouter_max_keepalive: int = 10
+    openrouter_keepalive_expiry: float = 60.0
+    openrouter_connect_timeout: float = 10.0
+    openrouter_read_timeout: float = 60.0
+    openrouter_write_timeout: float = 30.0
+    openrouter_pool_timeout: float = 30.0
+    llm_cache_enabled: bool = True
+    llm_cache_path: Optional[str] = None
+    llm_cache_max_bytes: int = 64 * 1024 * 1024
+    llm_cache_ttl: Optional[float] = 30 * 24 * 3600
+    folder_context_top_k: int = 20
+    folder_context_max_tokens: int = 1500
+    llm_metadata_text_tokens: int = 3000
+    llm_chat_text_tokens: int = 6000
+    llm_translate_chunk_tokens: int = 1500
+    metadata_batch_size: int = 1
+    metadata_batch_max_tokens: int = 6000
+    metadata_batch_doc_tokens: int = 1000
     db_url: Optional[str] = None
     docrouter_reset_db: bool = Field(default=False, alias="DOCROUTER_RESET_DB")
+    extraction_workers: Optional[int] = None
+    extraction_max_tasks_per_child: Optional[int] = 50
+    extraction_timeout: Optional[float] = 300.0
+    pdf_ocr_dpi: int = 300
+    ocr_workers: Optional[int] = None
+    ocr_min_confidence: Optional[float] = None
+    blank_page_threshold: float = 1.0
+    extraction_cache_enabled: bool = True
+    extraction_cache_path: Optional[str] = None
+    extraction_cache_max_bytes: int = 512 * 1024 * 1024
+    extract_max_chars: Optional[int] = None
+    extract_max_pages: Optional[int] = None
+    extract_max_seconds: Optional[float] = None
+    extract_sample_rows: Optional[int] = None
+    upload_in_memory_max_bytes: int = 0
+    image_normalize: bool = False
+    image_target_dpi: int = 200
+    image_jpeg_quality: int = 80
+    image_keep_original: bool = False
+    searchable_pdf: bool = False
 
 
 # --------- Backward compatibility / convenient aliases ---------
@@ -31,6 +75,10 @@ config = Config()
 LOG_LEVEL = config.log_level
 TESSERACT_LANG = config.tesseract_lang
 TESSERACT_CMD = config.tesseract_cmd
+TESSERACT_ENGINE = config.tesseract_engine
+TESSERACT_LIB = config.tesseract_lib
+TESSDATA_PREFIX = config.tessdata_prefix
+OCR_DETECT_LAYOUT = config.ocr_detect_layout
 OUTPUT_DIR = config.output_dir
 GENERAL_FOLDER_NAME = config.general_folder_name
 OPENROUTER_API_KEY = config.openrouter_api_key
@@ -38,8 +86,48 @@ OPENROUTER_BASE_URL = config.openrouter_base_url
 OPENROUTER_MODEL = config.openrouter_model
 OPENROUTER_SITE_URL = config.openrouter_site_url
 OPENROUTER_SITE_NAME = config.openrouter_site_name
+OPENROUTER_HTTP2 = config.openrouter_http2
+OPENROUTER_MAX_CONNECTIONS = config.openrouter_max_connections
+OPENROUTER_MAX_KEEPALIVE = config.openrouter_max_keepalive
+OPENROUTER_KEEPALIVE_EXPIRY = config.openrouter_keepalive_expiry
+OPENROUTER_CONNECT_TIMEOUT = config.openrouter_connect_timeout
+OPENROUTER_READ_TIMEOUT = config.openrouter_read_timeout
+OPENROUTER_WRITE_TIMEOUT = config.openrouter_write_timeout
+OPENROUTER_POOL_TIMEOUT = config.openrouter_pool_timeout
+LLM_CACHE_ENABLED = config.llm_cache_enabled
+LLM_CACHE_PATH = config.llm_cache_path
+LLM_CACHE_MAX_BYTES = config.llm_cache_max_bytes
+LLM_CACHE_TTL = config.llm_cache_ttl
+FOLDER_CONTEXT_TOP_K = config.folder_context_top_k
+FOLDER_CONTEXT_MAX_TOKENS = config.folder_context_max_tokens
+LLM_METADATA_TEXT_TOKENS = config.llm_metadata_text_tokens
+LLM_CHAT_TEXT_TOKENS = config.llm_chat_text_tokens
+LLM_TRANSLATE_CHUNK_TOKENS = config.llm_translate_chunk_tokens
+METADATA_BATCH_SIZE = config.metadata_batch_size
+METADATA_BATCH_MAX_TOKENS = config.metadata_batch_max_tokens
+METADATA_BATCH_DOC_TOKENS = config.metadata_batch_doc_tokens
 DB_URL = config.db_url
 DOCROUTER_RESET_DB = config.docrouter_reset_db
+EXTRACTION_WORKERS = config.extraction_workers
+EXTRACTION_MAX_TASKS_PER_CHILD = config.extraction_max_tasks_per_child
+EXTRACTION_TIMEOUT = config.extraction_timeout
+PDF_OCR_DPI = config.pdf_ocr_dpi
+OCR_WORKERS = config.ocr_workers
+OCR_MIN_CONFIDENCE = config.ocr_min_confidence
+BLANK_PAGE_THRESHOLD = config.blank_page_threshold
+EXTRACTION_CACHE_ENABLED = config.extraction_cache_enabled
+EXTRACTION_CACHE_PATH = config.extraction_cache_path
+EXTRACTION_CACHE_MAX_BYTES = config.extraction_cache_max_bytes
+EXTRACT_MAX_CHARS = config.extract_max_chars
+EXTRACT_MAX_PAGES = config.extract_max_pages
+EXTRACT_MAX_SECONDS = config.extract_max_seconds
+EXTRACT_SAMPLE_ROWS = config.extract_sample_rows
+UPLOAD_IN_MEMORY_MAX_BYTES = config.upload_in_memory_max_bytes
+IMAGE_NORMALIZE = config.image_normalize
+IMAGE_TARGET_DPI = config.image_target_dpi
+IMAGE_JPEG_QUALITY = config.image_jpeg_quality
+IMAGE_KEEP_ORIGINAL = config.image_keep_original
+SEARCHABLE_PDF = config.searchable_pdf
 
 __all__ = [
     "Config",
@@ -47,6 +135,10 @@ __all__ = [
     "LOG_LEVEL",
     "TESSERACT_LANG",
     "TESSERACT_CMD",
+    "TESSERACT_ENGINE",
+    "TESSERACT_LIB",
+    "TESSDATA_PREFIX",
+    "OCR_DETECT_LAYOUT",
     "OUTPUT_DIR",
     "GENERAL_FOLDER_NAME",
     "OPENROUTER_API_KEY",
@@ -54,6 +146,46 @@ __all__ = [
     "OPENROUTER_MODEL",
     "OPENROUTER_SITE_URL",
     "OPENROUTER_SITE_NAME",
+    "OPENROUTER_HTTP2",
+    "OPENROUTER_MAX_CONNECTIONS",
+    "OPENROUTER_MAX_KEEPALIVE",
+    "OPENROUTER_KEEPALIVE_EXPIRY",
+    "OPENROUTER_CONNECT_TIMEOUT",
+    "OPENROUTER_READ_TIMEOUT",
+    "OPENROUTER_WRITE_TIMEOUT",
+    "OPENROUTER_POOL_TIMEOUT",
+    "LLM_CACHE_ENABLED",
+    "LLM_CACHE_PATH",
+    "LLM_CACHE_MAX_BYTES",
+    "LLM_CACHE_TTL",
+    "FOLDER_CONTEXT_TOP_K",
+    "FOLDER_CONTEXT_MAX_TOKENS",
+    "LLM_METADATA_TEXT_TOKENS",
+    "LLM_CHAT_TEXT_TOKENS",
+    "LLM_TRANSLATE_CHUNK_TOKENS",
+    "METADATA_BATCH_SIZE",
+    "METADATA_BATCH_MAX_TOKENS",
+    "METADATA_BATCH_DOC_TOKENS",
     "DB_URL",
     "DOCROUTER_RESET_DB",
+    "EXTRACTION_WORKERS",
+    "EXTRACTION_MAX_TASKS_PER_CHILD",
+    "EXTRACTION_TIMEOUT",
+    "PDF_OCR_DPI",
+    "OCR_WORKERS",
+    "OCR_MIN_CONFIDENCE",
+    "BLANK_PAGE_THRESHOLD",
+    "EXTRACTION_CACHE_ENABLED",
+    "EXTRACTION_CACHE_PATH",
+    "EXTRACTION_CACHE_MAX_BYTES",
+    "EXTRACT_MAX_CHARS",
+    "EXTRACT_MAX_PAGES",
+    "EXTRACT_MAX_SECONDS",
+    "EXTRACT_SAMPLE_ROWS",
+    "UPLOAD_IN_MEMORY_MAX_BYTES",
+    "IMAGE_NORMALIZE",
+    "IMAGE_TARGET_DPI",
+    "IMAGE_JPEG_QUALITY",
+    "IMAGE_KEEP_ORIGINAL",
+    "SEARCHABLE_PDF",
 ]
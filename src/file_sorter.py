@@ -7,7 +7,8 @@ import shutil
 from pathlib import Path
 from typing import Any, Dict, List, Tuple, Callable
 
-from config import GENERAL_FOLDER_NAME
+from config import GENERAL_FOLDER_NAME, config
+from utils.languages import tesseract_language
 from utils.names import normalize_person_name
 
 try:
@@ -131,6 +132,70 @@ def _reject_paths(_: List[str]) -> bool:
     return False
 
 
+def _normalize_image(src: Path, metadata: Dict[str, Any]) -> Tuple[Path, Path | None]:
+    """Нормализовать изображение перед архивированием.
+
+    Возвращает путь к итоговому файлу и к копии оригинала (если она
+    сохранена). Ошибки нормализации не мешают архивированию: файл
+    переносится как есть.
+    """
+    try:
+        from file_utils.normalize import NORMALIZABLE_EXTENSIONS, normalize_image_file
+    except ImportError:  # pragma: no cover - Pillow не установлен
+        return src, None
+    if src.suffix.lower() not in NORMALIZABLE_EXTENSIONS:
+        return src, None
+    try:
+        result = normalize_image_file(src)
+    except Exception:
+        logger.warning("Failed to normalize %s, archiving as is", src, exc_info=True)
+        return src, None
+    if result.changed:
+        metadata["normalization"] = result.to_dict()
+    return result.path, result.original_path
+
+
+def add_archive_text_layer(
+    dest_file: str | Path, metadata: Dict[str, Any], searchable: bool | None = None
+) -> int:
+    """Добавить в перенесённый PDF невидимый текстовый слой OCR.
+
+    Слой строится из рамок слов, сохранённых при извлечении текста (см.
+    :func:`file_utils.searchable.add_text_layer`), а распознаются заново
+    только страницы, которых извлечение не касалось. Функция блокирующая —
+    из асинхронного кода её вызывают через :func:`asyncio.to_thread`. Число
+    страниц со слоем записывается в ``metadata["text_layer_pages"]`` и в
+    ``.json`` рядом с файлом; ошибки не мешают архивированию.
+
+    :param dest_file: путь к файлу в архиве (результат :func:`place_file`).
+    :param metadata: метаданные файла, обновляются на месте.
+    :param searchable: добавлять ли слой; по умолчанию — настройка
+        ``SEARCHABLE_PDF``.
+    :return: число страниц, на которые добавлен слой.
+    """
+    dest = Path(dest_file)
+    if searchable is None:
+        searchable = config.searchable_pdf
+    if not searchable or dest.suffix.lower() != ".pdf":
+        return 0
+    try:
+        from file_utils.searchable import add_text_layer
+    except ImportError:  # pragma: no cover - PyMuPDF или Pillow не установлены
+        return 0
+    language = tesseract_language(metadata.get("language"), config.tesseract_lang)
+    try:
+        pages = add_text_layer(dest, language=language)
+    except Exception:
+        logger.warning("Failed to add text layer to %s", dest, exc_info=True)
+        return 0
+    if pages:
+        metadata["text_layer_pages"] = pages
+        json_file = dest.with_suffix(dest.suffix + ".json")
+        with open(json_file, "w", encoding="utf-8") as f:
+            json.dump(metadata, f, ensure_ascii=False, indent=2)
+    return pages
+
+
 def place_file(
     src_path: str | Path,
     metadata: Dict[str, Any],
@@ -138,6 +203,7 @@ def place_file(
     dry_run: bool = False,
     needs_new_folder: bool = False,
     confirm_callback: Callable[[List[str]], bool] = _reject_paths,
+    normalize: bool | None = None,
 ) -> Tuple[Path, List[str], bool]:
     """Переместить файл в структуру папок на основе *metadata*.
 
@@ -163,6 +229,10 @@ def place_file(
     :param confirm_callback: функция подтверждения создания каталогов. Ей передаётся
         список недостающих путей (относительно ``dest_root``), и она должна вернуть
         ``True``, если каталоги следует создать.
+    :param normalize: нормализовать изображение перед переносом
+        (см. :func:`file_utils.normalize.normalize_image_file`); по умолчанию —
+        настройка ``IMAGE_NORMALIZE``. Отчёт об экономии места записывается в
+        ``metadata["normalization"]``.
     :return: (путь к файлу назначения, список отсутствующих каталогов, подтверждение).
     """
     src = Path(src_path)
@@ -264,6 +334,14 @@ def place_file(
         logger.debug("Missing directories (no create): %s", missing)
         return dest_file, missing, confirmed
 
+    # Нормализация может сменить расширение (чёрно-белый JPEG → PNG)
+    if normalize is None:
+        normalize = config.image_normalize
+    original = None
+    if normalize:
+        src, original = _normalize_image(src, metadata)
+        ext = src.suffix
+
     # Проверяем ещё раз перед переносом на случай гонок
     dest_file, translit_name = _unique_path()
     metadata["new_name_translit"] = translit_name
@@ -272,6 +350,12 @@ def place_file(
     # Перемещаем файл
     shutil.move(str(src), str(dest_file))
     logger.info("Moved %s -> %s", src, dest_file)
+    if original is not None:
+        original_dest = dest_file.with_name(f"{dest_file.stem}.original{original.suffix}")
+        shutil.move(str(original), str(original_dest))
+        metadata["normalization"]["original_path"] = str(original_dest)
+    if "normalization" in metadata:
+        metadata["normalization"]["path"] = str(dest_file)
 
     # Пишем метаданные
     with open(json_file, "w", encoding="utf-8") as f:
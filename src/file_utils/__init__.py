@@ -1,12 +1,25 @@
 from __future__ import annotations
 
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
 from pathlib import Path
-from typing import Any, List, Union, Callable, Dict
+from typing import Any, BinaryIO, Iterable, Iterator, List, Optional, TextIO, Union, Callable, Dict
+import asyncio
 import csv
+import json
+import io
 import logging
 import mimetypes
+import os
 import tempfile
-from PIL import Image, ImageOps
+import time
+import zipfile
+from PIL import Image, ImageStat
+
+from config import config
+from utils.text_budget import split_text
 
 # Опциональные зависимости
 try:
@@ -36,25 +49,55 @@ except ImportError:  # pragma: no cover - optional dependency
 
 # OCR для изображений — модуль может отсутствовать
 try:
-    from .image_ocr import extract_text_image  # ожидается сигнатура (path: Path, language: str) -> str
+    from .image_ocr import extract_text_image, ocr_image, ocr_image_result  # ожидается сигнатура (path: Path, language: str) -> str
 except Exception:  # pragma: no cover - optional module
     extract_text_image = None  # type: ignore
+    ocr_image = None  # type: ignore
+    ocr_image_result = None  # type: ignore
 
 from .mrz import parse_mrz
+from .docx_stream import iter_docx_text
+from .cache import get_extraction_cache, hash_bytes, hash_file, make_key
+from .document import ExtractionBudget, ExtractionResult, PageReport
+from .spreadsheet import Sheet, SheetSummary, iter_sheet_text
+from .pdf_writer import PAGE_SIZES, PageSize, PdfImageWriter
 
 logger = logging.getLogger(__name__)
 
 
+# Версия парсеров; увеличивайте при изменении результата извлечения,
+# чтобы записи в кэше, созданные старым кодом, перестали использоваться.
+PARSER_VERSION = "4"
+
+# Эти форматы читаются быстрее, чем считается хэш файла
+_UNCACHED_EXTENSIONS = {".txt", ".md"}
+_IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png"}
+# Многостраничные изображения распознаются по кадрам (см. iter_text_tiff)
+_TIFF_EXTENSIONS = {".tif", ".tiff"}
+
+
 class UnsupportedFileType(ValueError):
     """Выбрасывается, когда тип файла не поддерживается или не определён."""
 
 
-_PARSER_REGISTRY: Dict[str, Callable[[Path], str]] = {}
+ParserResult = Union[str, Iterable[str]]
 
+# Что можно передать в extract_text: путь или содержимое файла в памяти
+Source = Union[str, Path, bytes, bytearray, memoryview, BinaryIO]
+# Во что превращается Source перед разбором: путь или буфер в памяти
+_Input = Union[Path, io.BytesIO]
 
-def register_parser(ext: str) -> Callable[[Callable[[Path], str]], Callable[[Path], str]]:
-    """Декоратор для регистрации парсеров файлов."""
-    def decorator(func: Callable[[Path], str]) -> Callable[[Path], str]:
+_PARSER_REGISTRY: Dict[str, Callable[[Path], ParserResult]] = {}
+
+
+def register_parser(ext: str) -> Callable[[Callable[[Path], ParserResult]], Callable[[Path], ParserResult]]:
+    """Декоратор для регистрации парсеров файлов.
+
+    Парсер может вернуть строку целиком или быть генератором, который выдаёт
+    текст частями (страницами, листами, строками). Части склеиваются через
+    ``"\\n"``.
+    """
+    def decorator(func: Callable[[Path], ParserResult]) -> Callable[[Path], ParserResult]:
         _PARSER_REGISTRY[ext.lower()] = func
         return func
     return decorator
@@ -62,196 +105,960 @@ def register_parser(ext: str) -> Callable[[Callable[[Path], str]], Callable[[Pat
 
 # ---------- Парсеры для «текстовых» форматов ----------
 
+@contextmanager
+def _open_text(source: _Input, newline: Optional[str] = None) -> Iterator[TextIO]:
+    """Открыть файл или буфер в памяти как текст UTF-8."""
+    if isinstance(source, Path):
+        with source.open(encoding="utf-8", newline=newline) as f:
+            yield f
+        return
+    source.seek(0)
+    wrapper = io.TextIOWrapper(source, encoding="utf-8", newline=newline)
+    try:
+        yield wrapper
+    finally:
+        # Буфер ещё нужен вызывающему коду, поэтому не закрываем его
+        wrapper.detach()
+
+
+def _iter_lines(path: _Input) -> Iterator[str]:
+    """Построчно читать текстовый файл, сохраняя завершающий перевод строки."""
+    with _open_text(path) as f:
+        line = ""
+        for line in f:
+            yield line[:-1] if line.endswith("\n") else line
+        if line.endswith("\n"):
+            yield ""
+
+
 @register_parser(".txt")
+def iter_text_txt(path: _Input) -> Iterator[str]:
+    """Построчное чтение .txt файла."""
+    return _iter_lines(path)
+
+
+@register_parser(".md")
+def iter_text_md(path: _Input) -> Iterator[str]:
+    """Построчное чтение .md файла."""
+    return _iter_lines(path)
+
+
 def extract_text_txt(path: Path) -> str:
     """Извлечение текста из .txt файла."""
     return path.read_text(encoding="utf-8")
 
 
-@register_parser(".md")
 def extract_text_md(path: Path) -> str:
     """Извлечение текста из .md файла."""
     return path.read_text(encoding="utf-8")
 
 
+# Число процессов, между которыми делятся ядра (см. share_ocr_threads)
+_ocr_processes = 1
+
+
+def share_ocr_threads(processes: int) -> None:
+    """Поделить ядра для OCR между *processes* процессами.
+
+    Вызывается при запуске каждого процесса пула извлечения: без этого каждый
+    процесс запускал бы по потоку OCR на ядро, и потоков было бы в
+    *processes* раз больше, чем ядер.
+    """
+    global _ocr_processes
+    _ocr_processes = max(1, processes)
+
+
+def _ocr_workers() -> int:
+    """Число потоков для параллельного OCR страниц в этом процессе.
+
+    ``OCR_WORKERS`` задаёт его явно; по умолчанию ядра делятся поровну между
+    процессами пула извлечения.
+    """
+    if config.ocr_workers:
+        return max(1, config.ocr_workers)
+    return max(1, (os.cpu_count() or 1) // _ocr_processes)
+
+
+def render_page(page: Any, dpi: int) -> Image.Image:
+    """Отрисовать страницу PDF в полутоновое изображение без записи на диск."""
+    pix = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY, alpha=False)
+    return Image.frombuffer("L", (pix.width, pix.height), pix.samples, "raw", "L", pix.stride, 1)
+
+
+# Разрешение миниатюры, по которой страница проверяется на пустоту
+_BLANK_CHECK_DPI = 72
+
+
+def classify_page(page: Any) -> tuple[str, str]:
+    """Определить, как обрабатывать страницу PDF.
+
+    Возвращает пару (вид, текст): ``("text", текст)`` для страниц с текстовым
+    слоем, ``("blank", "")`` для пустых страниц и ``("image", "")`` для
+    страниц, которым нужен OCR. Пустота определяется по разбросу яркости
+    миниатюры страницы (порог ``config.blank_page_threshold``).
+    """
+    text = page.get_text()
+    if text.strip():
+        return "text", text
+    thumb = render_page(page, _BLANK_CHECK_DPI)
+    if ImageStat.Stat(thumb).stddev[0] < config.blank_page_threshold:
+        return "blank", ""
+    return "image", ""
+
+
+def _tiered_ocr() -> Optional[Callable[..., Any]]:
+    """Многоуровневый OCR из :mod:`ocr_pipeline`, если он включён и доступен.
+
+    Модуль импортируется лениво: он сам зависит от ``file_utils`` и требует
+    OpenCV.
+    """
+    if config.ocr_min_confidence is None:
+        return None
+    try:
+        from ocr_pipeline import ocr_tiered
+    except ImportError:  # pragma: no cover - OpenCV не установлен
+        logger.warning("ocr_pipeline unavailable, tiered OCR disabled", exc_info=True)
+        return None
+    return ocr_tiered
+
+
+# Слова страниц для текстового слоя: номер страницы → {"rotate", "words"}
+TextLayer = Dict[int, Dict[str, Any]]
+
+
+def _ocr_page(
+    image: Image.Image,
+    language: str,
+    report: PageReport,
+    layer: Optional[TextLayer] = None,
+) -> str:
+    """Распознать страницу и записать в *report* уровень OCR и уверенность.
+
+    Если задан ``config.ocr_min_confidence``, страница сначала распознаётся
+    как есть, а предобработка выполняется только при низкой уверенности
+    (см. :func:`ocr_pipeline.ocr_tiered`). Если передан словарь *layer*, в
+    него за тот же проход записываются рамки слов страницы.
+    """
+    words = layer is not None
+    ocr_tiered = _tiered_ocr()
+    if ocr_tiered is not None:
+        result = ocr_tiered(image, language, min_confidence=config.ocr_min_confidence, words=words)
+        report.ocr_tier = result.tier
+        report.confidence = result.confidence
+    elif words and ocr_image_result is not None:
+        result = ocr_image_result(image, language, words=True)
+        report.ocr_tier = "raw"
+        report.confidence = result.confidence
+    else:
+        if ocr_image is None:
+            raise RuntimeError("OCR недоступен: функция ocr_image не найдена")
+        report.ocr_tier = "raw"
+        return ocr_image(image, language)
+    if layer is not None:
+        layer[report.number] = {"rotate": result.rotate, "words": result.words}
+    return result.text
+
+
+def open_pdf(source: Union[str, _Input]) -> Any:
+    """Открыть PDF из файла или буфера в памяти через PyMuPDF."""
+    if isinstance(source, (str, Path)):
+        return fitz.open(source)
+    return fitz.open(stream=source.getvalue(), filetype="pdf")
+
+
 @register_parser(".pdf")
-def extract_text_pdf(path: Path, language: str = "eng") -> str:
-    """Извлечение текста из PDF с помощью PyMuPDF.
+def iter_text_pdf(
+    path: _Input,
+    language: str = "eng",
+    dpi: Optional[int] = None,
+    max_pages: Optional[int] = None,
+    report: Optional[List[PageReport]] = None,
+    layer: Optional[TextLayer] = None,
+) -> Iterator[str]:
+    """Постранично извлекать текст из PDF с помощью PyMuPDF.
 
-    Если страница не содержит текстового слоя, при наличии ``extract_text_image``
-    страница будет конвертирована в изображение и обработана через OCR.
+    Каждая страница сначала классифицируется (:func:`classify_page`).
+    Текстовый слой берётся сразу, пустые страницы пропускаются, а страницы
+    без текста отрисовываются в памяти с разрешением *dpi* (по умолчанию
+    ``config.pdf_ocr_dpi``) и распознаются через OCR параллельно. Текст
+    выдаётся строго по порядку страниц; пустые результаты OCR пропускаются.
+    *max_pages* ограничивает число обрабатываемых страниц с начала документа.
+    Если передан список *report*, в него добавляется :class:`PageReport`
+    для каждой обработанной страницы, а в словарь *layer* — слова
+    распознанных страниц (см. :func:`load_text_layer`).
     """
     if fitz is None:
         raise RuntimeError("PyMuPDF не установлен, обработка PDF невозможна")
 
-    parts: list[str] = []
-    with fitz.open(path) as doc:
-        for page in doc:
-            text = page.get_text()
+    dpi = dpi or config.pdf_ocr_dpi
+    workers = _ocr_workers()
+    pending: deque[tuple[PageReport, str | Future[str]]] = deque()
+
+    def resolve() -> str:
+        page_report, item = pending.popleft()
+        text = item if isinstance(item, str) else item.result()
+        page_report.chars = len(text)
+        if report is not None:
+            report.append(page_report)
+        return text
+
+    # Движки OCR переиспользуются потоками, поэтому пул потоков
+    # распределяет распознавание по ядрам. Число страниц, ожидающих выдачи,
+    # ограничено, чтобы не держать в памяти весь документ.
+    pool = ThreadPoolExecutor(max_workers=workers)
+    try:
+        with open_pdf(path) as doc:
+            for page_no, page in enumerate(doc):
+                if max_pages is not None and page_no >= max_pages:
+                    break
+                kind, text = classify_page(page)
+                page_report = PageReport(page_no + 1, kind)
+                if kind == "image":
+                    image = render_page(page, dpi)
+                    pending.append(
+                        (page_report, pool.submit(_ocr_page, image, language, page_report, layer))
+                    )
+                else:
+                    pending.append((page_report, text))
+
+                while pending and (
+                    isinstance(pending[0][1], str) or len(pending) >= 2 * workers
+                ):
+                    text = resolve()
+                    if text.strip():
+                        yield text
+
+        while pending:
+            text = resolve()
             if text.strip():
-                parts.append(text)
-                continue
+                yield text
+    finally:
+        # При досрочной остановке потребителя не ждём оставшиеся страницы
+        pool.shutdown(wait=False, cancel_futures=True)
+
 
-            if extract_text_image is None:
-                raise RuntimeError("OCR недоступен: функция extract_text_image не найдена")
+def _is_blank(image: Image.Image, dpi: float) -> bool:
+    """Пуст ли кадр: разброс яркости уменьшенной копии ниже порога.
 
-            pix = page.get_pixmap()
+    Копия уменьшается примерно до ``_BLANK_CHECK_DPI``, как миниатюра
+    страницы PDF в :func:`classify_page`.
+    """
+    factor = max(1, int(dpi // _BLANK_CHECK_DPI))
+    thumb = image.reduce(factor) if factor > 1 else image
+    if thumb.mode != "L":
+        thumb = thumb.convert("L")
+    return ImageStat.Stat(thumb).stddev[0] < config.blank_page_threshold
+
+
+def _tiff_frame(img: Image.Image) -> tuple[Image.Image, float]:
+    """Декодировать текущий кадр TIFF для OCR; вернуть кадр и его DPI.
+
+    Факсы сканируются с разным разрешением по осям (например, 204×98 dpi);
+    такие кадры растягиваются до квадратных пикселей, иначе буквы получаются
+    сплюснутыми.
+    """
+    frame = img.copy() if img.mode in ("L", "RGB") else img.convert("L")
+    dpi_x, dpi_y = (max(float(d or 0), 0.0) for d in (img.info.get("dpi") or (0, 0))[:2])
+    if dpi_x and dpi_y and dpi_x != dpi_y:
+        if dpi_x > dpi_y:
+            size = (frame.width, round(frame.height * dpi_x / dpi_y))
+        else:
+            size = (round(frame.width * dpi_y / dpi_x), frame.height)
+        frame = frame.resize(size, Image.LANCZOS)
+    dpi = max(dpi_x, dpi_y) or _BLANK_CHECK_DPI
+    frame.info["dpi"] = (dpi, dpi)
+    return frame, dpi
+
+
+@register_parser(".tiff")
+def iter_text_tiff(
+    path: _Input,
+    language: str = "eng",
+    max_pages: Optional[int] = None,
+    report: Optional[List[PageReport]] = None,
+) -> Iterator[str]:
+    """Постранично распознавать многостраничный TIFF (например, факс).
+
+    Кадры декодируются по одному при переходе к ним и распознаются
+    параллельно, как сканированные страницы в :func:`iter_text_pdf`: в
+    памяти одновременно не больше ``2 * workers`` кадров. Пустые кадры
+    пропускаются, текст выдаётся строго по порядку страниц. *max_pages*
+    ограничивает число обрабатываемых кадров с начала файла; в список
+    *report* добавляется :class:`PageReport` для каждого обработанного кадра.
+    """
+    workers = _ocr_workers()
+    pending: deque[tuple[PageReport, str | Future[str]]] = deque()
+
+    def resolve() -> str:
+        page_report, item = pending.popleft()
+        text = item if isinstance(item, str) else item.result()
+        page_report.chars = len(text)
+        if report is not None:
+            report.append(page_report)
+        return text
+
+    if not isinstance(path, Path):
+        path.seek(0)
+    pool = ThreadPoolExecutor(max_workers=workers)
+    try:
+        with Image.open(path) as img:
+            # Кадры читаются из файла только в этом потоке: Pillow не
+            # допускает параллельный seek по одному изображению
+            for page_no in range(getattr(img, "n_frames", 1)):
+                if max_pages is not None and page_no >= max_pages:
+                    break
+                img.seek(page_no)
+                frame, dpi = _tiff_frame(img)
+                if _is_blank(frame, dpi):
+                    page_report = PageReport(page_no + 1, "blank")
+                    pending.append((page_report, ""))
+                else:
+                    page_report = PageReport(page_no + 1, "image")
+                    pending.append((page_report, pool.submit(_ocr_page, frame, language, page_report)))
+                del frame
+
+                while pending and (
+                    isinstance(pending[0][1], str) or len(pending) >= 2 * workers
+                ):
+                    text = resolve()
+                    if text.strip():
+                        yield text
+
+        while pending:
+            text = resolve()
+            if text.strip():
+                yield text
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
 
-            # На Windows нельзя перезаписать открытый временный файл
-            tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".png")
-            tmp_path = Path(tmp.name)
-            tmp.close()
 
-            try:
-                pix.save(tmp_path)
-                ocr_text = extract_text_image(tmp_path, language=language)
-            finally:
-                tmp_path.unlink(missing_ok=True)
+register_parser(".tif")(iter_text_tiff)
 
-            if ocr_text.strip():
-                parts.append(ocr_text)
 
-    return "\n".join(parts)
+def extract_text_pdf(path: Path, language: str = "eng", dpi: Optional[int] = None) -> str:
+    """Извлечение текста из PDF (см. :func:`iter_text_pdf`)."""
+    return "\n".join(iter_text_pdf(path, language=language, dpi=dpi))
 
 
 @register_parser(".docx")
-def extract_text_docx(path: Path) -> str:
-    """Извлечение текста из DOCX (python-docx)."""
+def iter_text_docx(path: _Input) -> Iterator[str]:
+    """Потоковое извлечение текста из DOCX: абзацы, таблицы и колонтитулы.
+
+    XML-части читаются прямо из архива без python-docx
+    (см. :func:`file_utils.docx_stream.iter_docx_text`).
+    """
+    if not isinstance(path, Path):
+        path.seek(0)
+    try:
+        yield from iter_docx_text(path)
+    except (zipfile.BadZipFile, KeyError) as exc:
+        raise UnsupportedFileType(f"Повреждённый DOCX: {exc}") from exc
+
+
+def iter_text_docx_python(path: _Input) -> Iterator[str]:
+    """Поабзацное извлечение текста из DOCX через python-docx.
+
+    Прежняя реализация: читает только абзацы основного текста, без таблиц
+    и колонтитулов.
+    """
     if Document is None:
         raise RuntimeError("python-docx не установлен")
+    if not isinstance(path, Path):
+        path.seek(0)
     doc = Document(path)
-    return "\n".join(p.text for p in doc.paragraphs)
+    for paragraph in doc.paragraphs:
+        yield paragraph.text
+
+
+def extract_text_docx(path: Path) -> str:
+    """Извлечение текста из DOCX (см. :func:`iter_text_docx`)."""
+    return "\n".join(iter_text_docx(path))
+
+
+def _sheet_name(path: _Input, default: str) -> str:
+    return path.name if isinstance(path, Path) else default
+
+
+def _iter_csv_sheets(path: _Input) -> Iterator[Sheet]:
+    with _open_text(path, newline="") as f:
+        yield _sheet_name(path, "CSV"), csv.reader(f)
 
 
 @register_parser(".csv")
+def iter_text_csv(
+    path: _Input,
+    sample_rows: Optional[int] = None,
+    report: Optional[List[SheetSummary]] = None,
+) -> Iterator[str]:
+    """Построчное извлечение текста из CSV (через csv.reader).
+
+    С *sample_rows* выдаётся только заголовок и выборка строк
+    (см. :func:`file_utils.spreadsheet.sample_sheet`); сводка по таблице
+    добавляется в список *report*, если он передан.
+    """
+    return iter_sheet_text(_iter_csv_sheets(path), sample_rows, report)
+
+
 def extract_text_csv(path: Path) -> str:
     """Извлечение текста из CSV (через csv.reader)."""
-    lines: list[str] = []
-    with path.open(newline="", encoding="utf-8") as f:
-        reader = csv.reader(f)
-        for row in reader:
-            lines.append(",".join(row))
-    return "\n".join(lines)
+    return "\n".join(iter_text_csv(path))
+
+
+def _iter_xls_sheets(path: _Input) -> Iterator[Sheet]:
+    if xlrd is None:
+        raise RuntimeError("xlrd не установлен")
+    if isinstance(path, Path):
+        book = xlrd.open_workbook(path, on_demand=True)
+    else:
+        book = xlrd.open_workbook(file_contents=path.getvalue(), on_demand=True)
+    try:
+        for sheet_idx in range(book.nsheets):
+            sheet = book.sheet_by_index(sheet_idx)
+            yield sheet.name, (sheet.row_values(row_idx) for row_idx in range(sheet.nrows))
+            book.unload_sheet(sheet_idx)
+    finally:
+        book.release_resources()
 
 
 @register_parser(".xls")
+def iter_text_xls(
+    path: _Input,
+    sample_rows: Optional[int] = None,
+    report: Optional[List[SheetSummary]] = None,
+) -> Iterator[str]:
+    """Построчное извлечение текста из XLS (через xlrd), лист за листом.
+
+    *sample_rows* и *report* — как в :func:`iter_text_csv`.
+    """
+    return iter_sheet_text(_iter_xls_sheets(path), sample_rows, report)
+
+
 def extract_text_xls(path: Path) -> str:
     """Извлечение текста из XLS (через xlrd)."""
-    if xlrd is None:
-        raise RuntimeError("xlrd не установлен")
-    book = xlrd.open_workbook(path)
-    lines: list[str] = []
-    for sheet in book.sheets():
-        for row_idx in range(sheet.nrows):
-            row = sheet.row_values(row_idx)
-            lines.append(",".join(str(cell) for cell in row))
-    return "\n".join(lines)
+    return "\n".join(iter_text_xls(path))
 
 
-@register_parser(".xlsx")
-def extract_text_xlsx(path: Path) -> str:
-    """Извлечение текста из XLSX (через openpyxl)."""
+def _iter_xlsx_sheets(path: _Input) -> Iterator[Sheet]:
     if openpyxl is None:
         raise RuntimeError("openpyxl не установлен")
+    if not isinstance(path, Path):
+        path.seek(0)
     wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
-    lines: list[str] = []
-    for ws in wb.worksheets:
-        for row in ws.iter_rows(values_only=True):
-            values = ["" if v is None else str(v) for v in row]
-            lines.append(",".join(values))
-    wb.close()
-    return "\n".join(lines)
+    try:
+        for ws in wb.worksheets:
+            yield ws.title, ws.iter_rows(values_only=True)
+    finally:
+        wb.close()
 
 
-# ---------- Входная точка с поддержкой OCR ----------
+@register_parser(".xlsx")
+def iter_text_xlsx(
+    path: _Input,
+    sample_rows: Optional[int] = None,
+    report: Optional[List[SheetSummary]] = None,
+) -> Iterator[str]:
+    """Построчное извлечение текста из XLSX (через openpyxl в режиме read-only).
 
-def extract_text(file_path: Union[str, Path], language: str = "eng") -> str:
+    *sample_rows* и *report* — как в :func:`iter_text_csv`.
     """
-    Извлечь текст из поддерживаемого файла.
+    return iter_sheet_text(_iter_xlsx_sheets(path), sample_rows, report)
 
-    Поддерживаемые форматы:
-      - Текстовые: .txt, .md, .pdf, .docx
-      - Таблицы: .csv, .xls, .xlsx
-      - Изображения (OCR): .jpg, .jpeg, .png, .tiff (через image_ocr.extract_text_image)
-    """
-    path = Path(file_path)
+
+def extract_text_xlsx(path: Path) -> str:
+    """Извлечение текста из XLSX (через openpyxl)."""
+    return "\n".join(iter_text_xlsx(path))
+
+
+_SPREADSHEET_PARSERS = {
+    ".csv": iter_text_csv,
+    ".xls": iter_text_xls,
+    ".xlsx": iter_text_xlsx,
+}
+
+# Встроенные парсеры умеют читать содержимое из памяти (io.BytesIO)
+_BUFFER_PARSERS = {
+    iter_text_txt,
+    iter_text_md,
+    iter_text_pdf,
+    iter_text_tiff,
+    iter_text_docx,
+    iter_text_csv,
+    iter_text_xls,
+    iter_text_xlsx,
+}
+
+
+# ---------- Входная точка с поддержкой OCR ----------
+
+# Сигнатуры форматов в начале файла
+_MAGIC_SIGNATURES = (
+    (b"%PDF-", ".pdf"),
+    (b"\x89PNG\r\n\x1a\n", ".png"),
+    (b"\xff\xd8\xff", ".jpg"),
+    (b"II*\x00", ".tiff"),
+    (b"MM\x00*", ".tiff"),
+    (b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1", ".xls"),
+)
+
+
+def _sniff_extension(head: bytes, source: _Input) -> str:
+    """Определить расширение по первым байтам содержимого ("" — не удалось)."""
+    for signature, ext in _MAGIC_SIGNATURES:
+        if head.startswith(signature):
+            return ext
+    if head.startswith(b"PK\x03\x04"):
+        # DOCX и XLSX — ZIP-архивы, различаются каталогом внутри
+        try:
+            with zipfile.ZipFile(source) as archive:
+                names = archive.namelist()
+        except zipfile.BadZipFile:
+            return ""
+        if "word/document.xml" in names:
+            return ".docx"
+        if any(name.startswith("xl/") for name in names):
+            return ".xlsx"
+        return ""
+    if magic is not None:
+        try:
+            mime = magic.from_buffer(head, mime=True)
+        except Exception:  # pragma: no cover - magic failure
+            mime = None
+        ext = mimetypes.guess_extension(mime or "") or ""
+        if ext in _PARSER_REGISTRY or ext in _IMAGE_EXTENSIONS:
+            return ext
+    try:
+        head.decode("utf-8")
+    except UnicodeDecodeError as exc:
+        # Блок мог оборваться посреди многобайтового символа
+        if exc.start < len(head) - 3:
+            return ""
+    return ".txt"
+
+
+def _detect_extension(path: Path) -> str:
+    """Определить расширение файла, при необходимости — по содержимому."""
     ext = path.suffix.lower()
-    logger.info("Extracting text from %s", path)
+    if ext:
+        return ext
+    mime = None
+    if magic is not None:
+        try:
+            mime = magic.from_file(str(path), mime=True)
+        except Exception:  # pragma: no cover - magic failure
+            mime = None
+    if mime:
+        ext = mimetypes.guess_extension(mime) or ""
+    if not ext:
+        with path.open("rb") as f:
+            ext = _sniff_extension(f.read(8192), path)
+    if ext:
+        logger.debug("Guessed extension %s for %s", ext, path)
+    else:
+        logger.error("Cannot determine file type for %s", path)
+        raise UnsupportedFileType("Не удалось определить тип файла")
+    return ext
+
+
+def _open_source(source: Source, filename: Optional[str] = None) -> tuple[_Input, str, str]:
+    """Подготовить *source* к разбору.
+
+    Возвращает путь или буфер в памяти, расширение и подпись для журнала.
+    Для содержимого в памяти тип определяется по расширению *filename*, а если
+    его нет — по сигнатуре в начале данных.
+    """
+    if isinstance(source, (str, Path)):
+        path = Path(source)
+        return path, _detect_extension(path), str(path)
 
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        data = bytes(source)
+    else:
+        filename = filename or getattr(source, "name", None)
+        data = source.read()
+    buffer = io.BytesIO(data)
+    label = filename if isinstance(filename, str) else "<memory>"
+    ext = Path(label).suffix.lower() if isinstance(filename, str) else ""
     if not ext:
-        mime = None
-        if magic is not None:
-            try:
-                mime = magic.from_file(str(path), mime=True)
-            except Exception:  # pragma: no cover - magic failure
-                mime = None
-        if mime:
-            ext = mimetypes.guess_extension(mime) or ""
-            logger.debug("Guessed extension %s for %s", ext, path)
-        if not ext:
-            logger.error("Cannot determine file type for %s", path)
-            raise UnsupportedFileType("Не удалось определить тип файла")
+        ext = _sniff_extension(data[:8192], buffer)
+    if not ext:
+        logger.error("Cannot determine file type for %s", label)
+        raise UnsupportedFileType("Не удалось определить тип файла")
+    return buffer, ext, label
+
 
+def _iter_image(path: _Input, language: str, report: Optional[List[PageReport]] = None) -> Iterator[str]:
+    page_report = PageReport(1, "image")
+    if _tiered_ocr() is not None:
+        if not isinstance(path, Path):
+            path.seek(0)
+        with Image.open(path) as img:
+            text = _ocr_page(img, language, page_report)
+    else:
+        text = extract_text_image(path, language=language)
+        page_report.ocr_tier = "raw"
+    page_report.chars = len(text)
+    if report is not None:
+        report.append(page_report)
+    yield text
+
+
+def _iter_via_tempfile(parser: Callable[[Path], ParserResult], buffer: io.BytesIO, ext: str) -> Iterator[str]:
+    """Вызвать парсер, которому нужен путь, для содержимого в памяти."""
+    tmp = tempfile.NamedTemporaryFile(delete=False, suffix=ext)
+    try:
+        tmp.write(buffer.getvalue())
+        tmp.close()
+        yield from _iter_chunks(parser(Path(tmp.name)))
+    finally:
+        os.unlink(tmp.name)
+
+
+def _ocr_params() -> Dict[str, Any]:
+    """Настройки OCR, от которых зависит результат (для ключа кэша)."""
+    if config.ocr_min_confidence is None:
+        return {}
+    return {"min_confidence": config.ocr_min_confidence}
+
+
+def _select_parser(
+    path: _Input,
+    ext: str,
+    language: str,
+    max_pages: Optional[int] = None,
+    report: Optional[List[PageReport]] = None,
+    sample_rows: Optional[int] = None,
+    sheets: Optional[List[SheetSummary]] = None,
+    layer: Optional[TextLayer] = None,
+) -> tuple[Callable[[], ParserResult], Optional[str], Dict[str, Any]]:
+    """Подобрать парсер для *ext*.
+
+    Возвращает функцию без аргументов, язык OCR (``None`` для форматов без OCR)
+    и параметры извлечения, влияющие на ключ кэша. *max_pages* и список
+    *report* передаются постраничным парсерам, *sample_rows* и список
+    *sheets* — парсерам таблиц, словарь *layer* — парсеру PDF.
+    """
     # Ветвь для изображений — нужен отдельный параметр language
-    if ext in {".jpg", ".jpeg", ".png", ".tiff"}:
+    if ext in _IMAGE_EXTENSIONS:
         if extract_text_image is None:
             logger.error("OCR module unavailable for %s", path)
             raise RuntimeError("Модуль OCR недоступен: .image_ocr.extract_text_image не найден")
-        text = extract_text_image(path, language=language)
-        logger.debug("Extracted %d characters from %s via OCR", len(text), path)
-        return text
-
+        return partial(_iter_image, path, language, report), language, _ocr_params()
+    if ext in _TIFF_EXTENSIONS:
+        if ocr_image is None:
+            logger.error("OCR module unavailable for %s", path)
+            raise RuntimeError("Модуль OCR недоступен: .image_ocr.ocr_image не найден")
+        parse = partial(
+            iter_text_tiff, path, language=language, max_pages=max_pages, report=report
+        )
+        return parse, language, _ocr_params()
     if ext == ".pdf":
-        text = extract_text_pdf(path, language=language)
-        logger.debug("Extracted %d characters from %s", len(text), path)
-        return text
+        parse = partial(
+            iter_text_pdf, path, language=language, max_pages=max_pages, report=report, layer=layer
+        )
+        return parse, language, {"dpi": config.pdf_ocr_dpi, **_ocr_params()}
+    if sample_rows is not None and _PARSER_REGISTRY.get(ext) is _SPREADSHEET_PARSERS.get(ext):
+        parse = partial(
+            _SPREADSHEET_PARSERS[ext], path, sample_rows=sample_rows, report=sheets
+        )
+        return parse, None, {"sample_rows": sample_rows}
 
     # Обычные «текстовые» форматы
     parser = _PARSER_REGISTRY.get(ext)
     if parser is None:
         logger.error("Unsupported/unknown file extension: %s", ext)
         raise UnsupportedFileType(f"Unsupported/unknown file extension: {ext}")
-    text = parser(path)
-    logger.debug("Extracted %d characters from %s", len(text), path)
-    return text
+    if isinstance(path, io.BytesIO) and parser not in _BUFFER_PARSERS:
+        # Парсеры из плагинов ожидают путь к файлу
+        return partial(_iter_via_tempfile, parser, path, ext), None, {}
+    return partial(parser, path), None, {}
+
+
+def _content_hash(path: _Input) -> str:
+    if isinstance(path, Path):
+        return hash_file(path)
+    return hash_bytes(path.getvalue())
+
+
+def _cache_key(path: _Input, ext: str, language: Optional[str], params: Dict[str, Any]) -> Optional[str]:
+    if ext in _UNCACHED_EXTENSIONS or get_extraction_cache() is None:
+        return None
+    try:
+        return make_key(_content_hash(path), version=PARSER_VERSION, language=language, ext=ext, **params)
+    except Exception:  # pragma: no cover - кэш не должен ломать извлечение
+        logger.warning("Extraction cache key failed for %s", path, exc_info=True)
+        return None
+
+
+def _cache_get(key: Optional[str], label: str) -> Optional[str]:
+    cache = get_extraction_cache()
+    if key is None or cache is None:
+        return None
+    try:
+        cached = cache.get(key)
+    except Exception:  # pragma: no cover - кэш не должен ломать извлечение
+        logger.warning("Extraction cache lookup failed for %s", label, exc_info=True)
+        return None
+    if cached is not None:
+        logger.debug("Extraction cache hit for %s", label)
+    return cached
+
+
+def _cache_put(key: Optional[str], label: str, text: str) -> None:
+    cache = get_extraction_cache()
+    if key is None or cache is None:
+        return
+    try:
+        cache.put(key, text)
+    except Exception:  # pragma: no cover
+        logger.warning("Failed to store %s in extraction cache", label, exc_info=True)
+
+
+def _text_layer_key(path: _Input) -> Optional[str]:
+    if get_extraction_cache() is None:
+        return None
+    try:
+        return make_key(_content_hash(path), version=PARSER_VERSION, text_layer=True)
+    except Exception:  # pragma: no cover - кэш не должен ломать извлечение
+        logger.warning("Text layer cache key failed for %s", path, exc_info=True)
+        return None
+
+
+def load_text_layer(file_path: Union[str, Path]) -> TextLayer:
+    """Слова страниц PDF, распознанных при извлечении текста.
+
+    При включённом ``SEARCHABLE_PDF`` :func:`extract_document` сохраняет в
+    кэш извлечения рамки слов каждой распознанной страницы (ключ — содержимое
+    файла), чтобы :func:`file_utils.searchable.add_text_layer` построил
+    текстовый слой без повторного OCR. Возвращает словарь «номер страницы →
+    ``{"rotate", "words"}``»; пустой, если данных нет.
+    """
+    path = Path(file_path)
+    cached = _cache_get(_text_layer_key(path), f"text layer of {path.name}")
+    if cached is None:
+        return {}
+    return {int(number): entry for number, entry in json.loads(cached).items()}
+
+
+def _store_text_layer(path: _Input, label: str, layer: TextLayer) -> None:
+    key = _text_layer_key(path)
+    if key is not None:
+        _cache_put(key, f"text layer of {label}", json.dumps(layer, ensure_ascii=False))
+
+
+def _iter_chunks(result: ParserResult) -> Iterator[str]:
+    if isinstance(result, str):
+        yield result
+    else:
+        yield from result
+
+
+def iter_text(
+    file_path: Source, language: str = "eng", *, filename: Optional[str] = None
+) -> Iterator[str]:
+    """Извлекать текст из файла по частям: страницами, листами или строками.
+
+    Позволяет обрабатывать большие документы с ограниченной памятью и
+    прекращать извлечение досрочно. Если текст файла уже есть в кэше,
+    он выдаётся одной частью. Склеивание частей через ``"\\n"`` даёт тот же
+    результат, что и :func:`extract_text`.
+    """
+    path, ext, label = _open_source(file_path, filename)
+    parse, ocr_language, params = _select_parser(path, ext, language)
+    cached = _cache_get(_cache_key(path, ext, ocr_language, params), label)
+    if cached is not None:
+        yield cached
+        return
+    yield from _iter_chunks(parse())
+
+
+def _page_count(path: _Input, ext: str) -> Optional[int]:
+    """Число страниц постраничного документа или ``None`` для прочих форматов."""
+    if ext == ".pdf" and fitz is not None:
+        with open_pdf(path) as doc:
+            return doc.page_count
+    if ext in _TIFF_EXTENSIONS:
+        if not isinstance(path, Path):
+            path.seek(0)
+        with Image.open(path) as img:
+            return getattr(img, "n_frames", 1)
+    return None
+
+
+def extract_document(
+    file_path: Source,
+    language: str = "eng",
+    budget: Optional[ExtractionBudget] = None,
+    *,
+    filename: Optional[str] = None,
+) -> ExtractionResult:
+    """Извлечь текст с учётом бюджета *budget*.
+
+    Извлечение прекращается, как только набрано ``max_chars`` символов,
+    обработано ``max_pages`` страниц или истекло ``max_seconds`` секунд;
+    оставшиеся страницы не распознаются. Поле ``complete`` результата
+    показывает, прочитан ли документ целиком. В кэш попадает только полный
+    текст.
+
+    Кроме пути *file_path* может быть содержимым файла (``bytes``,
+    ``memoryview``) или открытым бинарным файлом; тогда тип определяется по
+    расширению *filename* или по сигнатуре данных.
+    """
+    path, ext, label = _open_source(file_path, filename)
+    logger.info("Extracting text from %s", label)
+    budget = budget or ExtractionBudget()
+    pages: List[PageReport] = []
+    sheets: List[SheetSummary] = []
+    layer: Optional[TextLayer] = {} if config.searchable_pdf else None
+    parse, ocr_language, params = _select_parser(
+        path, ext, language, budget.max_pages, pages, budget.sample_rows, sheets, layer
+    )
+    # Выборка строк кэшируется под своим ключом, но полным текстом не считается
+    sampled = "sample_rows" in params
+
+    key = _cache_key(path, ext, ocr_language, params)
+    cached = _cache_get(key, label)
+    if cached is not None:
+        if budget.max_chars is not None and len(cached) > budget.max_chars:
+            return ExtractionResult(cached[: budget.max_chars], complete=False)
+        return ExtractionResult(cached, complete=not sampled)
+
+    started = time.monotonic()
+    parts: list[str] = []
+    length = 0
+    complete = True
+    chunks = _iter_chunks(parse())
+    try:
+        for chunk in chunks:
+            length += len(chunk) + (1 if parts else 0)
+            parts.append(chunk)
+            if budget.max_chars is not None and length >= budget.max_chars:
+                complete = False
+                break
+            if budget.max_seconds is not None and time.monotonic() - started >= budget.max_seconds:
+                complete = False
+                break
+    finally:
+        # Останавливаем генератор, чтобы отменить распознавание оставшихся страниц
+        chunks.close()
+
+    if complete and budget.max_pages is not None:
+        page_count = _page_count(path, ext)
+        complete = page_count is None or page_count <= budget.max_pages
+
+    text = "\n".join(parts)
+    if budget.max_chars is not None:
+        text = text[: budget.max_chars]
+    logger.debug(
+        "Extracted %d characters from %s%s", len(text), label, "" if complete else " (partial)"
+    )
+    if pages:
+        logger.debug(
+            "Pages of %s: %s",
+            label,
+            ", ".join(
+                f"{p.number}:{p.kind}" + (f"/{p.ocr_tier}" if p.ocr_tier else "")
+                for p in pages
+            ),
+        )
+    if sheets:
+        logger.debug("Sheets of %s: %s", label, " ".join(s.describe() for s in sheets))
+    if complete:
+        _cache_put(key, label, text)
+    if layer:
+        # Слова сохраняются и для неполного извлечения: слой получат хотя бы эти страницы
+        _store_text_layer(path, label, layer)
+    if any(s.sampled for s in sheets):
+        complete = False
+    return ExtractionResult(text, complete=complete, pages=pages, sheets=sheets)
+
+
+def extract_text(
+    file_path: Source,
+    language: str = "eng",
+    budget: Optional[ExtractionBudget] = None,
+    *,
+    filename: Optional[str] = None,
+) -> str:
+    """
+    Извлечь текст из поддерживаемого файла.
+
+    Поддерживаемые форматы:
+      - Текстовые: .txt, .md, .pdf, .docx
+      - Таблицы: .csv, .xls, .xlsx
+      - Изображения (OCR): .jpg, .jpeg, .png (через image_ocr.extract_text_image)
+      - Многостраничные TIFF (OCR по кадрам): .tif, .tiff
+
+    Необязательный *budget* ограничивает объём извлечения
+    (см. :func:`extract_document`). Вместо пути можно передать содержимое
+    файла в памяти; *filename* подсказывает его тип.
+    """
+    return extract_document(file_path, language=language, budget=budget, filename=filename).text
+
+
+def store_document_text(file_path: Union[str, Path], text: str, language: str = "eng") -> None:
+    """Сохранить в кэш извлечения полный текст, полученный без разбора файла.
+
+    Например, текст PDF, собранного из изображений, уже известен по OCR
+    исходных снимков; после сохранения :func:`extract_text` для этого PDF и
+    того же языка берёт текст из кэша, не отрисовывая страницы заново.
+    """
+    path, ext, label = _open_source(file_path)
+    _, ocr_language, params = _select_parser(path, ext, language)
+    _cache_put(_cache_key(path, ext, ocr_language, params), label, text)
+
+
+def extraction_cache_stats() -> Dict[str, int]:
+    """Статистика кэша извлечения: записи, объём, попадания и промахи."""
+    cache = get_extraction_cache()
+    return cache.stats() if cache is not None else {}
 
 
 # ---------- Вспомогательные утилиты ----------
 
-def merge_images_to_pdf(paths: list[Path]) -> Path:
-    """Преобразовать несколько изображений в один PDF во временном файле."""
+def merge_images_to_pdf(paths: list[Path], page_size: PageSize = None) -> Path:
+    """Преобразовать несколько изображений в один PDF во временном файле.
+
+    Страницы добавляются по одной через :class:`PdfImageWriter`, поэтому пик
+    памяти не зависит от числа изображений, а JPEG встраиваются без
+    повторного сжатия. По умолчанию каждая страница имеет размер своего
+    изображения; *page_size* (``"a4"``, ``"letter"`` или пара размеров в
+    пунктах) вписывает изображения в страницы одного размера.
+    """
     if not paths:
         raise ValueError("No images provided")
 
-    images: list[Image.Image] = []
-    max_w = max_h = 0
-    for path in paths:
-        with Image.open(path) as img:
-            if img.mode != "RGB":
-                img = img.convert("RGB")
-            img.load()
-            max_w = max(max_w, img.width)
-            max_h = max(max_h, img.height)
-            images.append(img)
-
-    normalized = [
-        ImageOps.pad(img, (max_w, max_h), color=(255, 255, 255))
-        if img.size != (max_w, max_h)
-        else img
-        for img in images
-    ]
-
     tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf")
-    first, *rest = normalized
-    first.save(tmp.name, save_all=True, append_images=rest, format="PDF")
-    tmp_path = Path(tmp.name)
     tmp.close()
+    tmp_path = Path(tmp.name)
+    try:
+        with PdfImageWriter(tmp_path, page_size=page_size) as writer:
+            for path in paths:
+                writer.add_image(path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
     return tmp_path
 
 
 __all__ = [
     "UnsupportedFileType",
+    "Source",
+    "ExtractionBudget",
+    "ExtractionResult",
+    "PageReport",
+    "SheetSummary",
+    "PdfImageWriter",
+    "PAGE_SIZES",
+    "classify_page",
+    "open_pdf",
+    "render_page",
+    "extract_document",
     "extract_text",
+    "iter_text",
+    "extraction_cache_stats",
+    "store_document_text",
+    "load_text_layer",
+    "share_ocr_threads",
     "register_parser",
     "extract_text_txt",
     "extract_text_md",
@@ -260,6 +1067,15 @@ __all__ = [
     "extract_text_csv",
     "extract_text_xls",
     "extract_text_xlsx",
+    "iter_text_txt",
+    "iter_text_md",
+    "iter_text_pdf",
+    "iter_text_tiff",
+    "iter_text_docx",
+    "iter_text_docx_python",
+    "iter_text_csv",
+    "iter_text_xls",
+    "iter_text_xlsx",
     "merge_images_to_pdf",
     "parse_mrz",
     "translate_text",
@@ -305,18 +1121,35 @@ async def translate_text(
     api_key: str | None = None,
     base_url: str | None = None,
 ) -> str:
-    """Перевести *text* на язык ``target_lang`` с помощью OpenRouter."""
+    """Перевести *text* на язык ``target_lang`` с помощью OpenRouter.
+
+    Текст целиком, без удаления строк, делится на части не больше
+    ``config.llm_translate_chunk_tokens`` токенов
+    (см. :func:`utils.text_budget.split_text`); части переводятся
+    параллельно, не больше ``config.openrouter_max_connections`` запросов
+    одновременно, и склеиваются по порядку. Пустой текст не переводится.
+    """
     from services.openrouter import OpenRouterError, chat
 
-    prompt = f"Translate the following text to {target_lang}:\n{text}"
+    chunks = split_text(text, config.llm_translate_chunk_tokens)
+    if not chunks:
+        return ""
+    semaphore = asyncio.Semaphore(max(1, config.openrouter_max_connections))
+
+    async def translate(chunk: str) -> str:
+        prompt = f"Translate the following text to {target_lang}:\n{chunk}"
+        async with semaphore:
+            reply, _, _ = await chat(
+                messages=[{"role": "user", "content": prompt}],
+                model=model,
+                api_key=api_key,
+                base_url=base_url,
+            )
+        return reply
+
     try:
-        reply, _, _ = await chat(
-            messages=[{"role": "user", "content": prompt}],
-            model=model,
-            api_key=api_key,
-            base_url=base_url,
-        )
+        replies = await asyncio.gather(*(translate(chunk) for chunk in chunks))
     except OpenRouterError as exc:
         logger.error("Translation request failed: %s", exc)
         raise RuntimeError("Translation request failed") from exc
-    return reply
+    return "\n".join(replies)
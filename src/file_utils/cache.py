@@ -0,0 +1,74 @@
+"""Постоянный кэш извлечённого текста.
+
+Ключ кэша строится по содержимому файла (SHA-256), версии парсеров, языку OCR
+и параметрам распознавания, поэтому повторная загрузка того же документа не
+запускает OCR заново. Записи хранятся в SQLite (см. :mod:`utils.sqlite_lru`) и
+вытесняются по принципу LRU, когда суммарный объём текста превышает предел.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+from pathlib import Path
+from typing import Any, Optional, Union
+
+from config import config
+from utils.sqlite_lru import SQLiteLRU
+
+_DEFAULT_PATH = Path(__file__).with_name("extraction_cache.sqlite")
+_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_file(path: Union[str, Path]) -> str:
+    """Посчитать SHA-256 содержимого файла, читая его блоками."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hash_bytes(data: bytes) -> str:
+    """Посчитать SHA-256 содержимого, уже находящегося в памяти."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def make_key(content_hash: str, *, version: str, language: str | None = None, **params: Any) -> str:
+    """Сформировать ключ кэша из хэша содержимого и параметров извлечения."""
+    payload = json.dumps(
+        {"hash": content_hash, "version": version, "language": language, "params": params},
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ExtractionCache(SQLiteLRU):
+    """Кэш текста на SQLite с вытеснением по давности использования.
+
+    Значение записи — сам извлечённый текст; хранение, вытеснение и счётчики
+    обращений реализует :class:`utils.sqlite_lru.SQLiteLRU`.
+    """
+
+
+_cache: ExtractionCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_extraction_cache() -> Optional[ExtractionCache]:
+    """Вернуть общий кэш извлечения или ``None``, если кэш отключён."""
+    global _cache
+    if not config.extraction_cache_enabled:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = ExtractionCache(
+                config.extraction_cache_path or _DEFAULT_PATH,
+                config.extraction_cache_max_bytes,
+            )
+        return _cache
+
+
+__all__ = ["ExtractionCache", "get_extraction_cache", "hash_bytes", "hash_file", "make_key"]
@@ -0,0 +1,84 @@
+"""Параметры и результат извлечения текста."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from config import config
+
+from .spreadsheet import SheetSummary
+
+
+@dataclass(frozen=True)
+class ExtractionBudget:
+    """Ограничения на объём извлечения.
+
+    :param max_chars: максимальное число символов текста.
+    :param max_pages: максимальное число страниц (PDF, многостраничные изображения).
+    :param max_seconds: время, после которого новые страницы не обрабатываются.
+    :param sample_rows: из листов таблиц (CSV, XLS, XLSX) берутся заголовок,
+        первые, последние и столько же случайных строк из середины.
+    """
+
+    max_chars: Optional[int] = None
+    max_pages: Optional[int] = None
+    max_seconds: Optional[float] = None
+    sample_rows: Optional[int] = None
+
+    @property
+    def unlimited(self) -> bool:
+        return (
+            self.max_chars is None
+            and self.max_pages is None
+            and self.max_seconds is None
+            and self.sample_rows is None
+        )
+
+    @classmethod
+    def from_config(cls) -> Optional["ExtractionBudget"]:
+        """Бюджет из настроек или ``None``, если ограничения не заданы."""
+        budget = cls(
+            max_chars=config.extract_max_chars,
+            max_pages=config.extract_max_pages,
+            max_seconds=config.extract_max_seconds,
+            sample_rows=config.extract_sample_rows,
+        )
+        return None if budget.unlimited else budget
+
+
+@dataclass
+class PageReport:
+    """Как была обработана страница документа.
+
+    :param number: номер страницы, начиная с 1.
+    :param kind: ``"text"`` — взят текстовый слой, ``"image"`` — распознана
+        через OCR, ``"blank"`` — пустая страница, пропущена.
+    :param chars: число извлечённых символов.
+    :param ocr_tier: для страниц с OCR — ``"raw"`` (распознана как есть) или
+        ``"preprocessed"`` (после предобработки из-за низкой уверенности).
+    :param confidence: средняя уверенность OCR (0–100), если измерялась.
+    """
+
+    number: int
+    kind: str
+    chars: int = 0
+    ocr_tier: Optional[str] = None
+    confidence: Optional[float] = None
+
+
+@dataclass
+class ExtractionResult:
+    """Извлечённый текст и признак того, что документ прочитан целиком.
+
+    Для PDF ``pages`` содержит отчёт по обработанным страницам, для таблиц
+    ``sheets`` — сводку по листам; при попадании в кэш списки пусты.
+    """
+
+    text: str
+    complete: bool = True
+    pages: List[PageReport] = field(default_factory=list)
+    sheets: List[SheetSummary] = field(default_factory=list)
+
+
+__all__ = ["ExtractionBudget", "ExtractionResult", "PageReport"]
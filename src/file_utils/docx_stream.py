@@ -0,0 +1,120 @@
+"""Потоковое извлечение текста из DOCX без python-docx.
+
+Документ читается прямо из ZIP-архива: колонтитулы (``word/header*.xml``,
+``word/footer*.xml``) и основной текст (``word/document.xml``) разбираются
+инкрементально через ``iterparse``, а обработанные элементы сразу
+освобождаются. Текст выдаётся в порядке документа: абзацы — по одному,
+строки таблиц — ячейками через табуляцию.
+"""
+
+from __future__ import annotations
+
+import re
+import zipfile
+from pathlib import Path
+from typing import IO, Iterator, List, Union
+from xml.etree.ElementTree import iterparse
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_P = _W + "p"
+_T = _W + "t"
+_TAB = _W + "tab"
+_BR = _W + "br"
+_CR = _W + "cr"
+_TBL = _W + "tbl"
+_TR = _W + "tr"
+_TC = _W + "tc"
+# Элементы, непосредственно содержащие абзацы и таблицы части документа
+_CONTAINERS = {_W + "body", _W + "hdr", _W + "ftr"}
+
+_PART_RE = re.compile(r"word/(header|footer)(\d*)\.xml$")
+
+
+def _iter_part(stream: IO[bytes]) -> Iterator[str]:
+    """Выдавать абзацы и строки таблиц одной XML-части документа."""
+    paragraphs: List[List[str]] = []  # абзацы могут быть вложены (надписи)
+    cells: List[List[str]] = []
+    rows: List[List[str]] = []
+    container = None
+
+    for event, elem in iterparse(stream, events=("start", "end")):
+        tag = elem.tag
+        if event == "start":
+            if tag in _CONTAINERS:
+                container = elem
+            elif tag == _P:
+                paragraphs.append([])
+            elif tag == _TC:
+                cells.append([])
+            elif tag == _TR:
+                rows.append([])
+            continue
+
+        if tag == _T:
+            if paragraphs and elem.text:
+                paragraphs[-1].append(elem.text)
+        elif tag == _TAB:
+            if paragraphs:
+                paragraphs[-1].append("\t")
+        elif tag in (_BR, _CR):
+            if paragraphs:
+                paragraphs[-1].append("\n")
+        elif tag == _P:
+            text = "".join(paragraphs.pop())
+            elem.clear()
+            if paragraphs:
+                # Абзац надписи встраивается в текст внешнего абзаца
+                if text:
+                    paragraphs[-1].append(text)
+            elif cells:
+                cells[-1].append(text)
+            else:
+                if container is not None:
+                    container.clear()
+                yield text
+        elif tag == _TC:
+            text = " ".join(part for part in cells.pop() if part)
+            if rows:
+                rows[-1].append(text)
+        elif tag == _TR:
+            line = "\t".join(rows.pop())
+            elem.clear()
+            if cells:
+                # Строка вложенной таблицы становится частью внешней ячейки
+                cells[-1].append(line)
+            else:
+                yield line
+        elif tag == _TBL:
+            elem.clear()
+            if not rows and container is not None:
+                container.clear()
+
+
+def _part_order(name: str) -> tuple[int, int]:
+    match = _PART_RE.match(name)
+    assert match is not None
+    return (0 if match.group(1) == "header" else 1, int(match.group(2) or 0))
+
+
+def iter_docx_text(source: Union[str, Path, IO[bytes]]) -> Iterator[str]:
+    """Извлекать текст DOCX по абзацам и строкам таблиц.
+
+    Верхние колонтитулы выдаются перед основным текстом, нижние — после
+    него; пустые абзацы колонтитулов пропускаются.
+    """
+    with zipfile.ZipFile(source) as archive:
+        parts = sorted((n for n in archive.namelist() if _PART_RE.match(n)), key=_part_order)
+        headers = [n for n in parts if "/header" in n]
+        footers = [n for n in parts if "/footer" in n]
+
+        for name in headers:
+            with archive.open(name) as stream:
+                yield from (text for text in _iter_part(stream) if text.strip())
+        with archive.open("word/document.xml") as stream:
+            yield from _iter_part(stream)
+        for name in footers:
+            with archive.open(name) as stream:
+                yield from (text for text in _iter_part(stream) if text.strip())
+
+
+__all__ = ["iter_docx_text"]
@@ -1,10 +1,14 @@
 """OCR utilities for image files."""
 
+from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
-from typing import Union
+from typing import Any, BinaryIO, Dict, FrozenSet, List, Optional, Tuple, Union
 import logging
+import os
 
 from config import config
+from .tesseract_engine import TesseractEngineError, acquire_engine, engine_available
 
 try:
     from PIL import Image
@@ -20,29 +24,339 @@ logger = logging.getLogger(__name__)
 if config.tesseract_cmd:
     pytesseract.pytesseract.tesseract_cmd = config.tesseract_cmd
 
+# Страницы распознаются параллельно, поэтому внутренние потоки OpenMP
+# в каждом процессе tesseract только мешают друг другу.
+os.environ.setdefault("OMP_THREAD_LIMIT", "1")
 
-def extract_text_image(image_path: Union[str, Path], language: str = "eng") -> str:
-    """Extract text from an image using Tesseract OCR.
 
-    :param image_path: Path to the image file.
-    :param language: Language for OCR (default 'eng').
+_TESSERACT_MISSING = (
+    "Tesseract OCR executable not found. Please install Tesseract and ensure it's in PATH."
+)
+
+# Языки, которые добавляются к запрошенным для найденной письменности.
+# Документы на кириллице почти всегда содержат латиницу (имена, коды).
+_SCRIPT_LANGUAGES = {
+    "Cyrillic": ("rus", "eng"),
+    "Latin": ("eng",),
+    "Greek": ("ell",),
+    "Arabic": ("ara",),
+    "Hebrew": ("heb",),
+    "Han": ("chi_sim",),
+    "Japanese": ("jpn",),
+    "Korean": ("kor",),
+}
+
+# Сторона уменьшенной копии страницы для определения ориентации
+_OSD_MAX_SIDE = 1600
+# Минимальная уверенность OSD, при которой результат учитывается
+_MIN_ORIENTATION_CONF = 2.0
+_MIN_SCRIPT_CONF = 1.0
+
+
+@dataclass(frozen=True)
+class PageLayout:
+    """Результат определения ориентации и письменности страницы.
+
+    :param rotate: угол поворота по часовой стрелке, выпрямляющий страницу.
+    :param script: письменность (``"Latin"``, ``"Cyrillic"``…) или ``None``.
+    """
+
+    rotate: int = 0
+    script: Optional[str] = None
+
+
+@lru_cache(maxsize=1)
+def installed_languages() -> Optional[FrozenSet[str]]:
+    """Языки, для которых установлены traineddata (``None`` — неизвестно)."""
+    prefix = config.tessdata_prefix or os.environ.get("TESSDATA_PREFIX")
+    if prefix and Path(prefix).is_dir():
+        return frozenset(p.stem for p in Path(prefix).glob("*.traineddata"))
+    try:
+        return frozenset(pytesseract.get_languages(config=""))
+    except Exception:
+        logger.debug("Cannot list Tesseract languages", exc_info=True)
+        return None
+
+
+def choose_language(language: str, script: Optional[str] = None) -> str:
+    """Собрать набор языков для распознавания, например ``"rus+eng"``.
+
+    Первыми идут языки письменности *script*, за ними — запрошенные; из них
+    остаются только установленные. Если не осталось ни одного, используется
+    ``eng``.
+    """
+    wanted = list(_SCRIPT_LANGUAGES.get(script or "", ()))
+    wanted += [lang for lang in language.split("+") if lang]
+    installed = installed_languages()
+    chosen = []
+    for lang in wanted:
+        if lang in chosen or (installed is not None and lang not in installed):
+            continue
+        chosen.append(lang)
+    if not chosen:
+        if wanted:
+            logger.warning("Tesseract languages '%s' unavailable, using 'eng'", language)
+        return "eng"
+    return "+".join(chosen)
+
+
+def _downscale(image: "Image.Image") -> "Image.Image":
+    if max(image.size) <= _OSD_MAX_SIDE:
+        return image
+    small = image.copy()
+    small.thumbnail((_OSD_MAX_SIDE, _OSD_MAX_SIDE))
+    return small
+
+
+def detect_layout(image: "Image.Image") -> Optional[PageLayout]:
+    """Определить ориентацию и письменность по уменьшенной копии *image*.
+
+    Нужны traineddata ``osd``; если их нет или на странице слишком мало
+    текста, возвращается ``None``. Результаты с низкой уверенностью
+    не учитываются.
+    """
+    installed = installed_languages()
+    if installed is not None and "osd" not in installed:
+        return None
+    small = _downscale(image)
+    try:
+        if engine_available():
+            with acquire_engine("osd", 0) as engine:
+                result = engine.detect_orientation_script(small)
+            if result is None:
+                return None
+            rotate, orient_conf, script, script_conf = result
+        else:
+            osd = pytesseract.image_to_osd(small, output_type=pytesseract.Output.DICT)
+            rotate, orient_conf = osd["rotate"], osd["orientation_conf"]
+            script, script_conf = osd["script"], osd["script_conf"]
+    except (pytesseract.TesseractError, TesseractEngineError, KeyError, ValueError):
+        # Слишком мало текста или нет osd.traineddata
+        logger.debug("Orientation and script detection failed", exc_info=True)
+        return None
+    layout = PageLayout(
+        rotate=int(rotate) % 360 if orient_conf >= _MIN_ORIENTATION_CONF else 0,
+        script=script if script_conf >= _MIN_SCRIPT_CONF else None,
+    )
+    logger.debug(
+        "Detected script %s (%.1f), rotation %s (%.1f)", script, script_conf, rotate, orient_conf
+    )
+    return layout
+
+
+# Слово и его рамка (x0, y0, x1, y1) в долях ширины и высоты изображения
+Word = Tuple[float, float, float, float, str]
+
+
+@dataclass
+class OcrResult:
+    """Распознанный текст страницы и то, как он получен.
+
+    :param text: распознанный текст.
+    :param confidence: средняя уверенность Tesseract по словам (0–100).
+    :param language: набор языков, с которым выполнено распознавание.
+    :param rotate: на сколько градусов по часовой стрелке повёрнута страница.
+    :param tier: ``"raw"`` — исходное изображение, ``"preprocessed"`` —
+        после предобработки :mod:`ocr_pipeline`.
+    :param stages: применённые стадии предобработки.
+    :param words: слова с положением на выпрямленной странице (если
+        запрошены), см. :func:`words_from_data`.
+    """
+
+    text: str
+    confidence: float
+    language: str
+    rotate: int = 0
+    tier: str = "raw"
+    stages: Tuple[str, ...] = ()
+    words: Tuple[Word, ...] = ()
+
+
+def _recognize(image: "Image.Image", language: str, psm: int) -> str:
+    if engine_available():
+        with acquire_engine(language, psm) as engine:
+            return engine.recognize(image)
+    config_args = f"--psm {psm}" if psm != 3 else ""
+    return pytesseract.image_to_string(image, lang=language, config=config_args)
+
+
+def _text_from_data(data: Dict[str, List[Any]]) -> Tuple[str, float]:
+    """Собрать текст и среднюю уверенность из вывода ``image_to_data``."""
+    lines: List[str] = []
+    confidences: List[float] = []
+    current: Optional[Tuple[int, int, int]] = None
+    paragraph: Optional[Tuple[int, int]] = None
+    for idx, word in enumerate(data["text"]):
+        conf = float(data["conf"][idx])
+        if not str(word).strip() or conf < 0:
+            continue
+        confidences.append(conf)
+        key = (data["block_num"][idx], data["par_num"][idx], data["line_num"][idx])
+        if key != current:
+            if paragraph is not None and key[:2] != paragraph:
+                lines.append("")
+            lines.append(str(word))
+            current, paragraph = key, key[:2]
+        else:
+            lines[-1] += f" {word}"
+    confidence = sum(confidences) / len(confidences) if confidences else 0.0
+    return "\n".join(lines), confidence
+
+
+def words_from_data(data: Dict[str, List[Any]], size: Tuple[int, int]) -> Tuple[Word, ...]:
+    """Рамки слов из вывода ``image_to_data`` в долях размера изображения *size*.
+
+    Доли не зависят от масштаба, поэтому рамки с предобработанной копии
+    страницы подходят и для исходной.
+    """
+    width, height = size
+    words: List[Word] = []
+    for idx, word in enumerate(data["text"]):
+        word = str(word).strip()
+        if not word or float(data["conf"][idx]) < 0:
+            continue
+        left, top = int(data["left"][idx]), int(data["top"][idx])
+        right, bottom = left + int(data["width"][idx]), top + int(data["height"][idx])
+        words.append(
+            (
+                round(left / width, 5),
+                round(top / height, 5),
+                round(right / width, 5),
+                round(bottom / height, 5),
+                word,
+            )
+        )
+    return tuple(words)
+
+
+def _recognize_data(image: "Image.Image", language: str, psm: int) -> Dict[str, List[Any]]:
+    if engine_available():
+        with acquire_engine(language, psm) as engine:
+            return engine.recognize_data(image)
+    config_args = f"--psm {psm}" if psm != 3 else ""
+    return pytesseract.image_to_data(
+        image, lang=language, config=config_args, output_type=pytesseract.Output.DICT
+    )
+
+
+def _recognize_with_confidence(image: "Image.Image", language: str, psm: int) -> Tuple[str, float]:
+    if engine_available():
+        with acquire_engine(language, psm) as engine:
+            return engine.recognize_with_confidence(image)
+    config_args = f"--psm {psm}" if psm != 3 else ""
+    data = pytesseract.image_to_data(
+        image, lang=language, config=config_args, output_type=pytesseract.Output.DICT
+    )
+    return _text_from_data(data)
+
+
+def _prepare(
+    image: "Image.Image", language: str, detect: Optional[bool]
+) -> Tuple["Image.Image", str, int]:
+    """Выпрямить страницу и выбрать языки (см. :func:`detect_layout`)."""
+    layout = None
+    if config.ocr_detect_layout if detect is None else detect:
+        layout = detect_layout(image)
+    rotate = layout.rotate if layout is not None else 0
+    if rotate:
+        image = image.rotate(-rotate, expand=True)
+    return image, choose_language(language, layout.script if layout else None), rotate
+
+
+def ocr_image(
+    image: "Image.Image",
+    language: str = "eng",
+    psm: int = 3,
+    detect: Optional[bool] = None,
+) -> str:
+    """Extract text from an in-memory image using Tesseract OCR.
+
+    Если доступна ``libtesseract``, используется «тёплый» движок из пула
+    (см. :mod:`file_utils.tesseract_engine`), иначе — процесс ``tesseract``
+    через ``pytesseract``.
+
+    Перед распознаванием по уменьшенной копии определяются поворот и
+    письменность (:func:`detect_layout`, отключается ``detect=False`` или
+    ``OCR_DETECT_LAYOUT=false``). Страница поворачивается, а к языкам
+    добавляются языки найденной письменности (:func:`choose_language`), так
+    что изображение распознаётся ровно один раз.
+
+    :param image: Pillow image, e.g. a rendered PDF page.
+    :param language: Language for OCR (default 'eng'), e.g. ``"rus+eng"``.
+    :param psm: Tesseract page segmentation mode.
+    :param detect: Detect orientation and script first (default from config).
     :return: Extracted text as a string.
     """
     try:
-        with Image.open(Path(image_path)) as img:
-            return pytesseract.image_to_string(img, lang=language)
+        image, language, _ = _prepare(image, language, detect)
+        return _recognize(image, language, psm)
     except pytesseract.TesseractNotFoundError as exc:
-        raise RuntimeError(
-            "Tesseract OCR executable not found. Please install Tesseract and ensure it's in PATH."
-        ) from exc
-    except pytesseract.TesseractError as exc:
-        if language != "eng":
-            logger.warning(
-                "Tesseract language '%s' unavailable, falling back to 'eng'", language
+        raise RuntimeError(_TESSERACT_MISSING) from exc
+
+
+def ocr_image_result(
+    image: "Image.Image",
+    language: str = "eng",
+    psm: int = 3,
+    detect: Optional[bool] = None,
+    words: bool = False,
+) -> OcrResult:
+    """Как :func:`ocr_image`, но вместе с уверенностью распознавания.
+
+    Уверенность — среднее по словам значение из данных Tesseract
+    (``MeanTextConf`` или ``image_to_data``). При ``words=True`` за тот же
+    проход собираются рамки слов (:attr:`OcrResult.words`), по которым
+    потом строится текстовый слой PDF без повторного распознавания.
+    """
+    try:
+        image, language, rotate = _prepare(image, language, detect)
+        if words:
+            data = _recognize_data(image, language, psm)
+            text, confidence = _text_from_data(data)
+            return OcrResult(
+                text, float(confidence), language, rotate, words=words_from_data(data, image.size)
             )
-            try:
-                with Image.open(Path(image_path)) as img:
-                    return pytesseract.image_to_string(img, lang="eng")
-            except pytesseract.TesseractError:
-                pass
-        raise exc
+        text, confidence = _recognize_with_confidence(image, language, psm)
+    except pytesseract.TesseractNotFoundError as exc:
+        raise RuntimeError(_TESSERACT_MISSING) from exc
+    return OcrResult(text, float(confidence), language, rotate)
+
+
+def ocr_image_pdf(
+    image: "Image.Image",
+    language: str = "eng",
+    psm: int = 3,
+    detect: Optional[bool] = None,
+) -> Tuple[bytes, int]:
+    """Распознать изображение и вернуть невидимый текстовый слой в виде PDF.
+
+    Используется PDF-рендерер Tesseract с ``textonly_pdf=1``: одностраничный
+    PDF содержит только невидимый текст с координатами слов, без самого
+    изображения. Рендерер есть только у процесса ``tesseract``, поэтому пул
+    движков здесь не используется. Возвращает PDF и угол, на который
+    страница была повёрнута по часовой стрелке перед распознаванием (слой
+    построен для повёрнутой страницы).
+    """
+    try:
+        image, language, rotate = _prepare(image, language, detect)
+        pdf = pytesseract.image_to_pdf_or_hocr(
+            image, lang=language, config=f"--psm {psm} -c textonly_pdf=1", extension="pdf"
+        )
+    except pytesseract.TesseractNotFoundError as exc:
+        raise RuntimeError(_TESSERACT_MISSING) from exc
+    return pdf, rotate
+
+
+def extract_text_image(image_path: Union[str, Path, BinaryIO], language: str = "eng") -> str:
+    """Extract text from an image using Tesseract OCR.
+
+    :param image_path: Path to the image file or a binary file object.
+    :param language: Language for OCR (default 'eng').
+    :return: Extracted text as a string.
+    """
+    if isinstance(image_path, (str, Path)):
+        image_path = Path(image_path)
+    else:
+        image_path.seek(0)
+    with Image.open(image_path) as img:
+        return ocr_image(img, language=language)
@@ -0,0 +1,341 @@
+"""Нормализация изображений перед архивированием.
+
+Снимки с телефона (12–48 Мп) и сканы в полном разрешении замедляют работу с
+архивом, предпросмотр и повторное распознавание. Нормализация уменьшает
+изображение до заданного DPI для определённого формата бумаги, переводит
+чистые сканы в оттенки серого или в чёрно-белые и пересжимает результат.
+Изображение, которое уже укладывается в целевой размер и режим, не
+переписывается, поэтому повторная нормализация ничего не меняет.
+"""
+
+from __future__ import annotations
+
+import logging
+import shutil
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+from PIL import Image, ImageChops, ImageFilter, ImageOps
+
+from config import config
+
+logger = logging.getLogger(__name__)
+
+NORMALIZABLE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".tif", ".tiff"}
+
+# Форматы бумаги в дюймах (короткая сторона, длинная сторона)
+_PAPER_INCHES: Dict[str, Tuple[float, float]] = {
+    "a4": (8.27, 11.69),
+    "a5": (5.83, 8.27),
+    "letter": (8.5, 11.0),
+    "legal": (8.5, 14.0),
+}
+# Допустимое отклонение пропорций снимка от формата бумаги
+_PAPER_TOLERANCE = 0.03
+# Формат, по которому ограничивается размер снимка неизвестных пропорций
+_FALLBACK_PAPER = "a4"
+# Сторона миниатюры для анализа цвета и яркости
+_ANALYSIS_SIDE = 512
+# Цветность (max(R,G,B) - min(R,G,B)), выше которой пиксель считается цветным
+_CHROMA_THRESHOLD = 40
+# Доля цветных пикселей, при которой изображение остаётся цветным
+_COLOR_SHARE = 0.01
+# Доля полутонов, при которой чёрно-белое изображение ещё считается чистым
+_MIDTONE_SHARE = 0.03
+# Перепад яркости в окне 3×3, начиная с которого пиксель считается краем
+# штриха: сглаженные края текста не должны считаться полутонами
+_EDGE_SPREAD = 64
+_EXIF_ORIENTATION = 0x0112
+
+
+@dataclass(frozen=True)
+class NormalizeSettings:
+    """Параметры нормализации.
+
+    :param target_dpi: разрешение, до которого уменьшаются изображения.
+    :param jpeg_quality: качество JPEG при пересжатии.
+    :param keep_original: сохранить исходный файл рядом с результатом.
+    """
+
+    target_dpi: int = 200
+    jpeg_quality: int = 80
+    keep_original: bool = False
+
+    @classmethod
+    def from_config(cls) -> "NormalizeSettings":
+        return cls(
+            target_dpi=config.image_target_dpi,
+            jpeg_quality=config.image_jpeg_quality,
+            keep_original=config.image_keep_original,
+        )
+
+
+@dataclass
+class NormalizeResult:
+    """Отчёт о нормализации одного файла.
+
+    :param path: путь к итоговому файлу (расширение может смениться).
+    :param original_bytes: размер исходного файла.
+    :param bytes: размер итогового файла.
+    :param original_size: размер исходного изображения в пикселях.
+    :param size: размер итогового изображения в пикселях.
+    :param mode: ``"color"``, ``"gray"`` или ``"bilevel"``.
+    :param paper: определённый формат бумаги или ``None``.
+    :param original_path: путь к сохранённому оригиналу.
+    :param changed: файл был переписан.
+    """
+
+    path: Path
+    original_bytes: int
+    bytes: int
+    original_size: Tuple[int, int]
+    size: Tuple[int, int]
+    mode: str
+    paper: Optional[str] = None
+    original_path: Optional[Path] = None
+    changed: bool = False
+
+    @property
+    def saved_bytes(self) -> int:
+        return self.original_bytes - self.bytes
+
+    def describe(self) -> str:
+        if not self.changed:
+            return f"{self.path.name}: без изменений ({self.original_bytes} байт)"
+        share = self.saved_bytes / self.original_bytes * 100 if self.original_bytes else 0.0
+        return (
+            f"{self.path.name}: {self.original_bytes} → {self.bytes} байт (−{share:.0f}%), "
+            f"{self.original_size[0]}x{self.original_size[1]} → {self.size[0]}x{self.size[1]}, "
+            f"{self.mode}"
+        )
+
+    def to_dict(self) -> Dict[str, object]:
+        data = asdict(self)
+        data["path"] = str(self.path)
+        data["original_path"] = str(self.original_path) if self.original_path else None
+        data["saved_bytes"] = self.saved_bytes
+        return data
+
+
+def detect_paper(width: int, height: int) -> Optional[str]:
+    """Формат бумаги по пропорциям изображения или ``None``."""
+    short, long = sorted((width, height))
+    if not short:
+        return None
+    ratio = long / short
+    for name, (paper_short, paper_long) in _PAPER_INCHES.items():
+        if abs(ratio / (paper_long / paper_short) - 1) <= _PAPER_TOLERANCE:
+            return name
+    return None
+
+
+def target_size(
+    size: Tuple[int, int], dpi: Optional[float], target_dpi: int
+) -> Tuple[Tuple[int, int], Optional[str]]:
+    """Размер изображения после уменьшения до *target_dpi*.
+
+    Если пропорции совпадают с форматом бумаги, изображение приводится к
+    размеру этого формата при *target_dpi*. Иначе учитывается DPI из файла,
+    а без него длинная сторона ограничивается длинной стороной A4.
+    Изображения не увеличиваются. Возвращает новый размер и формат бумаги.
+    """
+    width, height = size
+    paper = detect_paper(width, height)
+    if paper is not None:
+        limit = _PAPER_INCHES[paper][1] * target_dpi
+        scale = limit / max(width, height)
+    elif dpi:
+        scale = target_dpi / dpi
+    else:
+        scale = _PAPER_INCHES[_FALLBACK_PAPER][1] * target_dpi / max(width, height)
+    if scale >= 1:
+        return size, paper
+    return (max(1, round(width * scale)), max(1, round(height * scale))), paper
+
+
+def _otsu(histogram: List[int]) -> int:
+    total = sum(histogram)
+    weighted = sum(i * count for i, count in enumerate(histogram))
+    best, threshold = -1.0, 127
+    seen = seen_weighted = 0
+    for level, count in enumerate(histogram):
+        seen += count
+        if not seen or seen == total:
+            continue
+        seen_weighted += level * count
+        mean_low = seen_weighted / seen
+        mean_high = (weighted - seen_weighted) / (total - seen)
+        variance = seen * (total - seen) * (mean_low - mean_high) ** 2
+        if variance > best:
+            best, threshold = variance, level
+    return threshold
+
+
+def classify_content(image: Image.Image) -> Tuple[str, int]:
+    """Определить, цветное ли изображение, серое или чисто чёрно-белое.
+
+    Анализируется уменьшенная копия: изображение серое, если цветных пикселей
+    меньше 1 %, и чёрно-белое, если вдобавок почти нет полутонов. Пиксели
+    на краях штрихов (сглаживание, усреднение при уменьшении) полутонами не
+    считаются. Возвращает режим и порог бинаризации (Оцу).
+    """
+    if image.mode == "1":
+        return "bilevel", 127
+    if image.mode not in ("L", "RGB", "RGBA", "CMYK"):
+        image = image.convert("RGB")
+    factor = max(1, max(image.size) // _ANALYSIS_SIDE)
+    thumb = image.reduce(factor) if factor > 1 else image
+    if thumb.mode != "L":
+        rgb = thumb.convert("RGB")
+        r, g, b = rgb.split()
+        chroma = ImageChops.subtract(
+            ImageChops.lighter(ImageChops.lighter(r, g), b),
+            ImageChops.darker(ImageChops.darker(r, g), b),
+        )
+        histogram = chroma.histogram()
+        if sum(histogram[_CHROMA_THRESHOLD:]) > _COLOR_SHARE * sum(histogram):
+            return "color", 127
+        thumb = rgb.convert("L")
+    threshold = _otsu(thumb.histogram())
+    spread = ImageChops.subtract(
+        thumb.filter(ImageFilter.MaxFilter(3)), thumb.filter(ImageFilter.MinFilter(3))
+    )
+    flat = spread.point(lambda value: 255 if value < _EDGE_SPREAD else 0)
+    histogram = thumb.histogram(mask=flat)
+    counted = sum(histogram)
+    midtones = sum(histogram[threshold // 2 : (threshold + 255) // 2])
+    # Если краёв больше половины (шум, растр), это не чистый скан
+    if counted * 2 >= thumb.width * thumb.height and midtones <= _MIDTONE_SHARE * counted:
+        return "bilevel", threshold
+    return "gray", threshold
+
+
+def _save(
+    image: Image.Image, path: Path, fmt: str, settings: NormalizeSettings, dpi: Optional[float]
+) -> None:
+    kwargs = {"dpi": (dpi, dpi)} if dpi else {}
+    if fmt == "JPEG":
+        image.save(path, format="JPEG", quality=settings.jpeg_quality, optimize=True, **kwargs)
+    elif fmt == "TIFF":
+        compression = "group4" if image.mode == "1" else "tiff_adobe_deflate"
+        image.save(path, format="TIFF", compression=compression, **kwargs)
+    else:
+        image.save(path, format="PNG", optimize=True, **kwargs)
+
+
+def _is_normalized(image: Image.Image, mode: str) -> bool:
+    if mode == "color":
+        return image.mode in ("RGB", "RGBA", "P", "CMYK")
+    if mode == "gray":
+        return image.mode == "L"
+    return image.mode == "1"
+
+
+def normalize_image_file(
+    path: Union[str, Path],
+    settings: Optional[NormalizeSettings] = None,
+    original_dir: Optional[Union[str, Path]] = None,
+    output_dir: Optional[Union[str, Path]] = None,
+) -> NormalizeResult:
+    """Нормализовать изображение на месте или в каталог *output_dir*.
+
+    JPEG остаётся JPEG, PNG и TIFF сохраняются без потерь; чисто чёрно-белые
+    изображения записываются с 1 битом на пиксель (JPEG в этом случае
+    становится PNG). Если результат не меньше исходного файла, файл не
+    меняется. При ``keep_original`` исходный файл копируется в
+    ``<имя>.original<расширение>`` в каталоге *original_dir* (по умолчанию —
+    рядом с файлом). С *output_dir* исходный файл не меняется, а результат
+    записывается в этот каталог под тем же именем; если нормализация ничего
+    не дала, в отчёте остаётся путь к исходному файлу.
+    """
+    path = Path(path)
+    settings = settings or NormalizeSettings.from_config()
+    original_bytes = path.stat().st_size
+    with Image.open(path) as img:
+        fmt = img.format or "PNG"
+        dpi = img.info.get("dpi", (0, 0))[0] or None
+        has_alpha = img.mode in ("RGBA", "LA", "PA") or "transparency" in img.info
+        original_size = img.size
+        new_size, paper = target_size(img.size, dpi, settings.target_dpi)
+        if fmt == "JPEG" and new_size != img.size:
+            # Декодер JPEG сразу уменьшает изображение в 2–8 раз, не
+            # распаковывая его в полном разрешении
+            img.draft(img.mode, new_size)
+        # exif_transpose возвращает копию даже без поворота
+        transposed = img.getexif().get(_EXIF_ORIENTATION, 1) not in (0, 1)
+        image = ImageOps.exif_transpose(img) if transposed else img
+        rotated = image.size != img.size
+        if rotated:
+            new_size = new_size[::-1]
+        mode, threshold = ("color", 127) if has_alpha else classify_content(image)
+        result = NormalizeResult(
+            path=path,
+            original_bytes=original_bytes,
+            bytes=original_bytes,
+            original_size=original_size,
+            size=original_size,
+            mode=mode,
+            paper=paper,
+        )
+        if image is img and new_size == original_size and _is_normalized(img, mode):
+            return result
+
+        if mode == "color":
+            if image.mode not in ("RGB", "RGBA"):
+                image = image.convert("RGBA" if has_alpha else "RGB")
+        else:
+            image = image.convert("L")
+        if new_size != image.size:
+            image = image.resize(new_size, Image.LANCZOS)
+        if mode == "bilevel":
+            image = image.point(lambda v: 255 if v > threshold else 0).convert("1", dither=Image.NONE)
+            if fmt == "JPEG":
+                fmt = "PNG"
+        if fmt not in ("JPEG", "TIFF"):
+            fmt = "PNG"
+    resized = image.size not in (original_size, original_size[::-1])
+    # После уменьшения разрешение известно, только если было известно исходное
+    # или формат бумаги
+    out_dpi = (settings.target_dpi if paper or dpi else None) if resized else dpi
+
+    suffix = ".png" if fmt == "PNG" and path.suffix.lower() != ".png" else path.suffix
+    target_dir = Path(output_dir) if output_dir is not None else path.parent
+    target_dir.mkdir(parents=True, exist_ok=True)
+    final_path = target_dir / f"{path.stem}{suffix}"
+    tmp_path = target_dir / f"{path.stem}.normalized{suffix}"
+    try:
+        _save(image, tmp_path, fmt, settings, out_dpi)
+        new_bytes = tmp_path.stat().st_size
+        if new_bytes >= original_bytes:
+            tmp_path.unlink()
+            return result
+        if settings.keep_original and output_dir is None:
+            keep_dir = Path(original_dir) if original_dir else path.parent
+            keep_dir.mkdir(parents=True, exist_ok=True)
+            result.original_path = keep_dir / f"{path.stem}.original{path.suffix}"
+            shutil.copy2(path, result.original_path)
+        tmp_path.replace(final_path)
+        if output_dir is None and final_path != path:
+            path.unlink()
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+    result.path = final_path
+    result.bytes = new_bytes
+    result.size = image.size
+    result.changed = True
+    logger.info("Normalized %s", result.describe())
+    return result
+
+
+__all__ = [
+    "NORMALIZABLE_EXTENSIONS",
+    "NormalizeResult",
+    "NormalizeSettings",
+    "classify_content",
+    "detect_paper",
+    "normalize_image_file",
+    "target_size",
+]
@@ -0,0 +1,256 @@
+"""Потоковая сборка PDF из изображений.
+
+Страницы пишутся в файл по одной: в памяти находится не больше одного
+декодированного изображения, поэтому пик памяти не зависит от числа страниц.
+JPEG в цветовых пространствах Gray, RGB и CMYK встраиваются как есть (фильтр
+``DCTDecode``) без декодирования и повторного сжатия; ориентация из EXIF
+учитывается матрицей размещения на странице. Остальные изображения
+декодируются, выравниваются по EXIF, фон прозрачных заливается белым, и
+результат сжимается в JPEG; чёрно-белые (режим ``1``) хранятся без потерь
+с 1 битом на пиксель. Кадры многостраничного TIFF становятся отдельными
+страницами.
+"""
+
+from __future__ import annotations
+
+import io
+import shutil
+import zlib
+from pathlib import Path
+from typing import BinaryIO, Dict, List, Optional, Tuple, Union
+
+from PIL import Image, ImageOps, ImageSequence
+
+# Размеры страниц в пунктах (1/72 дюйма)
+PAGE_SIZES: Dict[str, Tuple[float, float]] = {
+    "a4": (595.28, 841.89),
+    "a5": (419.53, 595.28),
+    "letter": (612.0, 792.0),
+    "legal": (612.0, 1008.0),
+}
+
+# Разрешение, если в файле оно не записано: пиксель = пункт, как у Pillow
+_DEFAULT_DPI = 72.0
+_JPEG_QUALITY = 90
+_EXIF_ORIENTATION = 0x0112
+_COLOR_SPACES = {"L": "/DeviceGray", "RGB": "/DeviceRGB", "CMYK": "/DeviceCMYK"}
+
+PageSize = Union[str, Tuple[float, float], None]
+
+
+def _num(value: float) -> str:
+    text = f"{value:.4f}".rstrip("0").rstrip(".")
+    return "0" if text in {"", "-0"} else text
+
+
+def _placement(
+    orientation: int, x: float, y: float, width: float, height: float
+) -> Tuple[float, ...]:
+    """Матрица ``cm``, размещающая изображение в прямоугольнике страницы.
+
+    *width* и *height* — размер уже повёрнутого по EXIF изображения. Матрица
+    переводит единичный квадрат изображения (в порядке хранения пикселей) так,
+    чтобы на странице оно выглядело повёрнутым и отражённым согласно тегу
+    ориентации.
+    """
+    w, h = width, height
+    return {
+        1: (w, 0, 0, h, x, y),
+        2: (-w, 0, 0, h, x + w, y),
+        3: (-w, 0, 0, -h, x + w, y + h),
+        4: (w, 0, 0, -h, x, y + h),
+        5: (0, -h, -w, 0, x + w, y + h),
+        6: (0, -h, w, 0, x, y + h),
+        7: (0, h, w, 0, x, y),
+        8: (0, h, -w, 0, x + w, y),
+    }.get(orientation, (w, 0, 0, h, x, y))
+
+
+def _image_dpi(img: Image.Image) -> Tuple[float, float]:
+    dpi = img.info.get("dpi") or (_DEFAULT_DPI, _DEFAULT_DPI)
+    dpi_x, dpi_y = (float(d) if d and d > 0 else _DEFAULT_DPI for d in dpi[:2])
+    return dpi_x, dpi_y
+
+
+def _page_size(page_size: PageSize) -> Optional[Tuple[float, float]]:
+    if page_size is None or isinstance(page_size, tuple):
+        return page_size
+    try:
+        return PAGE_SIZES[page_size.lower()]
+    except KeyError:
+        raise ValueError(f"Unknown page size: {page_size}") from None
+
+
+class PdfImageWriter:
+    """Запись PDF, в котором каждая страница — одно изображение.
+
+    :param path: путь к создаваемому PDF.
+    :param page_size: ``None`` — размер страницы по изображению и его DPI;
+        имя из :data:`PAGE_SIZES` или пара ``(ширина, высота)`` в пунктах —
+        изображение вписывается в страницу с сохранением пропорций и
+        центрируется.
+
+    Используется как контекстный менеджер; без :meth:`close` файл останется
+    неполным.
+    """
+
+    def __init__(self, path: Union[str, Path], page_size: PageSize = None) -> None:
+        self.path = Path(path)
+        self.page_size = _page_size(page_size)
+        self.pages = 0
+        self._file: BinaryIO = open(self.path, "wb")
+        # Смещения объектов; номера 1 и 2 зарезервированы за каталогом и деревом страниц
+        self._offsets: List[int] = [0, 0]
+        self._kids: List[int] = []
+        self._file.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def __enter__(self) -> "PdfImageWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self._file.close()
+
+    # ---------- Объекты PDF ----------
+
+    def _reserve(self) -> int:
+        self._offsets.append(0)
+        return len(self._offsets)
+
+    def _begin(self, number: int) -> None:
+        self._offsets[number - 1] = self._file.tell()
+        self._file.write(f"{number} 0 obj\n".encode("ascii"))
+
+    def _write_object(self, number: int, body: str) -> None:
+        self._begin(number)
+        self._file.write(body.encode("ascii") + b"\nendobj\n")
+
+    def _write_stream(self, number: int, meta: str, data: Union[bytes, BinaryIO], length: int) -> None:
+        self._begin(number)
+        self._file.write(f"<< {meta} /Length {length} >>\nstream\n".encode("ascii"))
+        if isinstance(data, bytes):
+            self._file.write(data)
+        else:
+            shutil.copyfileobj(data, self._file, 1024 * 1024)
+        self._file.write(b"\nendstream\nendobj\n")
+
+    # ---------- Страницы ----------
+
+    def add_image(self, source: Union[str, Path]) -> None:
+        """Добавить изображение отдельной страницей.
+
+        Каждый кадр многостраничного TIFF становится своей страницей; кадры
+        декодируются по одному.
+        """
+        with Image.open(source) as img:
+            if img.format == "JPEG" and img.mode in _COLOR_SPACES:
+                orientation = img.getexif().get(_EXIF_ORIENTATION, 1)
+                decode = " /Decode [1 0 1 0 1 0 1 0]" if img.mode == "CMYK" and "adobe" in img.info else ""
+                meta = (
+                    f"/Type /XObject /Subtype /Image /Width {img.width} /Height {img.height} "
+                    f"/ColorSpace {_COLOR_SPACES[img.mode]} /BitsPerComponent 8 "
+                    f"/Filter /DCTDecode{decode}"
+                )
+                with open(source, "rb") as fh:
+                    length = fh.seek(0, io.SEEK_END)
+                    fh.seek(0)
+                    image_obj = self._reserve()
+                    self._write_stream(image_obj, meta, fh, length)
+                self._add_page(image_obj, img.size, _image_dpi(img), orientation)
+                return
+            frames = ImageSequence.Iterator(img) if img.format == "TIFF" else [img]
+            for frame in frames:
+                image_obj, size = self._write_decoded(frame)
+                self._add_page(image_obj, size, _image_dpi(frame), 1)
+
+    def _write_decoded(self, img: Image.Image) -> Tuple[int, Tuple[int, int]]:
+        """Записать декодированное изображение; вернуть номер объекта и размер."""
+        transposed = img.getexif().get(_EXIF_ORIENTATION, 1) not in (0, 1)
+        page = ImageOps.exif_transpose(img) if transposed else img
+        if page.mode in ("RGBA", "LA") or (page.mode == "P" and "transparency" in page.info):
+            rgba = page.convert("RGBA")
+            page = Image.new("RGB", rgba.size, (255, 255, 255))
+            page.paste(rgba, mask=rgba.getchannel("A"))
+            del rgba
+        elif page.mode not in ("1", "L", "RGB"):
+            page = page.convert("L" if page.mode in ("I", "I;16", "F") else "RGB")
+        size = page.size
+        if page.mode == "1":
+            # Чёрно-белые страницы без потерь: 1 бит на пиксель, Flate
+            data = zlib.compress(page.tobytes(), 9)
+            meta = (
+                f"/Type /XObject /Subtype /Image /Width {page.width} /Height {page.height} "
+                "/ColorSpace /DeviceGray /BitsPerComponent 1 /Filter /FlateDecode"
+            )
+        else:
+            buf = io.BytesIO()
+            page.save(buf, format="JPEG", quality=_JPEG_QUALITY)
+            data = buf.getvalue()
+            meta = (
+                f"/Type /XObject /Subtype /Image /Width {page.width} /Height {page.height} "
+                f"/ColorSpace {_COLOR_SPACES[page.mode]} /BitsPerComponent 8 /Filter /DCTDecode"
+            )
+        del page
+        image_obj = self._reserve()
+        self._write_stream(image_obj, meta, data, len(data))
+        return image_obj, size
+
+    def _add_page(
+        self,
+        image_obj: int,
+        size: Tuple[int, int],
+        dpi: Tuple[float, float],
+        orientation: int,
+    ) -> None:
+        dpi_x, dpi_y = dpi
+        # Размер изображения на странице после поворота
+        if orientation in (5, 6, 7, 8):
+            width, height = size[1] * 72 / dpi_y, size[0] * 72 / dpi_x
+        else:
+            width, height = size[0] * 72 / dpi_x, size[1] * 72 / dpi_y
+        if self.page_size is None:
+            page_w, page_h, x, y = width, height, 0.0, 0.0
+        else:
+            page_w, page_h = self.page_size
+            scale = min(page_w / width, page_h / height)
+            width, height = width * scale, height * scale
+            x, y = (page_w - width) / 2, (page_h - height) / 2
+
+        matrix = " ".join(_num(v) for v in _placement(orientation, x, y, width, height))
+        content = f"q {matrix} cm /Im0 Do Q".encode("ascii")
+        content_obj = self._reserve()
+        self._write_stream(content_obj, "", content, len(content))
+        page_obj = self._reserve()
+        self._write_object(
+            page_obj,
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {_num(page_w)} {_num(page_h)}] "
+            f"/Resources << /XObject << /Im0 {image_obj} 0 R >> >> /Contents {content_obj} 0 R >>",
+        )
+        self._kids.append(page_obj)
+        self.pages += 1
+
+    def close(self) -> None:
+        """Записать дерево страниц, таблицу ссылок и закрыть файл."""
+        if self._file.closed:
+            return
+        try:
+            if not self._kids:
+                raise ValueError("PDF has no pages")
+            self._write_object(1, "<< /Type /Catalog /Pages 2 0 R >>")
+            kids = " ".join(f"{number} 0 R" for number in self._kids)
+            self._write_object(2, f"<< /Type /Pages /Kids [{kids}] /Count {len(self._kids)} >>")
+            xref = self._file.tell()
+            lines = [f"xref\n0 {len(self._offsets) + 1}\n", "0000000000 65535 f \n"]
+            lines.extend(f"{offset:010d} 00000 n \n" for offset in self._offsets)
+            lines.append(
+                f"trailer\n<< /Size {len(self._offsets) + 1} /Root 1 0 R >>\n"
+                f"startxref\n{xref}\n%%EOF\n"
+            )
+            self._file.write("".join(lines).encode("ascii"))
+        finally:
+            self._file.close()
+
+
+__all__ = ["PAGE_SIZES", "PdfImageWriter"]
@@ -0,0 +1,163 @@
+"""Невидимый текстовый слой для отсканированных PDF.
+
+После OCR текст скана хранится только в базе и JSON-файле метаданных, и
+любое повторное извлечение из архивного файла распознаёт его заново. Здесь
+на страницы-изображения PDF накладывается невидимый текстовый слой, после
+чего ``page.get_text()`` сразу возвращает текст, а в просмотрщике работают
+поиск и выделение.
+
+Слой строится из рамок слов, сохранённых при извлечении текста (см.
+:func:`file_utils.load_text_layer`), поэтому страницы не распознаются
+второй раз. Только страницы, которые при извлечении не распознавались
+(например, из-за бюджета), проходят OCR через PDF-рендерер Tesseract.
+"""
+
+from __future__ import annotations
+
+import logging
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Deque, Optional, Sequence, Tuple, Union
+
+from PIL import Image
+
+from config import config
+
+from . import _ocr_workers, classify_page, fitz, load_text_layer, open_pdf, render_page
+
+logger = logging.getLogger(__name__)
+
+
+def _text_layer(image: Image.Image, language: str, psm: int) -> Tuple[bytes, int]:
+    from .image_ocr import ocr_image_pdf
+
+    return ocr_image_pdf(image, language=language, psm=psm)
+
+
+def _unrotate(rotate: int, x: float, y: float) -> Tuple[float, float]:
+    """Перевести точку выпрямленной страницы (в долях) в исходную."""
+    if rotate == 90:
+        return y, 1 - x
+    if rotate == 180:
+        return 1 - x, 1 - y
+    if rotate == 270:
+        return 1 - y, x
+    return x, y
+
+
+def _insert_words(page: Any, rotate: int, words: Sequence[Sequence[Any]], font: Any) -> None:
+    """Наложить на страницу невидимые слова с рамками из OCR.
+
+    Рамки заданы в долях выпрямленной страницы, а её поворот *rotate* — как
+    в :attr:`file_utils.image_ocr.OcrResult.rotate`; размер шрифта
+    подбирается по высоте строки и уменьшается, если слово не помещается в
+    рамку по длине.
+    """
+    rect = page.rect
+    writer = fitz.TextWriter(rect)
+    for x0, y0, x1, y1, text in words:
+        (ax, ay), (bx, by) = _unrotate(rotate, x0, y0), _unrotate(rotate, x1, y1)
+        box = fitz.Rect(
+            rect.x0 + min(ax, bx) * rect.width,
+            rect.y0 + min(ay, by) * rect.height,
+            rect.x0 + max(ax, bx) * rect.width,
+            rect.y0 + max(ay, by) * rect.height,
+        )
+        upright = rotate in (0, 180)
+        height, length = (box.height, box.width) if upright else (box.width, box.height)
+        if height <= 0 or length <= 0:
+            continue
+        size = height / (font.ascender - font.descender)
+        natural = font.text_length(text, fontsize=size)
+        if natural > length:
+            size *= length / natural
+        descent = -font.descender * size
+        origin = {
+            0: (box.x0, box.y1 - descent),
+            90: (box.x1 - descent, box.y1),
+            180: (box.x1, box.y0 + descent),
+            270: (box.x0 + descent, box.y0),
+        }[rotate]
+        if rotate:
+            # Текст повёрнутой страницы идёт вдоль поворота: пишем слово отдельно
+            turned = fitz.TextWriter(rect)
+            turned.append(origin, text, font=font, fontsize=size)
+            turned.write_text(page, render_mode=3, morph=(fitz.Point(origin), fitz.Matrix(rotate)))
+        else:
+            writer.append(origin, text, font=font, fontsize=size)
+    if writer.text_rect:
+        writer.write_text(page, render_mode=3)
+
+
+def add_text_layer(
+    path: Union[str, Path],
+    language: str = "eng",
+    dpi: Optional[int] = None,
+    psm: int = 3,
+) -> int:
+    """Добавить невидимый текстовый слой на страницы-изображения PDF.
+
+    Страницы с текстовым слоем и пустые страницы (см. :func:`classify_page`)
+    не меняются. Для страниц, распознанных при извлечении текста, слой
+    строится из сохранённых рамок слов; остальные отрисовываются с
+    разрешением *dpi* (по умолчанию ``PDF_OCR_DPI``) и распознаются
+    параллельно. Файл перезаписывается только если слой добавлен хотя бы на
+    одну страницу, поэтому повторный вызов ничего не делает.
+
+    :return: число страниц, получивших текстовый слой.
+    :raises RuntimeError: если не установлены PyMuPDF или Tesseract.
+    """
+    if fitz is None:
+        raise RuntimeError("PyMuPDF не установлен, обработка PDF невозможна")
+    path = Path(path)
+    dpi = dpi or config.pdf_ocr_dpi
+    workers = _ocr_workers()
+    cached = load_text_layer(path)
+    font = None
+    added = 0
+
+    with open_pdf(path) as doc:
+        pending: Deque[Tuple[object, Future]] = deque()
+
+        def apply() -> None:
+            nonlocal added
+            page, future = pending.popleft()
+            layer_pdf, rotate = future.result()
+            with fitz.open(stream=layer_pdf, filetype="pdf") as layer:
+                # Слой построен для выпрямленной страницы: поворачиваем его обратно
+                page.show_pdf_page(page.rect, layer, 0, rotate=rotate)
+            added += 1
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for page in doc:
+                if page.rotation:
+                    logger.debug("Skipping rotated page %d of %s", page.number + 1, path)
+                    continue
+                kind, _ = classify_page(page)
+                if kind != "image":
+                    continue
+                entry = cached.get(page.number + 1)
+                if entry is not None:
+                    if entry["words"]:
+                        font = font or fitz.Font("helv")
+                        _insert_words(page, entry["rotate"], entry["words"], font)
+                        added += 1
+                    continue
+                image = render_page(page, dpi)
+                pending.append((page, pool.submit(_text_layer, image, language, psm)))
+                while len(pending) >= 2 * workers:
+                    apply()
+            while pending:
+                apply()
+
+        if not added:
+            return 0
+        tmp_path = path.with_name(f"{path.stem}.searchable{path.suffix}")
+        doc.save(tmp_path, garbage=3, deflate=True)
+    tmp_path.replace(path)
+    logger.info("Added text layer to %d pages of %s", added, path)
+    return added
+
+
+__all__ = ["add_text_layer"]
@@ -0,0 +1,199 @@
+"""Выборка строк и сводка по листам таблиц (CSV, XLS, XLSX).
+
+Для классификации документа достаточно заголовка и нескольких строк, поэтому
+листы читаются потоково, а в памяти остаются только заголовок, первые и
+последние строки и случайная выборка из середины. Заодно собирается сводка:
+число строк и столбцов и столбцы с числовыми значениями.
+"""
+
+from __future__ import annotations
+
+import random
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+# Доля числовых значений среди непустых, при которой столбец считается числовым
+_NUMERIC_SHARE = 0.8
+
+Row = Sequence[Any]
+Sheet = Tuple[str, Iterable[Row]]
+
+
+@dataclass
+class SheetSummary:
+    """Сводка по листу таблицы.
+
+    :param name: имя листа (для CSV — имя файла).
+    :param rows: число строк данных без заголовка.
+    :param columns: число столбцов.
+    :param numeric_columns: заголовки столбцов с числовыми значениями.
+    :param sampled: в текст попала только выборка строк.
+    """
+
+    name: str
+    rows: int = 0
+    columns: int = 0
+    numeric_columns: List[str] = field(default_factory=list)
+    sampled: bool = False
+
+    def describe(self) -> str:
+        numeric = ", ".join(self.numeric_columns) or "нет"
+        return (
+            f"[Лист «{self.name}»: строк {self.rows}, столбцов {self.columns}, "
+            f"числовые столбцы: {numeric}]"
+        )
+
+
+def _is_number(value: Any) -> bool:
+    if isinstance(value, bool):
+        return False
+    if isinstance(value, (int, float)):
+        return True
+    text = str(value).strip().replace(" ", "").replace(" ", "")
+    if not text:
+        return False
+    try:
+        float(text.replace(",", "."))
+    except ValueError:
+        return False
+    return True
+
+
+def _is_empty(value: Any) -> bool:
+    return value is None or str(value).strip() == ""
+
+
+def format_row(row: Row) -> str:
+    """Строка таблицы в виде текста: значения через запятую, ``None`` — пусто."""
+    return ",".join("" if v is None else str(v) for v in row)
+
+
+class _SheetStats:
+    """Подсчёт строк, столбцов и доли числовых значений по ходу чтения листа."""
+
+    def __init__(self, name: str) -> None:
+        self.summary = SheetSummary(name)
+        self.header: Optional[Row] = None
+        self._filled: List[int] = []
+        self._numeric: List[int] = []
+
+    def add(self, row: Row) -> bool:
+        """Учесть строку; возвращает ``False`` для строки заголовка."""
+        self.summary.columns = max(self.summary.columns, len(row))
+        if self.header is None:
+            self.header = row
+            return False
+        for idx, value in enumerate(row):
+            if _is_empty(value):
+                continue
+            while len(self._filled) <= idx:
+                self._filled.append(0)
+                self._numeric.append(0)
+            self._filled[idx] += 1
+            self._numeric[idx] += _is_number(value)
+        self.summary.rows += 1
+        return True
+
+    def finish(self) -> SheetSummary:
+        header = self.header or ()
+        names = [
+            str(header[idx]).strip()
+            if idx < len(header) and not _is_empty(header[idx])
+            else f"#{idx + 1}"
+            for idx in range(self.summary.columns)
+        ]
+        self.summary.numeric_columns = [
+            names[idx]
+            for idx, count in enumerate(self._filled)
+            if count and self._numeric[idx] / count >= _NUMERIC_SHARE
+        ]
+        return self.summary
+
+
+def sample_sheet(
+    name: str, rows: Iterable[Row], sample_rows: int, seed: int = 0
+) -> Tuple[List[str], SheetSummary]:
+    """Прочитать лист и оставить заголовок и выборку строк.
+
+    Сохраняются первые и последние *sample_rows* строк и ещё *sample_rows*
+    строк из середины (выборка с резервуаром, детерминированная при
+    одинаковом *seed*). Если строк немного, лист возвращается целиком.
+    Возвращает строки текста и сводку по листу.
+    """
+    stats = _SheetStats(name)
+    rng = random.Random(seed)
+    head: List[Row] = []
+    tail: deque[Tuple[int, Row]] = deque(maxlen=sample_rows)
+    reservoir: List[Tuple[int, Row]] = []
+    middle_seen = 0
+
+    for row in rows:
+        if not stats.add(row):
+            continue
+        index = stats.summary.rows - 1
+        if len(head) < sample_rows:
+            head.append(row)
+            continue
+        if sample_rows and len(tail) == tail.maxlen:
+            # Строка, вытесняемая из «хвоста», попадает в середину
+            evicted = tail[0]
+            middle_seen += 1
+            if len(reservoir) < sample_rows:
+                reservoir.append(evicted)
+            else:
+                slot = rng.randrange(middle_seen)
+                if slot < sample_rows:
+                    reservoir[slot] = evicted
+        elif not sample_rows:
+            middle_seen += 1
+        tail.append((index, row))
+
+    summary = stats.finish()
+    if stats.header is None:
+        return [], summary
+    summary.sampled = middle_seen > len(reservoir)
+    middle = [format_row(row) for _, row in sorted(reservoir, key=lambda item: item[0])]
+
+    lines = [format_row(stats.header)] + [format_row(row) for row in head]
+    if summary.sampled:
+        lines.insert(0, summary.describe())
+        lines.append(f"… пропущено строк: {middle_seen - len(reservoir)}, случайная выборка:")
+        lines.extend(middle)
+        lines.append("… последние строки:")
+    else:
+        lines.extend(middle)
+    lines.extend(format_row(row) for _, row in tail)
+    return lines, summary
+
+
+def iter_sheet_text(
+    sheets: Iterable[Sheet],
+    sample_rows: Optional[int] = None,
+    report: Optional[List[SheetSummary]] = None,
+) -> Iterator[str]:
+    """Выдавать текст листов построчно.
+
+    Без *sample_rows* выдаются все строки; иначе — выборка
+    (см. :func:`sample_sheet`). Сводки листов добавляются в список *report*,
+    если он передан.
+    """
+    for name, rows in sheets:
+        if sample_rows is not None:
+            lines, summary = sample_sheet(name, rows, sample_rows)
+            if report is not None:
+                report.append(summary)
+            yield from lines
+            continue
+        if report is None:
+            for row in rows:
+                yield format_row(row)
+            continue
+        stats = _SheetStats(name)
+        for row in rows:
+            stats.add(row)
+            yield format_row(row)
+        report.append(stats.finish())
+
+
+__all__ = ["SheetSummary", "format_row", "iter_sheet_text", "sample_sheet"]
@@ -0,0 +1,359 @@
+"""Пул «тёплых» движков Tesseract на C API.
+
+``pytesseract`` запускает отдельный процесс ``tesseract`` на каждое
+изображение: процесс стартует, заново загружает traineddata и получает
+картинку через временный файл. Здесь движок создаётся через ``libtesseract``
+(ctypes) один раз на набор языков и режим сегментации и затем
+переиспользуется для всех страниц и документов в рамках процесса.
+Изображение передаётся движку напрямую из памяти.
+
+Если библиотека не найдена, :func:`engine_available` возвращает ``False`` и
+вызывающий код продолжает работать через ``pytesseract``.
+"""
+
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import logging
+import os
+import sys
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from config import config
+
+logger = logging.getLogger(__name__)
+
+_LIBRARY_NAMES = ("tesseract", "tesseract-5", "libtesseract-5", "tesseract50", "libtesseract")
+
+
+class TesseractEngineError(RuntimeError):
+    """Ошибка инициализации или работы движка Tesseract."""
+
+
+def _find_library() -> Optional[str]:
+    if config.tesseract_lib:
+        return config.tesseract_lib
+    for name in _LIBRARY_NAMES:
+        found = ctypes.util.find_library(name)
+        if found:
+            return found
+    if sys.platform == "win32" and config.tesseract_cmd:  # pragma: no cover - Windows
+        folder = os.path.dirname(config.tesseract_cmd)
+        for candidate in ("libtesseract-5.dll", "tesseract50.dll"):
+            path = os.path.join(folder, candidate)
+            if os.path.exists(path):
+                return path
+    return None
+
+
+def _bind(lib: ctypes.CDLL) -> ctypes.CDLL:
+    """Описать сигнатуры используемых функций C API."""
+    handle = ctypes.c_void_p
+    lib.TessVersion.restype = ctypes.c_char_p
+    lib.TessBaseAPICreate.restype = handle
+    lib.TessBaseAPIDelete.argtypes = [handle]
+    lib.TessBaseAPIEnd.argtypes = [handle]
+    lib.TessBaseAPIInit3.argtypes = [handle, ctypes.c_char_p, ctypes.c_char_p]
+    lib.TessBaseAPIInit3.restype = ctypes.c_int
+    lib.TessBaseAPISetPageSegMode.argtypes = [handle, ctypes.c_int]
+    lib.TessBaseAPISetVariable.argtypes = [handle, ctypes.c_char_p, ctypes.c_char_p]
+    lib.TessBaseAPISetVariable.restype = ctypes.c_int
+    lib.TessBaseAPISetImage.argtypes = [
+        handle,
+        ctypes.c_char_p,
+        ctypes.c_int,
+        ctypes.c_int,
+        ctypes.c_int,
+        ctypes.c_int,
+    ]
+    lib.TessBaseAPISetSourceResolution.argtypes = [handle, ctypes.c_int]
+    lib.TessBaseAPIGetUTF8Text.argtypes = [handle]
+    lib.TessBaseAPIGetUTF8Text.restype = ctypes.POINTER(ctypes.c_char)
+    lib.TessDeleteText.argtypes = [ctypes.POINTER(ctypes.c_char)]
+    lib.TessBaseAPIGetTsvText.argtypes = [handle, ctypes.c_int]
+    lib.TessBaseAPIGetTsvText.restype = ctypes.POINTER(ctypes.c_char)
+    lib.TessBaseAPIMeanTextConf.argtypes = [handle]
+    lib.TessBaseAPIMeanTextConf.restype = ctypes.c_int
+    lib.TessBaseAPIClear.argtypes = [handle]
+    try:
+        detect = lib.TessBaseAPIDetectOrientationScript
+    except AttributeError:  # pragma: no cover - Tesseract 3.x
+        pass
+    else:
+        detect.argtypes = [
+            handle,
+            ctypes.POINTER(ctypes.c_int),
+            ctypes.POINTER(ctypes.c_float),
+            ctypes.POINTER(ctypes.c_char_p),
+            ctypes.POINTER(ctypes.c_float),
+        ]
+        detect.restype = ctypes.c_int
+    return lib
+
+
+_lib: Optional[ctypes.CDLL] = None
+_lib_checked = False
+_lib_lock = threading.Lock()
+
+
+def _load_library() -> Optional[ctypes.CDLL]:
+    global _lib, _lib_checked
+    with _lib_lock:
+        if _lib_checked:
+            return _lib
+        _lib_checked = True
+        if config.tesseract_engine == "cli":
+            return None
+        name = _find_library()
+        if name is None:
+            logger.info("libtesseract not found, falling back to the tesseract CLI")
+            return None
+        try:
+            _lib = _bind(ctypes.CDLL(name))
+        except (OSError, AttributeError):
+            logger.warning("Failed to load libtesseract from %s", name, exc_info=True)
+            _lib = None
+        else:
+            logger.info("Using libtesseract %s from %s", _lib.TessVersion().decode(), name)
+        return _lib
+
+
+def engine_available() -> bool:
+    """Доступен ли C API Tesseract."""
+    return _load_library() is not None
+
+
+# Колонки TSV-вывода Tesseract (как у ``pytesseract.image_to_data``)
+_TSV_COLUMNS = (
+    "level", "page_num", "block_num", "par_num", "line_num", "word_num",
+    "left", "top", "width", "height", "conf", "text",
+)
+
+
+def _parse_tsv(tsv: str) -> Dict[str, List[Any]]:
+    """Разобрать TSV без заголовка в словарь колонок."""
+    data: Dict[str, List[Any]] = {name: [] for name in _TSV_COLUMNS}
+    for line in tsv.splitlines():
+        fields = line.split("\t")
+        if len(fields) < len(_TSV_COLUMNS):
+            continue
+        for name, value in zip(_TSV_COLUMNS[:-2], fields):
+            data[name].append(int(value))
+        data["conf"].append(float(fields[10]))
+        data["text"].append("\t".join(fields[11:]))
+    return data
+
+
+def _to_buffer(image: "Image.Image") -> Tuple[bytes, int, int]:
+    """Подготовить изображение Pillow для ``TessBaseAPISetImage``."""
+    if image.mode not in ("L", "RGB"):
+        image = image.convert("L" if image.mode in ("1", "I", "I;16", "F", "LA") else "RGB")
+    bpp = 1 if image.mode == "L" else 3
+    return image.tobytes(), bpp, image.width * bpp
+
+
+class TesseractEngine:
+    """Один проинициализированный экземпляр ``TessBaseAPI``.
+
+    Экземпляр не потокобезопасен: одновременно им пользуется только один поток
+    (см. :func:`acquire_engine`).
+    """
+
+    def __init__(self, language: str, psm: int = 3, datapath: Optional[str] = None) -> None:
+        lib = _load_library()
+        if lib is None:
+            raise TesseractEngineError("libtesseract is not available")
+        self._lib = lib
+        self.language = language
+        self.psm = psm
+        self._handle = lib.TessBaseAPICreate()
+        path = datapath or config.tessdata_prefix
+        rc = lib.TessBaseAPIInit3(
+            self._handle, path.encode() if path else None, language.encode()
+        )
+        if rc != 0:
+            lib.TessBaseAPIDelete(self._handle)
+            self._handle = None
+            raise TesseractEngineError(f"Failed loading language '{language}'")
+        lib.TessBaseAPISetPageSegMode(self._handle, psm)
+
+    def set_image(self, image: "Image.Image", dpi: Optional[int] = None) -> None:
+        data, bpp, bpl = _to_buffer(image)
+        # Держим ссылку на буфер, пока движок с ним работает
+        self._buffer = data
+        self._lib.TessBaseAPISetImage(self._handle, data, image.width, image.height, bpp, bpl)
+        resolution = dpi or (image.info.get("dpi") or (0, 0))[0] or 300
+        self._lib.TessBaseAPISetSourceResolution(self._handle, int(resolution))
+
+    def get_text(self) -> str:
+        ptr = self._lib.TessBaseAPIGetUTF8Text(self._handle)
+        if not ptr:
+            return ""
+        try:
+            return ctypes.string_at(ptr).decode("utf-8", errors="replace")
+        finally:
+            self._lib.TessDeleteText(ptr)
+
+    def get_data(self) -> Dict[str, List[Any]]:
+        """Слова последнего изображения в формате ``pytesseract.image_to_data``."""
+        ptr = self._lib.TessBaseAPIGetTsvText(self._handle, 0)
+        if not ptr:
+            return {name: [] for name in _TSV_COLUMNS}
+        try:
+            tsv = ctypes.string_at(ptr).decode("utf-8", errors="replace")
+        finally:
+            self._lib.TessDeleteText(ptr)
+        return _parse_tsv(tsv)
+
+    def mean_confidence(self) -> int:
+        """Средняя уверенность распознавания последнего изображения (0–100)."""
+        return int(self._lib.TessBaseAPIMeanTextConf(self._handle))
+
+    def clear(self) -> None:
+        self._lib.TessBaseAPIClear(self._handle)
+        self._buffer = None
+
+    def detect_orientation_script(
+        self, image: "Image.Image"
+    ) -> Optional[Tuple[int, float, str, float]]:
+        """Определить поворот и письменность (движок ``osd``, ``psm=0``).
+
+        Возвращает (угол поворота по часовой стрелке, выпрямляющий страницу,
+        уверенность, письменность, уверенность) или ``None``, если определить
+        не удалось.
+        """
+        detect = getattr(self._lib, "TessBaseAPIDetectOrientationScript", None)
+        if detect is None:
+            return None
+        orient_deg = ctypes.c_int()
+        orient_conf = ctypes.c_float()
+        script = ctypes.c_char_p()
+        script_conf = ctypes.c_float()
+        self.set_image(image)
+        try:
+            ok = detect(
+                self._handle,
+                ctypes.byref(orient_deg),
+                ctypes.byref(orient_conf),
+                ctypes.byref(script),
+                ctypes.byref(script_conf),
+            )
+        finally:
+            self.clear()
+        if not ok:
+            return None
+        name = script.value.decode() if script.value else ""
+        # orient_deg — угол, на который повёрнута сама страница
+        rotate = (360 - orient_deg.value) % 360
+        return rotate, orient_conf.value, name, script_conf.value
+
+    def recognize(self, image: "Image.Image", dpi: Optional[int] = None) -> str:
+        """Распознать текст на изображении."""
+        self.set_image(image, dpi=dpi)
+        try:
+            return self.get_text()
+        finally:
+            self.clear()
+
+    def recognize_with_confidence(
+        self, image: "Image.Image", dpi: Optional[int] = None
+    ) -> Tuple[str, int]:
+        """Распознать текст и вернуть его вместе со средней уверенностью."""
+        self.set_image(image, dpi=dpi)
+        try:
+            return self.get_text(), self.mean_confidence()
+        finally:
+            self.clear()
+
+    def recognize_data(self, image: "Image.Image", dpi: Optional[int] = None) -> Dict[str, List[Any]]:
+        """Распознать изображение и вернуть слова с рамками и уверенностью."""
+        self.set_image(image, dpi=dpi)
+        try:
+            return self.get_data()
+        finally:
+            self.clear()
+
+    def close(self) -> None:
+        if self._handle is not None:
+            self._lib.TessBaseAPIEnd(self._handle)
+            self._lib.TessBaseAPIDelete(self._handle)
+            self._handle = None
+
+    def __del__(self) -> None:  # pragma: no cover - сборка мусора
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class EnginePool:
+    """Пул свободных движков, сгруппированных по языку и режиму сегментации.
+
+    Движки переживают потоки и документы: поток берёт свободный движок
+    нужной конфигурации, а после распознавания возвращает его в пул.
+    """
+
+    def __init__(self) -> None:
+        self._idle: Dict[Tuple[str, int], List[TesseractEngine]] = {}
+        self._failed: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def acquire(self, language: str, psm: int = 3) -> Iterator[TesseractEngine]:
+        key = (language, psm)
+        with self._lock:
+            if language in self._failed:
+                raise TesseractEngineError(self._failed[language])
+            idle = self._idle.get(key)
+            engine = idle.pop() if idle else None
+        if engine is None:
+            logger.debug("Starting Tesseract engine for %s (psm=%s)", language, psm)
+            try:
+                engine = TesseractEngine(language, psm=psm)
+            except TesseractEngineError as exc:
+                # Не пытаемся заново загружать отсутствующие traineddata
+                with self._lock:
+                    self._failed[language] = str(exc)
+                raise
+        try:
+            yield engine
+        except BaseException:
+            engine.close()
+            raise
+        with self._lock:
+            self._idle.setdefault(key, []).append(engine)
+
+    def close(self) -> None:
+        with self._lock:
+            engines = [engine for idle in self._idle.values() for engine in idle]
+            self._idle.clear()
+            self._failed.clear()
+        for engine in engines:
+            engine.close()
+
+
+_pool = EnginePool()
+
+
+def acquire_engine(language: str, psm: int = 3):
+    """Взять движок из общего пула процесса (контекстный менеджер)."""
+    return _pool.acquire(language, psm)
+
+
+def recognize(image: "Image.Image", language: str = "eng", psm: int = 3) -> str:
+    """Распознать *image* движком из общего пула."""
+    with acquire_engine(language, psm) as engine:
+        return engine.recognize(image)
+
+
+__all__ = [
+    "EnginePool",
+    "TesseractEngine",
+    "TesseractEngineError",
+    "acquire_engine",
+    "engine_available",
+    "recognize",
+]
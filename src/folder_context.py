@@ -0,0 +1,206 @@
+"""Компактный контекст существующих папок для промпта метаданных.
+
+Вместо полного дерева архива (со списками файлов) в промпт попадают только
+папки первых трёх уровней — владелец → категория → подкатегории — и лишь
+``top_k`` пар «владелец/категория», наиболее похожих на текст документа.
+Похожесть считается по совпадению основ слов (первых символов), без моделей
+и внешних зависимостей. Подготовленное дерево кэшируется, пока не изменится
+его структура.
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import PurePath
+from typing import Any, Dict, FrozenSet, List, Optional, Sequence, Tuple
+
+from config import config
+from utils.tokens import estimate_tokens
+
+_WORD_RE = re.compile(r"\w+")
+# Длина основы слова: грубо отбрасывает русские окончания («финансы» и
+# «финансовый», «Иванов» и «Иванову» совпадают)
+_STEM_LENGTH = 5
+_MIN_WORD_LENGTH = 3
+# Для ранжирования хватает начала документа
+_MAX_TEXT_CHARS = 20000
+# Совпадение с именем владельца важнее совпадения с названием категории
+_PERSON_WEIGHT = 3
+
+# Структура дерева: ((владелец, ((категория, (подкатегории, ...)), ...)), ...)
+Structure = Tuple[Tuple[str, Tuple[Tuple[str, Tuple[str, ...]], ...]], ...]
+
+
+@dataclass(frozen=True)
+class _Candidate:
+    """Пара «владелец/категория» с подготовленными основами слов."""
+
+    order: int
+    person: str
+    category: str
+    subcategories: Tuple[str, ...]
+    person_stems: FrozenSet[str]
+    category_stems: FrozenSet[str]
+    sub_stems: Tuple[FrozenSet[str], ...]
+
+
+def _stems(text: str) -> FrozenSet[str]:
+    return frozenset(
+        word[:_STEM_LENGTH]
+        for word in _WORD_RE.findall(text.lower())
+        if len(word) >= _MIN_WORD_LENGTH and not word.isdigit()
+    )
+
+
+def _child_dirs(node: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [child for child in node.get("children") or [] if isinstance(child, dict)]
+
+
+def folder_structure(
+    folder_tree: Optional[Sequence[Dict[str, Any]]] = None,
+    folder_index: Optional[Dict[str, Dict[str, str]]] = None,
+) -> Structure:
+    """Свести дерево папок к трём уровням без файлов.
+
+    Если дерева нет, структура строится по индексу папок
+    (:func:`file_sorter.build_folder_index`): имена берутся из путей.
+    """
+    if folder_tree:
+        return tuple(
+            (
+                person.get("name", ""),
+                tuple(
+                    (
+                        category.get("name", ""),
+                        tuple(sub.get("name", "") for sub in _child_dirs(category)),
+                    )
+                    for category in _child_dirs(person)
+                ),
+            )
+            for person in folder_tree
+            if isinstance(person, dict)
+        )
+    structure = []
+    for person_key, categories in (folder_index or {}).items():
+        person = person_key
+        names = []
+        for category_key, path in categories.items():
+            parts = PurePath(str(path)).parts
+            if len(parts) >= 2:
+                person = parts[0]
+            names.append((parts[1] if len(parts) >= 2 else category_key, ()))
+        structure.append((person, tuple(names)))
+    return tuple(structure)
+
+
+@lru_cache(maxsize=8)
+def _prepare(structure: Structure) -> Tuple[Tuple[_Candidate, ...], Tuple[str, ...]]:
+    """Кандидаты «владелец/категория» и все владельцы в порядке дерева."""
+    candidates: List[_Candidate] = []
+    for person, categories in structure:
+        person_stems = _stems(person)
+        for category, subcategories in categories:
+            candidates.append(
+                _Candidate(
+                    order=len(candidates),
+                    person=person,
+                    category=category,
+                    subcategories=subcategories,
+                    person_stems=person_stems,
+                    category_stems=_stems(category),
+                    sub_stems=tuple(_stems(sub) for sub in subcategories),
+                )
+            )
+    return tuple(candidates), tuple(person for person, _ in structure)
+
+
+def _score(candidate: _Candidate, words: FrozenSet[str]) -> int:
+    score = _PERSON_WEIGHT * len(candidate.person_stems & words)
+    score += len(candidate.category_stems & words)
+    if candidate.sub_stems:
+        score += max(len(stems & words) for stems in candidate.sub_stems)
+    return score
+
+
+def _category_line(candidate: _Candidate, words: FrozenSet[str], limit: Optional[int] = None) -> str:
+    # Подходящие подкатегории — первыми
+    subs = sorted(
+        range(len(candidate.subcategories)),
+        key=lambda i: (not candidate.sub_stems[i] & words, i),
+    )
+    names = [candidate.subcategories[i] for i in subs[:limit]]
+    if len(names) < len(subs):
+        names.append("…")
+    line = f"  - {candidate.category}"
+    if names:
+        line += ": " + ", ".join(names)
+    return line
+
+
+def build_folder_context(
+    text: str,
+    folder_tree: Optional[Sequence[Dict[str, Any]]] = None,
+    folder_index: Optional[Dict[str, Dict[str, str]]] = None,
+    *,
+    top_k: Optional[int] = None,
+    max_tokens: Optional[int] = None,
+) -> str:
+    """Сформировать список папок, наиболее подходящих к *text*.
+
+    Выбираются ``top_k`` пар «владелец/категория» с наибольшим совпадением
+    слов (при равенстве — в порядке дерева), затем они группируются по
+    владельцам; остальные владельцы перечисляются без категорий. Текст
+    укладывается в ``max_tokens`` (оценка :func:`utils.tokens.estimate_tokens`);
+    не вошедшие подкатегории и папки помечаются многоточием. По умолчанию параметры берутся из
+    ``config.folder_context_top_k`` и ``config.folder_context_max_tokens``.
+    """
+    top_k = config.folder_context_top_k if top_k is None else top_k
+    max_tokens = config.folder_context_max_tokens if max_tokens is None else max_tokens
+    candidates, persons = _prepare(folder_structure(folder_tree, folder_index))
+    if not persons:
+        return "(no folders yet)"
+
+    words = _stems(text[:_MAX_TEXT_CHARS])
+    ranked = sorted(candidates, key=lambda c: (-_score(c, words), c.order))[:top_k]
+
+    grouped: Dict[str, List[_Candidate]] = {}
+    for candidate in ranked:
+        grouped.setdefault(candidate.person, []).append(candidate)
+    # Остальные владельцы — без категорий, чтобы модель не придумывала новых
+    for person in persons:
+        grouped.setdefault(person, [])
+
+    lines: List[str] = []
+    used = 0
+    shown = 0
+
+    def fits(line: str) -> bool:
+        return used + estimate_tokens(line) + 1 <= max_tokens
+
+    for person, chosen in grouped.items():
+        header = f"- {person}"
+        if not fits(header):
+            break
+        lines.append(header)
+        used += estimate_tokens(header) + 1
+        for candidate in chosen:
+            line = _category_line(candidate, words)
+            limit = len(candidate.subcategories)
+            while not fits(line) and limit > 0:
+                limit -= 1
+                line = _category_line(candidate, words, limit)
+            if not fits(line):
+                break
+            lines.append(line)
+            used += estimate_tokens(line) + 1
+            shown += 1
+
+    hidden = len(candidates) - shown
+    if hidden > 0:
+        lines.append(f"(… {hidden} more folders not shown)")
+    return "\n".join(lines)
+
+
+__all__ = ["build_folder_context", "folder_structure"]
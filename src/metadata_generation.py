@@ -8,18 +8,21 @@ This module предоставляет высокоуровневую функц
 
 from __future__ import annotations
 
+import asyncio
 import json
 import logging
 import re
 from datetime import datetime
 from abc import ABC, abstractmethod
 from pathlib import Path
-from typing import Any, Dict, Optional, Callable
+from typing import Any, Callable, Dict, List, Optional, Union
 
 from models import Metadata
-from prompt_templates import build_metadata_prompt
+from prompt_templates import build_batch_metadata_prompt, build_metadata_prompt
+from utils.tokens import estimate_tokens
 
 from config import (
+    config,
     OPENROUTER_API_KEY,
     OPENROUTER_BASE_URL,
     OPENROUTER_MODEL,
@@ -105,6 +108,8 @@ def _parse_person_from_text(text: str) -> Optional[str]:
 
 __all__ = [
     "generate_metadata",
+    "generate_metadata_batch",
+    "plan_batches",
     "MetadataAnalyzer",
     "OpenRouterAnalyzer",
     "OpenRouterError",
@@ -126,6 +131,21 @@ class MetadataAnalyzer(ABC):
     ) -> Dict[str, Any]:
         """Analyze *text* and return a dict with keys ``prompt``, ``raw_response`` and ``metadata``."""
 
+    async def analyze_batch(
+        self,
+        documents: Dict[str, str],
+        folder_tree: Optional[Dict[str, Any]] = None,
+        folder_index: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Dict[str, Any]]:
+        """Analyze several documents in one request.
+
+        *documents* maps a document id to its text. The result maps ids to
+        dicts shaped like :meth:`analyze` results; ids that are missing are
+        analyzed one by one. Analyzers without batch support return an empty
+        dict.
+        """
+        return {}
+
 
 class NoOpAnalyzer(MetadataAnalyzer):
     """Analyzer that returns empty metadata without external calls."""
@@ -173,6 +193,42 @@ class OpenRouterAnalyzer(MetadataAnalyzer):
             text, folder_tree=folder_tree, folder_index=folder_index, file_info=file_info
         )
 
+        txt = await self._request(prompt)
+        try:
+            metadata = json.loads(txt)
+        except json.JSONDecodeError:
+            logger.error("JSON decode error from OpenRouter content: %s", txt[:800])
+            raise OpenRouterError("Invalid JSON from OpenRouter")
+
+        return {"prompt": prompt, "raw_response": txt, "metadata": metadata}
+
+    async def analyze_batch(
+        self,
+        documents: Dict[str, str],
+        folder_tree: Optional[Dict[str, Any]] = None,
+        folder_index: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Dict[str, Any]]:
+        prompt = build_batch_metadata_prompt(
+            documents, folder_tree=folder_tree, folder_index=folder_index
+        )
+        txt = await self._request(prompt)
+        try:
+            payload = json.loads(txt)
+        except json.JSONDecodeError:
+            logger.error("JSON decode error from OpenRouter batch content: %s", txt[:800])
+            raise OpenRouterError("Invalid JSON from OpenRouter")
+
+        results: Dict[str, Dict[str, Any]] = {}
+        for doc_id, metadata in _batch_entries(payload):
+            if doc_id in documents and doc_id not in results:
+                results[doc_id] = {"prompt": prompt, "raw_response": txt, "metadata": metadata}
+        missing = [doc_id for doc_id in documents if doc_id not in results]
+        if missing:
+            logger.warning("Batch response lacks documents %s", ", ".join(missing))
+        return results
+
+    async def _request(self, prompt: str) -> str:
+        """Отправить промпт и вернуть ответ модели без оград ```json."""
         messages = [{"role": "user", "content": prompt}]
         logger.debug("OpenRouter messages: %s", messages)
 
@@ -200,14 +256,30 @@ class OpenRouterAnalyzer(MetadataAnalyzer):
             if lines and lines[-1].strip().startswith("```"):
                 lines = lines[:-1]
             txt = "\n".join(lines).strip()
+        return txt
 
-        try:
-            metadata = json.loads(txt)
-        except json.JSONDecodeError:
-            logger.error("JSON decode error from OpenRouter content: %s", txt[:800])
-            raise OpenRouterError("Invalid JSON from OpenRouter")
 
-        return {"prompt": prompt, "raw_response": txt, "metadata": metadata}
+def _batch_entries(payload: Any) -> List[tuple[str, Dict[str, Any]]]:
+    """Разобрать ответ пакетного запроса в пары (id документа, метаданные).
+
+    Модель может вернуть ``{"documents": [...]}``, голый список объектов с
+    полем ``id`` или словарь ``{id: {...}}``; записи без id или не-объекты
+    пропускаются.
+    """
+    if isinstance(payload, dict) and isinstance(payload.get("documents"), list):
+        payload = payload["documents"]
+    entries: List[tuple[str, Dict[str, Any]]] = []
+    if isinstance(payload, list):
+        for item in payload:
+            if not isinstance(item, dict) or item.get("id") is None:
+                continue
+            metadata = {key: value for key, value in item.items() if key != "id"}
+            entries.append((str(item["id"]).strip(), metadata))
+    elif isinstance(payload, dict):
+        for doc_id, metadata in payload.items():
+            if isinstance(metadata, dict):
+                entries.append((str(doc_id).strip(), metadata))
+    return entries
 
 
 async def generate_metadata(
@@ -229,15 +301,25 @@ async def generate_metadata(
     ``tags_en``, ``suggested_filename``, ``description``, ``summary``, ``needs_new_folder``.
     """
     if analyzer is None:
-        if not OPENROUTER_API_KEY:
-            logger.warning("OPENROUTER_API_KEY not set; metadata generation skipped")
-            analyzer = NoOpAnalyzer()
-        else:
-            analyzer = OpenRouterAnalyzer()
+        analyzer = _default_analyzer()
 
     result = await analyzer.analyze(
         text, folder_tree=folder_tree, folder_index=folder_index, file_info=file_info
     )
+    return _finalize_metadata(text, result, folder_index)
+
+
+def _default_analyzer() -> MetadataAnalyzer:
+    if not OPENROUTER_API_KEY:
+        logger.warning("OPENROUTER_API_KEY not set; metadata generation skipped")
+        return NoOpAnalyzer()
+    return OpenRouterAnalyzer()
+
+
+def _finalize_metadata(
+    text: str, result: Dict[str, Any], folder_index: Optional[Dict[str, Any]]
+) -> Dict[str, Any]:
+    """Дополнить ответ анализатора значениями по умолчанию, MRZ и индексом папок."""
     metadata = result.get("metadata") or {}
 
     if isinstance(metadata, list):
@@ -344,3 +426,95 @@ async def generate_metadata(
         "metadata": metadata_model,
     }
 
+
+
+BatchResult = Union[Dict[str, Any], BaseException]
+
+
+def plan_batches(documents: Dict[str, str]) -> List[List[str]]:
+    """Разбить документы на пакеты для :func:`generate_metadata_batch`.
+
+    В пакет попадает не больше ``config.metadata_batch_size`` документов с
+    суммарным текстом не длиннее ``config.metadata_batch_max_tokens``
+    токенов. Документы длиннее ``config.metadata_batch_doc_tokens`` идут
+    отдельными запросами — пакеты из одного документа.
+    """
+    size = max(1, config.metadata_batch_size)
+    max_tokens = config.metadata_batch_max_tokens
+    batches: List[List[str]] = []
+    current: List[str] = []
+    used = 0
+    for doc_id, text in documents.items():
+        cost = estimate_tokens(text)
+        if size == 1 or cost > config.metadata_batch_doc_tokens:
+            batches.append([doc_id])
+            continue
+        if current and (len(current) >= size or used + cost > max_tokens):
+            batches.append(current)
+            current, used = [], 0
+        current.append(doc_id)
+        used += cost
+    if current:
+        batches.append(current)
+    return batches
+
+
+async def generate_metadata_batch(
+    documents: Dict[str, str],
+    analyzer: Optional[MetadataAnalyzer] = None,
+    *,
+    folder_tree: Optional[Dict[str, Any]] = None,
+    folder_index: Optional[Dict[str, Any]] = None,
+) -> Dict[str, BatchResult]:
+    """Generate metadata for several documents, packing short ones into one request.
+
+    *documents* maps a document id to its text; batches are planned by
+    :func:`plan_batches` and sent concurrently. A failed batch request, a
+    missing or malformed entry in the reply falls back to
+    :func:`generate_metadata` for the affected documents. The result maps
+    every id to a :func:`generate_metadata` result or to the exception raised
+    for that document.
+    """
+    if analyzer is None:
+        analyzer = _default_analyzer()
+    results: Dict[str, BatchResult] = {}
+
+    async def single(doc_id: str) -> None:
+        try:
+            results[doc_id] = await generate_metadata(
+                documents[doc_id],
+                analyzer,
+                folder_tree=folder_tree,
+                folder_index=folder_index,
+            )
+        except Exception as exc:
+            results[doc_id] = exc
+
+    async def run_batch(ids: List[str]) -> None:
+        if len(ids) == 1:
+            await single(ids[0])
+            return
+        try:
+            replies = await analyzer.analyze_batch(
+                {doc_id: documents[doc_id] for doc_id in ids},
+                folder_tree=folder_tree,
+                folder_index=folder_index,
+            )
+        except Exception as exc:
+            logger.warning("Batch metadata request failed, retrying one by one: %s", exc)
+            replies = {}
+        fallback = []
+        for doc_id in ids:
+            reply = replies.get(doc_id)
+            if reply is None:
+                fallback.append(doc_id)
+                continue
+            try:
+                results[doc_id] = _finalize_metadata(documents[doc_id], reply, folder_index)
+            except Exception as exc:
+                logger.warning("Malformed batch metadata for %s: %s", doc_id, exc)
+                fallback.append(doc_id)
+        await asyncio.gather(*(single(doc_id) for doc_id in fallback))
+
+    await asyncio.gather(*(run_batch(ids) for ids in plan_batches(documents)))
+    return {doc_id: results[doc_id] for doc_id in documents}
@@ -29,6 +29,7 @@ class Metadata(BaseModel):
     description: Optional[str] = None
     needs_new_folder: bool = False
     extracted_text: Optional[str] = None
+    text_complete: bool = True
     language: Optional[str] = None
     suggested_name_translit: Optional[str] = None
     new_name_translit: Optional[str] = None
@@ -2,93 +2,178 @@ from __future__ import annotations
 
 """Utility functions for image preprocessing and OCR."""
 
+import json
 import logging
+import math
+import os
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Optional, Union
+from typing import (
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    TextIO,
+    Tuple,
+    Union,
+)
 
 import argparse
 import cv2
 import numpy as np
 from PIL import Image
-import pytesseract
+
+import file_utils
+from config import config
+from file_utils.cache import get_extraction_cache, hash_file, make_key
+from file_utils.image_ocr import OcrResult, ocr_image, ocr_image_result
 
 logger = logging.getLogger(__name__)
 
+# Image formats accepted by :func:`run_ocr`
+IMAGE_EXTENSIONS = frozenset({".png", ".jpg", ".jpeg", ".tif", ".tiff", ".bmp", ".gif"})
+
 
-def increase_contrast(image: np.ndarray, alpha: float = 1.5, beta: float = 0.0) -> np.ndarray:
+def increase_contrast(
+    image: np.ndarray,
+    alpha: float = 1.5,
+    beta: float = 0.0,
+    out: Optional[np.ndarray] = None,
+) -> np.ndarray:
     """Increase image contrast using a linear transformation.
 
     :param image: Input image as NumPy array.
     :param alpha: Contrast control (1.0-3.0).
     :param beta: Brightness control (0-100).
+    :param out: Optional preallocated output array of the same shape.
     :return: Image with enhanced contrast.
     """
-    return cv2.convertScaleAbs(image, alpha=alpha, beta=beta)
+    return cv2.convertScaleAbs(image, dst=out, alpha=alpha, beta=beta)
 
 
-def remove_noise(image: np.ndarray, ksize: int = 3) -> np.ndarray:
+def remove_noise(image: np.ndarray, ksize: int = 3, out: Optional[np.ndarray] = None) -> np.ndarray:
     """Remove noise from the image using median blur.
 
     :param image: Input image.
     :param ksize: Size of the kernel; must be an odd integer ≥3.
+    :param out: Optional preallocated output array; must not be *image*.
     :return: Denoised image.
     """
     if ksize < 3 or ksize % 2 == 0:
         raise ValueError("ksize must be an odd integer ≥3")
-    return cv2.medianBlur(image, ksize)
+    return cv2.medianBlur(image, ksize, dst=out)
+
+
+def _to_gray(image: np.ndarray) -> np.ndarray:
+    return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+
 
+# Longest side of the downsampled copy used to estimate the skew angle
+_SKEW_MAX_SIDE = 1024
+
+
+def skew_angle(image: np.ndarray, max_side: int = _SKEW_MAX_SIDE) -> Optional[float]:
+    """Estimate the skew angle of the image in degrees.
+
+    The angle is measured on a copy downsampled to *max_side* pixels, which
+    does not change it but keeps the foreground point set small.
+
+    :param image: Input image.
+    :param max_side: Longest side of the downsampled copy.
+    :return: Rotation angle that straightens the image, or ``None`` if the
+        image has no foreground pixels.
+    """
+    gray = _to_gray(image)
+    scale = max_side / max(gray.shape[:2])
+    if scale < 1:
+        size = (max(1, round(gray.shape[1] * scale)), max(1, round(gray.shape[0] * scale)))
+        gray = cv2.resize(gray, size, interpolation=cv2.INTER_AREA)
+    # Text is dark on a light background, so measure the dark pixels
+    thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)[1]
+    points = cv2.findNonZero(thresh)
+    if points is None:
+        return None
+    angle = cv2.minAreaRect(points)[-1]
+    # OpenCV >= 4.5 reports angles in (0, 90], older versions in [-90, 0)
+    if angle > 45:
+        angle -= 90
+    if angle < -45:
+        return -(90 + angle)
+    return -angle
 
-def deskew(image: np.ndarray) -> np.ndarray:
+
+def deskew(
+    image: np.ndarray, out: Optional[np.ndarray] = None, angle: Optional[float] = None
+) -> np.ndarray:
     """Correct skew in the image using its minimum area rectangle.
 
     :param image: Input image.
+    :param out: Optional preallocated output array; must not be *image*.
+    :param angle: Skew angle, if already known (see :func:`skew_angle`).
     :return: Deskewed image.
     """
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
-    coords = np.column_stack(np.where(thresh > 0))
-    if coords.size == 0:
+    if angle is None:
+        angle = skew_angle(image)
+    if not angle:
         return image
-    angle = cv2.minAreaRect(coords)[-1]
-    if angle < -45:
-        angle = -(90 + angle)
-    else:
-        angle = -angle
     h, w = image.shape[:2]
     m = cv2.getRotationMatrix2D((w // 2, h // 2), angle, 1.0)
-    return cv2.warpAffine(image, m, (w, h), flags=cv2.INTER_CUBIC, borderMode=cv2.BORDER_REPLICATE)
+    return cv2.warpAffine(
+        image, m, (w, h), dst=out, flags=cv2.INTER_CUBIC, borderMode=cv2.BORDER_REPLICATE
+    )
 
 
-def binarize(image: np.ndarray) -> np.ndarray:
+def binarize(image: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
     """Convert the image to a binary form using Otsu's thresholding.
 
     :param image: Input image.
+    :param out: Optional preallocated grayscale output array (may be *image*).
     :return: Binarized (grayscale) image.
     """
-    if image.ndim == 3:
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    else:
-        gray = image
-    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    gray = _to_gray(image)
+    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU, dst=out)
     return binary
 
 
-def resize_to_dpi(image: np.ndarray, dpi: int = 300) -> np.ndarray:
+def _scaled_size(image: np.ndarray, dpi: int, source_dpi: Optional[float]) -> Optional[tuple]:
+    if dpi <= 0:
+        raise ValueError("dpi must be > 0")
+    scale = dpi / (source_dpi or 72)
+    if scale == 1:
+        return None
+    h, w = image.shape[:2]
+    return int(w * scale), int(h * scale)
+
+
+def resize_to_dpi(
+    image: np.ndarray,
+    dpi: int = 300,
+    source_dpi: Optional[float] = None,
+    out: Optional[np.ndarray] = None,
+) -> np.ndarray:
     """Resize image to approximate the desired DPI.
 
     :param image: Input image.
     :param dpi: Target DPI value.
+    :param source_dpi: Resolution of the input image (72 if unknown, see
+        :func:`read_dpi`).
+    :param out: Optional preallocated output array of the target size.
     :return: Resized image.
     """
-    if dpi <= 0:
-        raise ValueError("dpi must be > 0")
-    pil_img = Image.fromarray(image)
-    orig_dpi = pil_img.info.get("dpi", (72, 72))[0] or 72
-    scale = dpi / orig_dpi
-    if scale == 1:
+    size = _scaled_size(image, dpi, source_dpi)
+    if size is None:
         return image
-    new_size = (int(pil_img.width * scale), int(pil_img.height * scale))
-    return cv2.resize(image, new_size, interpolation=cv2.INTER_CUBIC)
+    interpolation = cv2.INTER_CUBIC if size[0] > image.shape[1] else cv2.INTER_AREA
+    return cv2.resize(image, size, dst=out, interpolation=interpolation)
 
 
 def crop_margins(image: np.ndarray, margin: float = 0.05) -> np.ndarray:
@@ -96,7 +181,7 @@ def crop_margins(image: np.ndarray, margin: float = 0.05) -> np.ndarray:
 
     :param image: Input image.
     :param margin: Fraction of width/height to remove from each side.
-    :return: Cropped image.
+    :return: Cropped image (a view of *image*, no copy is made).
     """
     h, w = image.shape[:2]
     top = int(h * margin)
@@ -106,6 +191,282 @@ def crop_margins(image: np.ndarray, margin: float = 0.05) -> np.ndarray:
     return image[top:bottom, left:right]
 
 
+# Pages are assumed to be at most this tall (A3 is 16.5 in); a longer side
+# at the stored resolution means the DPI tag is a placeholder
+_MAX_PAGE_INCHES = 17.0
+# Longer side of an A4 page, used to estimate a missing resolution
+_A4_INCHES = 11.69
+
+
+def read_dpi(path: Union[str, Path]) -> Optional[float]:
+    """Read the resolution stored in an image file header.
+
+    :param path: Path to the image file.
+    :return: Horizontal DPI or ``None`` if the file does not store one.
+    """
+    try:
+        with Image.open(path) as img:
+            return _source_dpi(img)
+    except (OSError, ValueError):
+        return None
+
+
+def page_dpi(image: np.ndarray, stored_dpi: Optional[float] = None) -> float:
+    """Resolution of a page image.
+
+    The stored DPI is used when it is plausible. Otherwise (no tag, or a
+    72-dpi placeholder on a large photo) it is estimated by assuming an A4 page.
+
+    :param image: Page image.
+    :param stored_dpi: DPI read from the file (see :func:`read_dpi`).
+    :return: Resolution in dots per inch.
+    """
+    longest = max(image.shape[:2])
+    if stored_dpi and longest / stored_dpi <= _MAX_PAGE_INCHES:
+        return stored_dpi
+    return longest / _A4_INCHES
+
+
+# Stages of the full preprocessing pipeline, in order
+FULL_PIPELINE = ("resize", "contrast", "denoise", "deskew", "crop", "binarize")
+
+# Debug image names for the stages
+_DEBUG_NAMES = {
+    "resize": "resized",
+    "contrast": "contrast",
+    "denoise": "denoised",
+    "deskew": "deskewed",
+    "crop": "cropped",
+    "binarize": "binarized",
+}
+
+# Thresholds used by :func:`plan_stages` to pick the needed stages
+_LOW_DPI = 200
+_LOW_CONTRAST_STD = 40.0
+_NOISE_LEVEL = 6.0
+_MIN_SKEW = 0.5
+
+
+class Preprocessor:
+    """Run preprocessing stages on grayscale pages with reusable buffers.
+
+    Each stage writes into one of two preallocated buffers, alternating
+    between them, so a page needs at most two working copies instead of one
+    per stage. A buffer is a flat array handed out as a contiguous view of the
+    requested shape, so a smaller result (e.g. after cropping) fits into it;
+    buffers only grow, and pages of the same size allocate nothing after the
+    first. :attr:`allocations` counts the allocations. The returned image is a
+    view of a buffer and is only valid until the next :meth:`run`.
+    """
+
+    def __init__(self) -> None:
+        self._buffers: List[Optional[np.ndarray]] = [None, None]
+        self._next = 0
+        self.allocations = 0
+
+    def _buffer(self, shape: tuple) -> np.ndarray:
+        idx = self._next
+        self._next ^= 1
+        size = int(np.prod(shape))
+        buf = self._buffers[idx]
+        if buf is None or buf.size < size:
+            buf = self._buffers[idx] = np.empty(size, dtype=np.uint8)
+            self.allocations += 1
+        return buf[:size].reshape(shape)
+
+    def run(
+        self,
+        image: np.ndarray,
+        stages: Sequence[str] = FULL_PIPELINE,
+        *,
+        dpi: int = 300,
+        source_dpi: Optional[float] = None,
+        alpha: float = 1.5,
+        beta: float = 0.0,
+        ksize: int = 3,
+        on_stage: Optional[Callable[[str, np.ndarray], None]] = None,
+    ) -> np.ndarray:
+        """Apply *stages* to *image* (converted to grayscale first).
+
+        :param on_stage: Called with the stage name and its result after each
+            stage, and with ``"original"`` before the first one.
+        :return: Preprocessed grayscale image.
+        """
+        image = _to_gray(image)
+        if image.dtype != np.uint8:
+            image = cv2.convertScaleAbs(image)
+        self._next = 0
+        if on_stage is not None:
+            on_stage("original", image)
+        for stage in stages:
+            if stage == "resize":
+                size = _scaled_size(image, dpi, source_dpi)
+                if size is not None:
+                    image = resize_to_dpi(
+                        image, dpi, source_dpi=source_dpi, out=self._buffer((size[1], size[0]))
+                    )
+            elif stage == "contrast":
+                image = increase_contrast(image, alpha=alpha, beta=beta, out=self._buffer(image.shape))
+            elif stage == "denoise":
+                image = remove_noise(image, ksize=ksize, out=self._buffer(image.shape))
+            elif stage == "deskew":
+                angle = skew_angle(image)
+                if angle:
+                    image = deskew(image, out=self._buffer(image.shape), angle=angle)
+            elif stage == "crop":
+                image = crop_margins(image)
+            elif stage == "binarize":
+                image = binarize(image, out=self._buffer(image.shape))
+            else:
+                raise ValueError(f"Unknown preprocessing stage: {stage}")
+            if on_stage is not None:
+                on_stage(_DEBUG_NAMES[stage], image)
+        return image
+
+
+def preprocess(
+    image: np.ndarray,
+    stages: Sequence[str] = FULL_PIPELINE,
+    *,
+    dpi: int = 300,
+    source_dpi: Optional[float] = None,
+    alpha: float = 1.5,
+    beta: float = 0.0,
+    ksize: int = 3,
+    debug_dir: Optional[Path] = None,
+    preprocessor: Optional[Preprocessor] = None,
+) -> np.ndarray:
+    """Apply the given preprocessing *stages* to the image.
+
+    :param image: Input image (BGR or grayscale); processed in grayscale.
+    :param stages: Stage names from :data:`FULL_PIPELINE`, applied in order.
+    :param debug_dir: Optional directory to store intermediate images for debugging.
+    :param preprocessor: Reuse the buffers of this :class:`Preprocessor`; the
+        result is then only valid until its next run.
+    :return: Preprocessed grayscale image.
+    """
+
+    def _save(stage: str, img: np.ndarray) -> None:
+        debug_dir.mkdir(parents=True, exist_ok=True)
+        cv2.imwrite(str(debug_dir / f"{stage}.png"), img)
+
+    return (preprocessor or Preprocessor()).run(
+        image,
+        stages,
+        dpi=dpi,
+        source_dpi=source_dpi,
+        alpha=alpha,
+        beta=beta,
+        ksize=ksize,
+        on_stage=_save if debug_dir is not None else None,
+    )
+
+
+def plan_stages(image: np.ndarray, source_dpi: Optional[float] = None) -> List[str]:
+    """Choose the preprocessing stages this image actually needs.
+
+    Resizing is chosen for low-resolution images, contrast for flat images,
+    denoising when a median blur changes the image noticeably and deskewing
+    for skewed text. Binarization is always applied.
+
+    :param image: Input image (BGR or grayscale).
+    :param source_dpi: Resolution of the input image, if known.
+    :return: Stage names in pipeline order.
+    """
+    gray = _to_gray(image)
+    stages = []
+    if source_dpi and source_dpi < _LOW_DPI:
+        stages.append("resize")
+    if float(gray.std()) < _LOW_CONTRAST_STD:
+        stages.append("contrast")
+    if float(cv2.absdiff(gray, cv2.medianBlur(gray, 3)).mean()) > _NOISE_LEVEL:
+        stages.append("denoise")
+    angle = skew_angle(gray)
+    if angle is not None and _MIN_SKEW < abs(angle) < 45 - _MIN_SKEW:
+        stages.append("deskew")
+    stages.append("binarize")
+    return stages
+
+
+def _source_dpi(image: Image.Image) -> Optional[float]:
+    dpi = image.info.get("dpi")
+    # PNG stores dots per metre, so 200 dpi reads back as 199.9996
+    return float(round(dpi[0])) if dpi and round(dpi[0]) else None
+
+
+def ocr_tiered(
+    image: Image.Image,
+    language: str = "eng",
+    min_confidence: float = 60.0,
+    *,
+    psm: int = 3,
+    dpi: int = 300,
+    source_dpi: Optional[float] = None,
+    alpha: float = 1.5,
+    beta: float = 0.0,
+    ksize: int = 3,
+    debug_dir: Optional[Path] = None,
+    words: bool = False,
+) -> OcrResult:
+    """Recognize the image, preprocessing it only when OCR is not confident.
+
+    The first pass runs Tesseract on the image as is. If the mean word
+    confidence is below *min_confidence*, the stages chosen by
+    :func:`plan_stages` are applied and the image is recognized again with
+    the same languages and rotation. The result with the higher confidence
+    is returned; its ``tier`` and ``stages`` describe that result, so a raw
+    result kept over a worse preprocessed one reports ``"raw"`` and no stages.
+
+    :param image: Pillow image, e.g. a rendered PDF page.
+    :param language: Tesseract language code.
+    :param min_confidence: Confidence (0-100) below which the image is preprocessed.
+    :param source_dpi: Resolution of the image; read from ``image.info`` if omitted.
+    :param words: Also collect word boxes (see :attr:`OcrResult.words`).
+    :return: Recognized text with its confidence and tier.
+    """
+    raw = ocr_image_result(image, language=language, psm=psm, words=words)
+    if raw.confidence >= min_confidence:
+        return raw
+
+    if raw.rotate:
+        image = image.rotate(-raw.rotate, expand=True)
+    source_dpi = source_dpi or _source_dpi(image)
+    array = np.asarray(image.convert("L"))
+    stages = plan_stages(array, source_dpi=source_dpi)
+    processed = preprocess(
+        array,
+        stages,
+        dpi=dpi,
+        source_dpi=source_dpi,
+        alpha=alpha,
+        beta=beta,
+        ksize=ksize,
+        debug_dir=debug_dir,
+    )
+    heavy = ocr_image_result(
+        Image.fromarray(processed), language=raw.language, psm=psm, detect=False, words=words
+    )
+    logger.debug(
+        "OCR confidence %.1f below %.1f, preprocessed with %s: %.1f",
+        raw.confidence,
+        min_confidence,
+        ", ".join(stages),
+        heavy.confidence,
+    )
+    if heavy.confidence < raw.confidence:
+        # Preprocessing did not help: return the raw pass unchanged
+        return raw
+    return OcrResult(
+        heavy.text,
+        heavy.confidence,
+        raw.language,
+        raw.rotate,
+        tier="preprocessed",
+        stages=tuple(stages),
+        words=heavy.words,
+    )
+
+
 def run_ocr(
     path: Union[str, Path],
     lang: str = "rus",
@@ -114,9 +475,15 @@ def run_ocr(
     beta: float = 0.0,
     ksize: int = 3,
     debug_dir: Optional[Path] = None,
+    min_confidence: Optional[float] = None,
+    preprocessor: Optional[Preprocessor] = None,
 ) -> str:
     """Run the OCR pipeline on the given image and return recognized text.
 
+    The image is loaded in grayscale. Its resolution is read from the file
+    (or estimated, see :func:`page_dpi`), so resizing only happens when the
+    scan is not already at *dpi*.
+
     :param path: Path to the image file.
     :param lang: Tesseract language code (default ``"rus"``).
     :param dpi: Target DPI for preprocessing.
@@ -124,6 +491,10 @@ def run_ocr(
     :param beta: Brightness control passed to :func:`increase_contrast`.
     :param ksize: Kernel size for :func:`remove_noise`.
     :param debug_dir: Optional directory to store intermediate images for debugging.
+    :param min_confidence: If set, recognize the image as is first and run only
+        the needed preprocessing stages when the confidence is lower
+        (see :func:`ocr_tiered`). Otherwise the full pipeline is always applied.
+    :param preprocessor: Reuse the buffers of this :class:`Preprocessor`.
     :return: Recognized text as a string.
     :raises FileNotFoundError: If the image file does not exist.
     :raises ValueError: If the file has an unsupported extension or cannot be loaded.
@@ -131,48 +502,368 @@ def run_ocr(
     path = Path(path)
     if not path.exists():
         raise FileNotFoundError(f"Image not found: {path}")
-    if path.suffix.lower() not in {".png", ".jpg", ".jpeg", ".tif", ".tiff", ".bmp", ".gif"}:
+    if path.suffix.lower() not in IMAGE_EXTENSIONS:
         raise ValueError(f"Unsupported image extension: {path.suffix}")
 
-    image = cv2.imread(str(path))
+    image = cv2.imread(str(path), cv2.IMREAD_GRAYSCALE)
     if image is None:
         # File exists but OpenCV couldn't decode it
         raise ValueError(f"Unable to load image: {path}")
+    source_dpi = page_dpi(image, read_dpi(path))
+
+    if min_confidence is not None:
+        result = ocr_tiered(
+            Image.fromarray(image),
+            language=lang,
+            min_confidence=min_confidence,
+            dpi=dpi,
+            source_dpi=source_dpi,
+            alpha=alpha,
+            beta=beta,
+            ksize=ksize,
+            debug_dir=debug_dir,
+        )
+        return result.text
+
+    image = preprocess(
+        image,
+        FULL_PIPELINE,
+        dpi=dpi,
+        source_dpi=source_dpi,
+        alpha=alpha,
+        beta=beta,
+        ksize=ksize,
+        debug_dir=debug_dir,
+        preprocessor=preprocessor,
+    )
+    return ocr_image(Image.fromarray(image), language=lang)
 
-    def _save(stage: str, img: np.ndarray) -> None:
-        if debug_dir is None:
-            return
-        debug_dir.mkdir(parents=True, exist_ok=True)
-        cv2.imwrite(str(debug_dir / f"{stage}.png"), img)
-
-    _save("original", image)
-
-    image = resize_to_dpi(image, dpi)
-    _save("resized", image)
-
-    image = increase_contrast(image, alpha=alpha, beta=beta)
-    _save("contrast", image)
-
-    image = remove_noise(image, ksize=ksize)
-    _save("denoised", image)
-
-    image = deskew(image)
-    _save("deskewed", image)
 
-    image = crop_margins(image)
-    _save("cropped", image)
+@dataclass
+class BatchItem:
+    """Result of one image in :func:`run_ocr_batch`.
 
-    image = binarize(image)
-    _save("binarized", image)
+    :param path: Path to the image.
+    :param text: Recognized text (empty on error).
+    :param seconds: Wall time spent on the image.
+    :param error: Error message if the image could not be processed.
+    """
 
-    pil_img = Image.fromarray(image)
+    path: Path
+    text: str = ""
+    seconds: float = 0.0
+    error: Optional[str] = None
+
+    def to_json(self) -> str:
+        record = {"path": str(self.path), "text": self.text, "seconds": round(self.seconds, 3)}
+        if self.error is not None:
+            record["error"] = self.error
+        return json.dumps(record, ensure_ascii=False)
+
+
+@dataclass
+class BatchStats:
+    """Throughput of a batch run."""
+
+    done: int = 0
+    failed: int = 0
+    elapsed: float = 0.0
+    latencies: List[float] = field(default_factory=list)
+
+    def add(self, item: BatchItem) -> None:
+        self.done += 1
+        self.failed += item.error is not None
+        self.latencies.append(item.seconds)
+
+    def percentile(self, q: float) -> float:
+        """Latency percentile *q* (0-100), nearest-rank."""
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        rank = max(1, math.ceil(len(ordered) * q / 100))
+        return ordered[rank - 1]
+
+    @property
+    def pages_per_second(self) -> float:
+        return self.done / self.elapsed if self.elapsed else 0.0
+
+    def describe(self) -> str:
+        return (
+            f"{self.done} images ({self.failed} failed) in {self.elapsed:.1f} s: "
+            f"{self.pages_per_second:.2f} pages/s, "
+            f"p50 {self.percentile(50):.2f} s, p95 {self.percentile(95):.2f} s"
+        )
+
+
+def iter_images(directory: Union[str, Path], recursive: bool = True) -> Iterator[Path]:
+    """Yield supported image files in *directory*, sorted by path."""
+    directory = Path(directory)
+    if not directory.is_dir():
+        raise FileNotFoundError(f"Directory not found: {directory}")
+    pattern = "**/*" if recursive else "*"
+    for path in sorted(directory.glob(pattern)):
+        if path.is_file() and path.suffix.lower() in IMAGE_EXTENSIONS:
+            yield path
+
+
+def run_ocr_batch(
+    paths: Iterable[Union[str, Path]],
+    jobs: Optional[int] = None,
+    stats: Optional[BatchStats] = None,
+    **kwargs,
+) -> Iterator[BatchItem]:
+    """Run :func:`run_ocr` on many images in a thread pool.
+
+    All threads share the process-wide pool of warm Tesseract engines, and
+    each thread keeps its own :class:`Preprocessor`, so buffers are reused
+    from image to image. Results are yielded in input order; at most
+    ``2 * jobs`` images are in flight. A failing image yields a
+    :class:`BatchItem` with ``error`` set instead of stopping the batch.
+
+    :param paths: Image paths, e.g. from :func:`iter_images`.
+    :param jobs: Number of worker threads (default ``OCR_WORKERS`` or the CPU count).
+    :param stats: Collects throughput and latency if given.
+    :param kwargs: Passed to :func:`run_ocr` (``lang``, ``dpi``, ``min_confidence``…).
+    :return: Iterator of :class:`BatchItem`.
+    """
+    jobs = max(1, jobs or config.ocr_workers or os.cpu_count() or 1)
+    local = threading.local()
+
+    def process(path: Path) -> BatchItem:
+        preprocessor = getattr(local, "preprocessor", None)
+        if preprocessor is None:
+            preprocessor = local.preprocessor = Preprocessor()
+        started = time.perf_counter()
+        try:
+            text = run_ocr(path, preprocessor=preprocessor, **kwargs)
+        except Exception as exc:  # reported per image, the batch goes on
+            logger.warning("OCR failed for %s: %s", path, exc)
+            return BatchItem(path, seconds=time.perf_counter() - started, error=str(exc))
+        return BatchItem(path, text, time.perf_counter() - started)
+
+    started = time.perf_counter()
+    pending: Deque[Future] = deque()
+
+    def finish() -> BatchItem:
+        item = pending.popleft().result()
+        if stats is not None:
+            stats.add(item)
+            stats.elapsed = time.perf_counter() - started
+        return item
+
+    pool = ThreadPoolExecutor(max_workers=jobs, thread_name_prefix="ocr-batch")
     try:
-        return pytesseract.image_to_string(pil_img, lang=lang)
-    except pytesseract.TesseractError as exc:
-        if lang != "eng":
-            logger.warning("Tesseract language '%s' unavailable, falling back to 'eng'", lang)
-            return pytesseract.image_to_string(pil_img, lang="eng")
-        raise exc
+        for path in paths:
+            pending.append(pool.submit(process, Path(path)))
+            while len(pending) >= 2 * jobs:
+                yield finish()
+        while pending:
+            yield finish()
+    finally:
+        # The consumer may stop early: do not wait for the remaining images
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _text_path(path: Path, input_dir: Path, output_dir: Optional[Path]) -> Path:
+    """Path of the ``.txt`` result for the image *path*.
+
+    The image name keeps its suffix (``a.png`` → ``a.png.txt``), so ``a.png``
+    and ``a.tiff`` do not overwrite each other; under *output_dir* the
+    subfolders of *input_dir* are mirrored.
+    """
+    target = path.with_name(path.name + ".txt")
+    if output_dir is None:
+        return target
+    return output_dir / target.relative_to(input_dir)
+
+
+def _write_results(
+    items: Iterable[BatchItem],
+    jsonl: Optional[TextIO],
+    input_dir: Path,
+    output_dir: Optional[Path] = None,
+) -> None:
+    """Write each result into *jsonl* or into a ``.txt`` file (see :func:`_text_path`)."""
+    for item in items:
+        if jsonl is not None:
+            jsonl.write(item.to_json() + "\n")
+        elif item.error is None:
+            target = _text_path(item.path, input_dir, output_dir)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_text(item.text, encoding="utf-8")
+
+
+PageSpec = Union[str, Iterable[int], None]
+
+
+def parse_pages(spec: PageSpec, count: int) -> List[int]:
+    """Turn a page selection into sorted 1-based page numbers.
+
+    :param spec: ``None`` for all pages, a string such as ``"1-3,5,8-"`` or
+        an iterable of page numbers.
+    :param count: Number of pages in the document.
+    :return: Selected page numbers.
+    :raises ValueError: If the selection is malformed or out of range.
+    """
+    if spec is None:
+        return list(range(1, count + 1))
+    numbers = set()
+    if isinstance(spec, str):
+        for part in spec.replace(" ", "").split(","):
+            if not part:
+                continue
+            first, dash, last = part.partition("-")
+            try:
+                start = int(first) if first else 1
+                end = (int(last) if last else count) if dash else start
+            except ValueError:
+                raise ValueError(f"Invalid page range: {part}") from None
+            if start > end:
+                raise ValueError(f"Invalid page range: {part}")
+            numbers.update(range(start, end + 1))
+    else:
+        numbers.update(int(n) for n in spec)
+    if not numbers:
+        raise ValueError("No pages selected")
+    if min(numbers) < 1 or max(numbers) > count:
+        raise ValueError(f"Pages must be between 1 and {count}")
+    return sorted(numbers)
+
+
+def _page_count(path: Path, ext: str) -> int:
+    if ext == ".pdf":
+        if file_utils.fitz is None:
+            raise RuntimeError("PyMuPDF is not installed, PDF cannot be processed")
+        with file_utils.open_pdf(path) as doc:
+            return doc.page_count
+    with Image.open(path) as img:
+        return getattr(img, "n_frames", 1) if ext in {".tif", ".tiff"} else 1
+
+
+def _iter_pages(
+    path: Path, ext: str, numbers: Sequence[int], dpi: int
+) -> Iterator[Tuple[int, str, Union[str, Image.Image]]]:
+    """Yield ``(number, kind, text or image)`` for the requested pages.
+
+    PDF pages with a text layer yield ``"text"``, blank ones ``"blank"`` and
+    scanned ones a rendered ``"image"`` (see :func:`file_utils.classify_page`).
+    """
+    if ext == ".pdf":
+        with file_utils.open_pdf(path) as doc:
+            for number in numbers:
+                page = doc[number - 1]
+                kind, text = file_utils.classify_page(page)
+                if kind == "image":
+                    yield number, kind, file_utils.render_page(page, dpi)
+                else:
+                    yield number, kind, text
+        return
+    with Image.open(path) as img:
+        for number in numbers:
+            img.seek(number - 1)
+            if ext in (".tif", ".tiff"):
+                # Fax frames may have different resolutions along the axes
+                yield number, "image", file_utils._tiff_frame(img)[0]
+            else:
+                yield number, "image", img.copy()
+
+
+def _recognize_page(image: Image.Image, language: str, psm: int) -> str:
+    if config.ocr_min_confidence is not None:
+        return ocr_tiered(image, language, config.ocr_min_confidence, psm=psm).text
+    return ocr_image(image, language=language, psm=psm)
+
+
+def extract_text(
+    path: Union[str, Path],
+    language: str = "eng",
+    psm: int = 3,
+    pages: PageSpec = None,
+    dpi: Optional[int] = None,
+) -> str:
+    """Recognize a document again with the given OCR settings.
+
+    Handles images, multi-page TIFFs and PDFs. PDF pages with a text layer
+    keep it, blank pages are skipped, and scanned pages are rendered at
+    *dpi* (default ``PDF_OCR_DPI``) and recognized. Pages are recognized in
+    parallel. Each page's text is cached under the file hash and the OCR
+    settings, so a page recognized before with the same settings is not
+    processed again.
+
+    :param path: Path to the document.
+    :param language: Tesseract language code, e.g. ``"rus+eng"``.
+    :param psm: Tesseract page segmentation mode.
+    :param pages: Pages to process (see :func:`parse_pages`); all by default.
+    :param dpi: Rendering resolution for scanned PDF pages.
+    :return: Text of the selected pages joined with newlines.
+    :raises FileNotFoundError: If the file does not exist.
+    :raises ValueError: If the file type or page selection is not supported.
+    """
+    path = Path(path)
+    if not path.exists():
+        raise FileNotFoundError(f"File not found: {path}")
+    ext = path.suffix.lower()
+    if ext != ".pdf" and ext not in IMAGE_EXTENSIONS:
+        raise ValueError(f"Unsupported file extension for OCR: {path.suffix}")
+    dpi = dpi or config.pdf_ocr_dpi
+    numbers = parse_pages(pages, _page_count(path, ext))
+
+    cache = get_extraction_cache()
+    keys: Dict[int, str] = {}
+    texts: Dict[int, str] = {}
+    if cache is not None:
+        content_hash = hash_file(path)
+        for number in numbers:
+            keys[number] = make_key(
+                content_hash,
+                version=file_utils.PARSER_VERSION,
+                language=language,
+                page=number,
+                psm=psm,
+                dpi=dpi if ext == ".pdf" else None,
+                min_confidence=config.ocr_min_confidence,
+            )
+            try:
+                cached = cache.get(keys[number])
+            except Exception:  # the cache must not break OCR
+                logger.warning("OCR page cache lookup failed for %s", path, exc_info=True)
+                cached = None
+            if cached is not None:
+                texts[number] = cached
+    missing = [number for number in numbers if number not in texts]
+    logger.info(
+        "Re-running OCR on %s: %d pages, %d cached", path.name, len(numbers), len(numbers) - len(missing)
+    )
+
+    # Shares the cores with the other extraction processes (see share_ocr_threads)
+    workers = file_utils._ocr_workers()
+    pending: Deque[Tuple[int, Future]] = deque()
+
+    def finish() -> None:
+        number, future = pending.popleft()
+        texts[number] = future.result()
+        if cache is not None:
+            try:
+                cache.put(keys[number], texts[number])
+            except Exception:  # the cache must not break OCR
+                logger.warning("Failed to cache OCR text of %s", path, exc_info=True)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for number, kind, payload in _iter_pages(path, ext, missing, dpi):
+            if kind == "image":
+                pending.append((number, pool.submit(_recognize_page, payload, language, psm)))
+            else:
+                texts[number] = payload
+            # Keep only a few rendered pages in memory
+            while len(pending) >= 2 * workers:
+                finish()
+        while pending:
+            finish()
+
+    # Text-layer pages end with a newline; strip pages so joining adds no blank lines
+    return "\n".join(
+        texts[number].strip() for number in numbers if texts[number].strip()
+    )
 
 
 def _parse_odd_int(value: str) -> int:
@@ -183,28 +874,65 @@ def _parse_odd_int(value: str) -> int:
     return ivalue
 
 
-if __name__ == "__main__":  # pragma: no cover - simple CLI
-    parser = argparse.ArgumentParser(description="Run OCR pipeline on an image")
-    parser.add_argument("--input", required=True, help="Path to image file")
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    """Command line entry point; see ``--help``."""
+    parser = argparse.ArgumentParser(description="Run OCR pipeline on images")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--input", help="Path to image file")
+    source.add_argument("--input-dir", type=Path, help="Directory with images to process recursively")
     parser.add_argument("--lang", default="rus", help="Tesseract language code")
     parser.add_argument("--dpi", type=int, default=300, help="Target DPI")
     parser.add_argument("--alpha", type=float, default=1.5, help="Contrast control")
     parser.add_argument("--beta", type=float, default=0.0, help="Brightness control")
     parser.add_argument("--ksize", type=_parse_odd_int, default=3, help="Median blur kernel size")
     parser.add_argument("--debug-dir", type=Path, default=None, help="Directory to save debug images")
-    parser.add_argument("--output", type=Path, default=None, help="File to store recognized text")
-    params = parser.parse_args()
+    parser.add_argument(
+        "--output",
+        type=Path,
+        default=None,
+        help="File to store recognized text; with --input-dir a JSONL file "
+        "(by default a .txt file is written next to each image)",
+    )
+    parser.add_argument(
+        "--output-dir",
+        type=Path,
+        default=None,
+        help="With --input-dir: directory for the .txt files, mirroring the input folders",
+    )
+    parser.add_argument(
+        "--min-confidence",
+        type=float,
+        default=None,
+        help="Preprocess only when raw OCR confidence is below this value (0-100)",
+    )
+    parser.add_argument("--jobs", type=int, default=None, help="Worker threads for --input-dir")
+    params = parser.parse_args(argv)
 
-    result = run_ocr(
-        params.input,
+    options = dict(
         lang=params.lang,
         dpi=params.dpi,
         alpha=params.alpha,
         beta=params.beta,
         ksize=params.ksize,
-        debug_dir=params.debug_dir,
+        min_confidence=params.min_confidence,
     )
+    if params.input_dir is None:
+        result = run_ocr(params.input, debug_dir=params.debug_dir, **options)
+        if params.output:
+            params.output.write_text(result, encoding="utf-8")
+        else:
+            print(result)
+        return
+
+    stats = BatchStats()
+    items = run_ocr_batch(iter_images(params.input_dir), jobs=params.jobs, stats=stats, **options)
     if params.output:
-        params.output.write_text(result, encoding="utf-8")
+        with params.output.open("w", encoding="utf-8") as jsonl:
+            _write_results(items, jsonl, params.input_dir)
     else:
-        print(result)
+        _write_results(items, None, params.input_dir, params.output_dir)
+    print(stats.describe(), file=sys.stderr)
+
+
+if __name__ == "__main__":  # pragma: no cover - simple CLI
+    main()
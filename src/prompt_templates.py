@@ -1,8 +1,26 @@
 from __future__ import annotations
 
-import json
 from typing import Any, Dict, Optional
 
+from config import config
+from folder_context import build_folder_context
+from utils.text_budget import fit_text
+
+# Общие для одиночного и пакетного промптов указания
+_FOLDER_RULES = (
+    "Если ни одна папка не подходит, предложи новую category/subcategory. \n"
+    "Выбирай person/category строго из Existing folders, если совпадение найдено; needs_new_folder=true только при полном отсутствии.\n"
+)
+_FIELDS = (
+    "category, subcategory, needs_new_folder (boolean), issuer, person, doc_type, "
+    "date, amount, counterparty, document_number, due_date, currency, tags_ru (list of strings), tags_en (list of strings),"
+    "suggested_filename, description, summary"
+)
+_FIELD_RULES = (
+    "Field 'summary' must briefly summarize the document in 1-2 sentences.\n"
+    "Field 'person' must be in the format 'Фамилия Имя Отчество'; do not use the person's name in category or subcategory.\n"
+)
+
 
 def build_metadata_prompt(
     text: str,
@@ -11,9 +29,15 @@ def build_metadata_prompt(
     folder_index: Optional[Dict[str, Any]] = None,
     file_info: Optional[Dict[str, Any]] = None,
 ) -> str:
-    """Сформировать промт для извлечения метаданных."""
-    tree_json = json.dumps(folder_tree or {}, ensure_ascii=False)
-    index_json = json.dumps(folder_index or {}, ensure_ascii=False)
+    """Сформировать промт для извлечения метаданных.
+
+    Вместо всего дерева архива в промпт попадают только папки, похожие на
+    текст документа (см. :func:`folder_context.build_folder_context`), а
+    текст укладывается в ``config.llm_metadata_text_tokens`` токенов
+    (см. :func:`utils.text_budget.fit_text`).
+    """
+    folders = build_folder_context(text, folder_tree, folder_index)
+    text = fit_text(text, config.llm_metadata_text_tokens)
     info = file_info or {}
     filename = info.get("name")
     extension = info.get("extension")
@@ -27,20 +51,53 @@ def build_metadata_prompt(
         f"Size: {size}\n"
         f"File type: {file_type}\n"
         "Possible document types include: contracts, receipts, notifications, advertisement.\n"
-        "Existing folder tree (JSON):\n"
-        f"{tree_json}\n"
-        "Existing folders index (JSON):\n"
-        f"{index_json}\n"
-        "Если ни одна папка не подходит, предложи новую category/subcategory. \n"
-        "Выбирай person/category строго из Existing folders index, если совпадение найдено; needs_new_folder=true только при полном отсутствии.\n"
-        "Return a JSON object with the fields: category, subcategory, needs_new_folder (boolean), issuer, person, doc_type, "
-        "date, amount, counterparty, document_number, due_date, currency, tags_ru (list of strings), tags_en (list of strings),"
-        "suggested_filename, description, summary.\n"
-        "Field 'summary' must briefly summarize the document in 1-2 sentences.\n"
-        "Field 'person' must be in the format 'Фамилия Имя Отчество'; do not use the person's name in category or subcategory.\n"
+        "Existing folders (person, then category: subcategories; most relevant first):\n"
+        f"{folders}\n"
+        f"{_FOLDER_RULES}"
+        f"Return a JSON object with the fields: {_FIELDS}.\n"
+        f"{_FIELD_RULES}"
         f"Document text:\n{text}"
     )
 
 
-__all__ = ["build_metadata_prompt"]
+def build_batch_metadata_prompt(
+    documents: Dict[str, str],
+    *,
+    folder_tree: Optional[Dict[str, Any]] = None,
+    folder_index: Optional[Dict[str, Any]] = None,
+) -> str:
+    """Сформировать один промт для извлечения метаданных нескольких документов.
+
+    *documents* — словарь «id документа → текст». Контекст папок строится
+    один раз по всем текстам, а каждый текст укладывается в свою долю
+    ``config.llm_metadata_text_tokens``, но не меньше
+    ``config.metadata_batch_doc_tokens`` токенов. Модель должна вернуть
+    ``{"documents": [...]}`` с полем ``id`` в каждом объекте.
+    """
+    folders = build_folder_context("\n".join(documents.values()), folder_tree, folder_index)
+    per_doc = max(
+        config.metadata_batch_doc_tokens,
+        config.llm_metadata_text_tokens // max(1, len(documents)),
+    )
+    sections = "".join(
+        f"=== Document {doc_id} ===\n{fit_text(text, per_doc)}\n"
+        for doc_id, text in documents.items()
+    )
+
+    return (
+        "You are an assistant that extracts structured metadata from documents.\n"
+        f"Below are {len(documents)} independent documents, each starting with a line '=== Document <id> ==='.\n"
+        "Possible document types include: contracts, receipts, notifications, advertisement.\n"
+        "Existing folders (person, then category: subcategories; most relevant first):\n"
+        f"{folders}\n"
+        f"{_FOLDER_RULES}"
+        'Return a JSON object {"documents": [...]} with exactly one object per document, in the same order. '
+        f"Each object must contain the field id (the document id as a string) and the fields: {_FIELDS}.\n"
+        f"{_FIELD_RULES}"
+        "Analyze every document on its own; do not mix information between documents.\n"
+        f"{sections}"
+    )
+
+
+__all__ = ["build_batch_metadata_prompt", "build_metadata_prompt"]
 
@@ -6,100 +6,137 @@ import uuid
 from pathlib import Path
 
 from error_handling import handle_error
-from file_sorter import place_file, get_folder_tree
-from file_utils import extract_text
+from file_sorter import add_archive_text_layer, place_file, get_folder_tree
+from file_utils import ExtractionBudget, extract_document, extract_text
+from config import config
+from services.extraction import run_extraction
+from services.openrouter import client_session
 from models import Metadata
 from web_app import db as database
 import metadata_generation
 
 logger = logging.getLogger(__name__)
 
+# Сколько пакетов метаданных собирается из одной группы файлов
+_BATCH_GROUP_FACTOR = 4
+
 
 async def process_input_directory(
-    input_dir: str | Path, dest_root: str | Path, dry_run: bool = False
+    input_dir: str | Path,
+    dest_root: str | Path,
+    dry_run: bool = False,
+    budget: ExtractionBudget | None = None,
 ) -> None:
     """Асинхронно обработать все файлы из *input_dir* и разместить их под *dest_root*.
 
     Логика перенесена из прежнего CLI-модуля ``docrouter`` и предназначена
-    для использования внутри бэкенда или сервисов.
+    для использования внутри бэкенда или сервисов. *budget* ограничивает
+    извлечение текста для классификации (по умолчанию — из настроек);
+    полный текст дочитывается позже по запросу. Запросы к OpenRouter на
+    время прохода идут через общий пул соединений. При
+    ``config.metadata_batch_size`` больше 1 метаданные коротких документов
+    запрашиваются пакетами (см.
+    :func:`metadata_generation.generate_metadata_batch`).
     """
 
     input_path = Path(input_dir)
+    if budget is None:
+        budget = ExtractionBudget.from_config()
     logger.info("Processing directory %s", input_path)
 
     tree, index = get_folder_tree(dest_root)
 
+    async def extract(path: Path) -> tuple[str, bool]:
+        # from_config() возвращает None, если ограничения не заданы: тогда
+        # текст читается целиком
+        if budget is None:
+            return await run_extraction(extract_text, path), True
+        result = await run_extraction(extract_document, path, budget=budget)
+        return result.text, result.complete
+
+    async def describe(text: str) -> dict:
+        try:
+            return await metadata_generation.generate_metadata(
+                text, folder_tree=tree, folder_index=index
+            )
+        except TypeError:
+            return await metadata_generation.generate_metadata(text)  # type: ignore[arg-type]
+
     async def process_file(path: Path) -> None:
         logger.info("Processing file %s", path)
         try:
-            text = extract_text(path)
-            try:
-                meta_result = await metadata_generation.generate_metadata(
-                    text, folder_tree=tree, folder_index=index
-                )
-            except TypeError:
-                meta_result = await metadata_generation.generate_metadata(text)  # type: ignore[arg-type]
-            raw_meta = meta_result["metadata"]
-            if isinstance(raw_meta, dict):
-                meta_dict = raw_meta
-            else:
-                meta_dict = raw_meta.model_dump()
-            rel_dir = path.parent.relative_to(input_path)
-            rel_parts = list(rel_dir.parts)
-            if rel_parts and not meta_dict.get("category"):
-                meta_dict["category"] = rel_parts[0]
-            if len(rel_parts) > 1 and not meta_dict.get("subcategory"):
-                meta_dict["subcategory"] = rel_parts[1]
-            dest_base = Path(dest_root)
-            dest_base.mkdir(parents=True, exist_ok=True)
-            file_id = str(uuid.uuid4())
-
-            dest_path, missing, confirmed = place_file(
-                path,
-                meta_dict,
-                dest_base,
-                dry_run=dry_run,
-                needs_new_folder=True,
-                confirm_callback=lambda _paths: False,
-            )
-            metadata_obj = Metadata(**meta_dict)
-            if missing:
-                await asyncio.to_thread(
-                    database.add_file,
-                    file_id,
-                    path.name,
-                    metadata_obj,
-                    str(path),
-                    "pending",
-                    meta_result.get("prompt"),
-                    meta_result.get("raw_response"),
-                    missing,
-                    suggested_path=str(dest_path),
-                    confirmed=confirmed,
-                    created_path=str(dest_path) if confirmed else None,
-                )
-                logger.warning("Pending %s due to missing %s", path, missing)
-                return
-
-            status = "dry_run" if dry_run else "finalized"
+            text, text_complete = await extract(path)
+            meta_result = await describe(text)
+            await finish(path, text, text_complete, meta_result)
+        except Exception as exc:  # pragma: no cover - depending on runtime errors
+            handle_error(path, exc)
+            logger.error("Failed to process %s: %s", path, exc)
+
+    async def finish(path: Path, text: str, text_complete: bool, meta_result: dict) -> None:
+        raw_meta = meta_result["metadata"]
+        if isinstance(raw_meta, dict):
+            meta_dict = raw_meta
+        else:
+            meta_dict = raw_meta.model_dump()
+        rel_dir = path.parent.relative_to(input_path)
+        rel_parts = list(rel_dir.parts)
+        if rel_parts and not meta_dict.get("category"):
+            meta_dict["category"] = rel_parts[0]
+        if len(rel_parts) > 1 and not meta_dict.get("subcategory"):
+            meta_dict["subcategory"] = rel_parts[1]
+        if not text_complete:
+            meta_dict["extracted_text"] = text
+            meta_dict["text_complete"] = False
+        dest_base = Path(dest_root)
+        dest_base.mkdir(parents=True, exist_ok=True)
+        file_id = str(uuid.uuid4())
+
+        dest_path, missing, confirmed = await asyncio.to_thread(
+            place_file,
+            path,
+            meta_dict,
+            dest_base,
+            dry_run=dry_run,
+            needs_new_folder=True,
+            confirm_callback=lambda _paths: False,
+        )
+        if not dry_run and not missing:
+            await asyncio.to_thread(add_archive_text_layer, dest_path, meta_dict)
+        metadata_obj = Metadata(**meta_dict)
+        if missing:
             await asyncio.to_thread(
                 database.add_file,
                 file_id,
                 path.name,
                 metadata_obj,
-                str(dest_path),
-                status,
+                str(path),
+                "pending",
                 meta_result.get("prompt"),
                 meta_result.get("raw_response"),
-                [],
+                missing,
                 suggested_path=str(dest_path),
                 confirmed=confirmed,
                 created_path=str(dest_path) if confirmed else None,
             )
-            logger.info("Finished processing %s", path)
-        except Exception as exc:  # pragma: no cover - depending on runtime errors
-            handle_error(path, exc)
-            logger.error("Failed to process %s: %s", path, exc)
+            logger.warning("Pending %s due to missing %s", path, missing)
+            return
+
+        status = "dry_run" if dry_run else "finalized"
+        await asyncio.to_thread(
+            database.add_file,
+            file_id,
+            path.name,
+            metadata_obj,
+            str(dest_path),
+            status,
+            meta_result.get("prompt"),
+            meta_result.get("raw_response"),
+            [],
+            suggested_path=str(dest_path),
+            confirmed=confirmed,
+            created_path=str(dest_path) if confirmed else None,
+        )
+        logger.info("Finished processing %s", path)
 
     semaphore = asyncio.Semaphore(5)
 
@@ -107,12 +144,65 @@ async def process_input_directory(
         async with semaphore:
             await process_file(path)
 
-    tasks = [
-        asyncio.create_task(sem_task(path), name=str(path))
-        for path in input_path.rglob("*")
-        if path.is_file()
-    ]
-    results = await asyncio.gather(*tasks, return_exceptions=True)
+    async def process_group(paths: list[Path]) -> None:
+        """Извлечь текст файлов группы и получить метаданные пакетными запросами."""
+        extracted: dict[str, tuple[Path, str, bool]] = {}
+
+        async def extract_one(doc_id: str, path: Path) -> None:
+            logger.info("Processing file %s", path)
+            try:
+                async with semaphore:
+                    text, text_complete = await extract(path)
+                extracted[doc_id] = (path, text, text_complete)
+            except Exception as exc:
+                handle_error(path, exc)
+                logger.error("Failed to process %s: %s", path, exc)
+
+        ids = [str(number) for number in range(1, len(paths) + 1)]
+        await asyncio.gather(*(extract_one(doc_id, path) for doc_id, path in zip(ids, paths)))
+        ids = [doc_id for doc_id in ids if doc_id in extracted]
+        try:
+            meta_results = await metadata_generation.generate_metadata_batch(
+                {doc_id: extracted[doc_id][1] for doc_id in ids},
+                folder_tree=tree,
+                folder_index=index,
+            )
+        except Exception as exc:
+            # Пакетный запрос не удался целиком (сеть, разбор ответа):
+            # метаданные запрашиваются для каждого файла отдельно
+            logger.warning("Metadata batch failed, describing files one by one: %s", exc)
+            meta_results = {}
+
+        async def finish_one(doc_id: str) -> None:
+            path, text, text_complete = extracted[doc_id]
+            try:
+                meta_result = meta_results.get(doc_id)
+                if meta_result is None:
+                    meta_result = await describe(text)
+                if isinstance(meta_result, BaseException):
+                    raise meta_result
+                async with semaphore:
+                    await finish(path, text, text_complete, meta_result)
+            except Exception as exc:
+                handle_error(path, exc)
+                logger.error("Failed to process %s: %s", path, exc)
+
+        await asyncio.gather(*(finish_one(doc_id) for doc_id in ids))
+
+    paths = [path for path in input_path.rglob("*") if path.is_file()]
+    async with client_session():
+        if config.metadata_batch_size > 1:
+            # Группы по несколько пакетов: пока первые группы ждут ответа
+            # модели, следующие ещё извлекают текст
+            group_size = config.metadata_batch_size * _BATCH_GROUP_FACTOR
+            groups = [paths[i : i + group_size] for i in range(0, len(paths), group_size)]
+            tasks = [
+                asyncio.create_task(process_group(group), name=str(group[0]))
+                for group in groups
+            ]
+        else:
+            tasks = [asyncio.create_task(sem_task(path), name=str(path)) for path in paths]
+        results = await asyncio.gather(*tasks, return_exceptions=True)
     for task, result in zip(tasks, results):
         if isinstance(result, Exception):
             handle_error(Path(task.get_name()), result)
@@ -0,0 +1,194 @@
+"""Пул процессов для извлечения текста вне event loop."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import pickle
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional, TypeVar
+
+from config import config
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_UNSET: Any = object()
+
+
+class ExtractionTimeout(RuntimeError):
+    """Извлечение текста не уложилось в отведённое время."""
+
+
+def _init_worker(processes: int) -> None:
+    """Подготовить процесс пула: поделить ядра для OCR между процессами."""
+    from file_utils import share_ocr_threads
+
+    share_ocr_threads(processes)
+
+
+def _is_picklable(func: Callable[..., Any]) -> bool:
+    """Можно ли передать *func* в дочерний процесс."""
+    try:
+        pickle.dumps(func)
+    except Exception:
+        return False
+    return True
+
+
+class ExtractionService:
+    """Выполнять извлечение текста в отдельном пуле процессов.
+
+    OCR и разбор документов — синхронные и тяжёлые операции. Сервис отдаёт их
+    в ``ProcessPoolExecutor``, чтобы event loop оставался свободным, а все ядра
+    были заняты. Для каждого задания действует ограничение по времени: при
+    превышении пул пересоздаётся, а зависшие процессы завершаются.
+
+    Вызываемые объекты, которые нельзя передать в дочерний процесс (замыкания,
+    тестовые заглушки), а также режим ``workers=0`` выполняются в потоке.
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        max_tasks_per_child: Optional[int] = _UNSET,
+        timeout: Optional[float] = _UNSET,
+    ) -> None:
+        if workers is None:
+            workers = config.extraction_workers
+        if workers is None:
+            workers = os.cpu_count() or 1
+        self.workers = max(0, int(workers))
+        self.max_tasks_per_child = (
+            config.extraction_max_tasks_per_child
+            if max_tasks_per_child is _UNSET
+            else max_tasks_per_child
+        )
+        self.timeout = config.extraction_timeout if timeout is _UNSET else timeout
+        self._executor: ProcessPoolExecutor | None = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                kwargs: dict[str, Any] = {
+                    "max_workers": self.workers,
+                    # fork из процесса с работающим event loop и потоками небезопасен
+                    "mp_context": multiprocessing.get_context("spawn"),
+                    "initializer": _init_worker,
+                    "initargs": (self.workers,),
+                }
+                if self.max_tasks_per_child and sys.version_info >= (3, 11):
+                    kwargs["max_tasks_per_child"] = self.max_tasks_per_child
+                self._executor = ProcessPoolExecutor(**kwargs)
+                logger.info("Started extraction pool with %s workers", self.workers)
+            return self._executor
+
+    def _recycle(self, executor: ProcessPoolExecutor) -> None:
+        """Убрать *executor* из обращения и завершить его процессы."""
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        terminate = getattr(executor, "terminate_workers", None)
+        if terminate is not None:  # pragma: no cover - Python 3.14+
+            terminate()
+            return
+        processes = list((getattr(executor, "_processes", None) or {}).values())
+        executor.shutdown(wait=False, cancel_futures=True)
+        for proc in processes:
+            if proc.is_alive():
+                proc.terminate()
+
+    async def run(
+        self,
+        func: Callable[..., T],
+        *args: Any,
+        timeout: Optional[float] = _UNSET,
+        **kwargs: Any,
+    ) -> T:
+        """Выполнить ``func(*args, **kwargs)`` в пуле и дождаться результата.
+
+        :param timeout: ограничение по времени в секундах; по умолчанию
+            берётся из настроек, ``None`` отключает ограничение.
+        :raises ExtractionTimeout: если задание не завершилось вовремя.
+        """
+        if timeout is _UNSET:
+            timeout = self.timeout
+
+        if self.workers == 0 or not _is_picklable(func):
+            try:
+                return await asyncio.wait_for(
+                    asyncio.to_thread(func, *args, **kwargs), timeout
+                )
+            except asyncio.TimeoutError as exc:
+                raise ExtractionTimeout(
+                    f"Text extraction timed out after {timeout} s"
+                ) from exc
+
+        for attempt in (1, 2):
+            executor = self._get_executor()
+            future = executor.submit(func, *args, **kwargs)
+            try:
+                return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+            except asyncio.TimeoutError as exc:
+                logger.error("Extraction job timed out after %s s, recycling pool", timeout)
+                self._recycle(executor)
+                raise ExtractionTimeout(
+                    f"Text extraction timed out after {timeout} s"
+                ) from exc
+            except BrokenProcessPool:
+                # Пул мог быть пересоздан из-за чужого таймаута — пробуем ещё раз
+                self._recycle(executor)
+                if attempt == 2:
+                    raise
+                logger.warning("Extraction pool broken, retrying job in a new pool")
+        raise AssertionError("unreachable")  # pragma: no cover
+
+    def shutdown(self) -> None:
+        """Остановить пул, отменив ожидающие задания."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+_service: ExtractionService | None = None
+_service_lock = threading.Lock()
+
+
+def get_extraction_service() -> ExtractionService:
+    """Вернуть общий экземпляр :class:`ExtractionService`."""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = ExtractionService()
+        return _service
+
+
+def shutdown_extraction_service() -> None:
+    """Остановить общий пул извлечения, если он был создан."""
+    global _service
+    with _service_lock:
+        service, _service = _service, None
+    if service is not None:
+        service.shutdown()
+
+
+async def run_extraction(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Выполнить *func* в общем пуле извлечения."""
+    return await get_extraction_service().run(func, *args, **kwargs)
+
+
+__all__ = [
+    "ExtractionService",
+    "ExtractionTimeout",
+    "get_extraction_service",
+    "shutdown_extraction_service",
+    "run_extraction",
+]
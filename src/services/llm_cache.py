@@ -0,0 +1,93 @@
+"""Постоянный кэш ответов LLM.
+
+Ключ — SHA-256 от модели, сообщений, температуры и формата ответа, поэтому
+повторная генерация метаданных для того же текста, повторный проход по
+каталогу или перевод того же текста не отправляют платный запрос ещё раз.
+Записи хранятся в SQLite (см. :mod:`utils.sqlite_lru`), устаревают через заданное время и вытесняются по
+давности использования, когда суммарный объём ответов превышает предел.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import config
+from utils.sqlite_lru import SQLiteLRU
+
+_DEFAULT_PATH = Path(__file__).with_name("llm_cache.sqlite")
+
+# Ответ: текст, число токенов и стоимость исходного запроса
+Response = Tuple[str, Optional[int], Optional[float]]
+
+
+def make_key(
+    model: str,
+    messages: List[Dict[str, str]],
+    temperature: float,
+    response_format: Optional[Dict[str, Any]] = None,
+    **params: Any,
+) -> str:
+    """Сформировать ключ кэша из параметров запроса к модели."""
+    payload = json.dumps(
+        {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "response_format": response_format,
+            "params": params,
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache(SQLiteLRU):
+    """Кэш ответов на SQLite со сроком жизни и вытеснением по давности.
+
+    *ttl* — срок жизни записи в секундах (``None`` или 0 — бессрочно). Ответ
+    хранится как JSON-массив из текста, числа токенов и стоимости; в пределе
+    объёма учитывается только текст ответа.
+    """
+
+    def get(self, key: str) -> Optional[Response]:  # type: ignore[override]
+        """Вернуть ответ по ключу или ``None`` при промахе и устаревшей записи."""
+        value = super().get(key)
+        if value is None:
+            return None
+        reply, tokens, cost = json.loads(value)
+        return reply, tokens, cost
+
+    def put(  # type: ignore[override]
+        self, key: str, reply: str, tokens: Optional[int] = None, cost: Optional[float] = None
+    ) -> None:
+        """Сохранить ответ и при необходимости вытеснить старые записи."""
+        value = json.dumps([reply, tokens, cost], ensure_ascii=False)
+        super().put(key, value, size=len(reply.encode("utf-8")))
+
+
+_cache: LLMCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> Optional[LLMCache]:
+    """Вернуть общий кэш ответов LLM или ``None``, если кэш отключён."""
+    global _cache
+    if not config.llm_cache_enabled:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMCache(
+                config.llm_cache_path or _DEFAULT_PATH,
+                config.llm_cache_max_bytes,
+                config.llm_cache_ttl,
+            )
+        return _cache
+
+
+__all__ = ["LLMCache", "get_llm_cache", "make_key"]
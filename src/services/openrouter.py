@@ -1,20 +1,38 @@
-"""Обёртка для вызова OpenRouter."""
+"""Обёртка для вызова OpenRouter.
+
+Запросы идут через общий пул соединений :class:`httpx.AsyncClient`, который
+открывает владелец — сервер на время работы или обработчик каталога на время
+прохода (см. :func:`client_session`). Соединения переиспользуются
+(keep-alive, HTTP/2), поэтому TCP- и TLS-рукопожатие не повторяется для
+каждого запроса. Без открытого пула :func:`chat` создаёт клиент на один вызов.
+
+Ответы сохраняются в постоянном кэше (:mod:`services.llm_cache`), и
+одинаковый запрос к той же модели повторно не отправляется.
+"""
 
 from __future__ import annotations
 
-from typing import Any, Dict, List, Tuple, Optional
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, List, Tuple, Optional
 import asyncio
 import logging
 
 import httpx
 
+try:  # pragma: no cover - HTTP/2 требует пакет h2 (httpx[http2])
+    import h2  # noqa: F401
+except ImportError:  # pragma: no cover
+    h2 = None
+
 from config import (
+    config,
     OPENROUTER_API_KEY,
     OPENROUTER_BASE_URL,
     OPENROUTER_MODEL,
     OPENROUTER_SITE_URL,
     OPENROUTER_SITE_NAME,
 )
+from .llm_cache import get_llm_cache, make_key
 
 
 logger = logging.getLogger(__name__)
@@ -24,6 +42,137 @@ class OpenRouterError(RuntimeError):
     """Исключение при обращении к OpenRouter."""
 
 
+# Общий клиент, открытый владельцем (см. client_session)
+_client: Optional[httpx.AsyncClient] = None
+
+
+def create_client(**kwargs: Any) -> httpx.AsyncClient:
+    """Создать клиент с пулом соединений по настройкам ``OPENROUTER_*``.
+
+    Именованные аргументы передаются в :class:`httpx.AsyncClient` поверх
+    настроек, например ``transport`` для подмены сервера в тестах.
+    HTTP/2 включается, только если установлен пакет ``h2``.
+    """
+    http2 = config.openrouter_http2
+    if http2 and h2 is None:
+        logger.warning("Package h2 is not installed, OpenRouter client falls back to HTTP/1.1")
+        http2 = False
+    options: Dict[str, Any] = {
+        "http2": http2,
+        "limits": httpx.Limits(
+            max_connections=config.openrouter_max_connections,
+            max_keepalive_connections=config.openrouter_max_keepalive,
+            keepalive_expiry=config.openrouter_keepalive_expiry,
+        ),
+        "timeout": httpx.Timeout(
+            connect=config.openrouter_connect_timeout,
+            read=config.openrouter_read_timeout,
+            write=config.openrouter_write_timeout,
+            pool=config.openrouter_pool_timeout,
+        ),
+    }
+    options.update(kwargs)
+    return httpx.AsyncClient(**options)
+
+
+def get_client() -> Optional[httpx.AsyncClient]:
+    """Общий клиент или ``None``, если пул не открыт."""
+    return _client
+
+
+def set_client(client: Optional[httpx.AsyncClient]) -> Optional[httpx.AsyncClient]:
+    """Сделать *client* общим и вернуть прежний.
+
+    Клиент не закрывается: за это отвечает тот, кто его создал.
+    """
+    global _client
+    previous, _client = _client, client
+    return previous
+
+
+@asynccontextmanager
+async def client_session(
+    client: Optional[httpx.AsyncClient] = None,
+) -> AsyncIterator[httpx.AsyncClient]:
+    """Держать общий клиент открытым на время блока.
+
+    Без *client* переиспользуется уже открытый пул (например, серверный), а
+    если его нет — создаётся новый и закрывается при выходе. Переданный
+    *client* становится общим на время блока, но не закрывается.
+    """
+    if client is None and _client is not None:
+        yield _client
+        return
+    owned = client is None
+    client = client or create_client()
+    previous = set_client(client)
+    try:
+        yield client
+    finally:
+        set_client(previous)
+        if owned:
+            await client.aclose()
+
+
+async def _post(
+    client: httpx.AsyncClient,
+    api_url: str,
+    payload: Dict[str, Any],
+    headers: Dict[str, str],
+) -> Dict[str, Any]:
+    """Отправить запрос с повторами при временных ошибках."""
+    max_attempts = 3
+    delay = 1.0
+
+    for attempt in range(1, max_attempts + 1):
+        try:
+            response = await client.post(api_url, json=payload, headers=headers)
+            response.raise_for_status()
+            try:
+                data = response.json()
+            except ValueError as exc:
+                logger.error(
+                    "OpenRouter returned non-JSON response: %s", response.text
+                )
+                raise OpenRouterError(
+                    "OpenRouter returned non-JSON response"
+                ) from exc
+            break
+        except httpx.HTTPStatusError as exc:
+            status = exc.response.status_code
+            if status == 429 or 500 <= status < 600:
+                if attempt < max_attempts:
+                    logger.warning(
+                        "OpenRouter transient error %s, retry %s/%s", status, attempt, max_attempts
+                    )
+                    await asyncio.sleep(delay)
+                    delay *= 2
+                    continue
+                logger.error(
+                    "OpenRouter request failed after %s attempts: %s", max_attempts, status
+                )
+                raise OpenRouterError(
+                    f"OpenRouter request failed after {max_attempts} attempts: {status}"
+                ) from exc
+            logger.error("OpenRouter request failed: %s", status)
+            raise OpenRouterError(
+                f"OpenRouter request failed: {status}"
+            ) from exc
+        except httpx.HTTPError as exc:
+            if attempt < max_attempts:
+                logger.warning(
+                    "HTTP error during chat request: %s, retry %s/%s", exc, attempt, max_attempts
+                )
+                await asyncio.sleep(delay)
+                delay *= 2
+                continue
+            logger.error("HTTP error during chat request: %s", exc)
+            raise OpenRouterError(
+                f"HTTP error during chat request after {max_attempts} attempts"
+            ) from exc
+    return data
+
+
 async def chat(
     messages: List[Dict[str, str]],
     *,
@@ -35,8 +184,17 @@ async def chat(
     temperature: float = 0.1,
     response_format: Optional[Dict[str, Any]] = None,
     extra_body: Optional[Dict[str, Any]] = None,
+    client: Optional[httpx.AsyncClient] = None,
+    use_cache: bool = True,
 ) -> Tuple[str, int | None, float | None]:
-    """Отправить запрос в OpenRouter и вернуть ответ, количество токенов и стоимость."""
+    """Отправить запрос в OpenRouter и вернуть ответ, количество токенов и стоимость.
+
+    Запрос идёт через *client*, общий клиент (:func:`get_client`) или, если
+    пул не открыт, через временный клиент. Ответ на такой же запрос (модель,
+    сообщения, температура, формат ответа) берётся из кэша, если он включён
+    и не отключён для вызова через ``use_cache=False``; стоимость такого
+    ответа — 0.
+    """
 
     api_key = api_key or OPENROUTER_API_KEY
     if not api_key:
@@ -62,62 +220,53 @@ async def chat(
         "X-Title": site_name or OPENROUTER_SITE_NAME or "DocRouter",
     }
 
-    max_attempts = 3
-    delay = 1.0
+    cache = get_llm_cache() if use_cache else None
+    key = None
+    if cache is not None:
+        key = make_key(model, messages, temperature, response_format, extra_body=extra_body)
+        cached = await _cache_call(cache.get, key)
+        if cached is not None:
+            logger.debug("LLM cache hit for model %s", model)
+            reply, tokens, _ = cached
+            return reply, tokens, 0.0
 
-    async with httpx.AsyncClient(timeout=60) as client:
-        for attempt in range(1, max_attempts + 1):
-            try:
-                response = await client.post(api_url, json=payload, headers=headers)
-                response.raise_for_status()
-                try:
-                    data = response.json()
-                except ValueError as exc:
-                    logger.error(
-                        "OpenRouter returned non-JSON response: %s", response.text
-                    )
-                    raise OpenRouterError(
-                        "OpenRouter returned non-JSON response"
-                    ) from exc
-                break
-            except httpx.HTTPStatusError as exc:
-                status = exc.response.status_code
-                if status == 429 or 500 <= status < 600:
-                    if attempt < max_attempts:
-                        logger.warning(
-                            "OpenRouter transient error %s, retry %s/%s", status, attempt, max_attempts
-                        )
-                        await asyncio.sleep(delay)
-                        delay *= 2
-                        continue
-                    logger.error(
-                        "OpenRouter request failed after %s attempts: %s", max_attempts, status
-                    )
-                    raise OpenRouterError(
-                        f"OpenRouter request failed after {max_attempts} attempts: {status}"
-                    ) from exc
-                logger.error("OpenRouter request failed: %s", status)
-                raise OpenRouterError(
-                    f"OpenRouter request failed: {status}"
-                ) from exc
-            except httpx.HTTPError as exc:
-                if attempt < max_attempts:
-                    logger.warning(
-                        "HTTP error during chat request: %s, retry %s/%s", exc, attempt, max_attempts
-                    )
-                    await asyncio.sleep(delay)
-                    delay *= 2
-                    continue
-                logger.error("HTTP error during chat request: %s", exc)
-                raise OpenRouterError(
-                    f"HTTP error during chat request after {max_attempts} attempts"
-                ) from exc
+    client = client or _client
+    if client is not None:
+        data = await _post(client, api_url, payload, headers)
+    else:
+        async with create_client() as client:
+            data = await _post(client, api_url, payload, headers)
 
     reply = data["choices"][0]["message"]["content"].strip()
     usage = data.get("usage", {})
     tokens = usage.get("total_tokens")
     cost = usage.get("total_cost")
+    if key is not None and reply:
+        await _cache_call(cache.put, key, reply, tokens, cost)
     return reply, tokens, cost
 
 
-__all__ = ["chat", "OpenRouterError"]
+async def _cache_call(func: Callable[..., Any], *args: Any) -> Any:
+    """Выполнить операцию с кэшем в потоке; ошибки кэша не прерывают запрос."""
+    try:
+        return await asyncio.to_thread(func, *args)
+    except Exception:  # pragma: no cover - кэш не должен ломать запросы
+        logger.warning("LLM cache operation failed", exc_info=True)
+        return None
+
+
+def llm_cache_stats() -> Dict[str, int]:
+    """Статистика кэша ответов: записи, объём, попадания и промахи."""
+    cache = get_llm_cache()
+    return cache.stats() if cache is not None else {}
+
+
+__all__ = [
+    "chat",
+    "client_session",
+    "create_client",
+    "get_client",
+    "llm_cache_stats",
+    "set_client",
+    "OpenRouterError",
+]
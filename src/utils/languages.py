@@ -0,0 +1,19 @@
+"""Коды языков интерфейса и соответствующие им коды Tesseract."""
+
+from __future__ import annotations
+
+from typing import Optional
+
+# Сопоставление пользовательских кодов языков с кодами tesseract
+LANG_MAP = {"en": "eng", "ru": "rus", "de": "deu"}
+REV_LANG_MAP = {v: k for k, v in LANG_MAP.items()}
+
+
+def tesseract_language(language: Optional[str], default: str = "eng") -> str:
+    """Код Tesseract для кода интерфейса (``"ru"`` → ``"rus"``).
+
+    Коды Tesseract возвращаются как есть, пустое значение — *default*.
+    """
+    if not language:
+        return default
+    return LANG_MAP.get(language, language)
@@ -0,0 +1,163 @@
+"""Хранилище строк на SQLite с вытеснением по давности использования.
+
+Общая основа постоянных кэшей: кэша извлечённого текста и кэша ответов LLM.
+Записи вытесняются по принципу LRU, когда их суммарный объём превышает
+предел, и при необходимости устаревают через заданное время. Счётчики
+попаданий, промахов и вытеснений хранятся в той же базе, поэтому статистика
+учитывает обращения из всех процессов и переживает перезапуск.
+"""
+
+from __future__ import annotations
+
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+
+class SQLiteLRU:
+    """Словарь строк на SQLite с пределом объёма и сроком жизни записей.
+
+    *max_bytes* — предел суммарного объёма записей, *ttl* — срок жизни записи
+    в секундах (``None`` или 0 — бессрочно).
+    """
+
+    def __init__(self, path: Union[str, Path], max_bytes: int, ttl: Optional[float] = None) -> None:
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.ttl = ttl or None
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+
+    def _get_conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            with conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS entries (
+                        key TEXT PRIMARY KEY,
+                        value TEXT NOT NULL,
+                        size INTEGER NOT NULL,
+                        created REAL NOT NULL,
+                        accessed REAL NOT NULL
+                    )
+                    """
+                )
+                conn.execute(
+                    "CREATE INDEX IF NOT EXISTS idx_entries_accessed ON entries(accessed)"
+                )
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+                )
+            self._conn = conn
+        return self._conn
+
+    def _bump(self, conn: sqlite3.Connection, name: str, value: int = 1) -> None:
+        conn.execute(
+            "INSERT INTO stats (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            (name, value),
+        )
+
+    def get(self, key: str) -> Optional[str]:
+        """Вернуть значение по ключу или ``None`` при промахе и устаревшей записи."""
+        now = time.time()
+        with self._lock:
+            conn = self._get_conn()
+            with conn:
+                row = conn.execute(
+                    "SELECT value, created FROM entries WHERE key=?", (key,)
+                ).fetchone()
+                if row is not None and self.ttl is not None and now - row[1] > self.ttl:
+                    conn.execute("DELETE FROM entries WHERE key=?", (key,))
+                    self._bump(conn, "expired")
+                    row = None
+                if row is None:
+                    self._bump(conn, "misses")
+                    return None
+                conn.execute("UPDATE entries SET accessed=? WHERE key=?", (now, key))
+                self._bump(conn, "hits")
+        return row[0]
+
+    def put(self, key: str, value: str, size: Optional[int] = None) -> None:
+        """Сохранить *value* и при необходимости вытеснить старые записи.
+
+        *size* — объём, учитываемый в пределе; по умолчанию длина *value* в
+        байтах UTF-8. Запись больше предела не сохраняется.
+        """
+        if size is None:
+            size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            conn = self._get_conn()
+            with conn:
+                conn.execute(
+                    "REPLACE INTO entries (key, value, size, created, accessed) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (key, value, size, now, now),
+                )
+                self._evict(conn, now)
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        removed = 0
+        if self.ttl is not None:
+            removed = conn.execute(
+                "DELETE FROM entries WHERE created < ?", (now - self.ttl,)
+            ).rowcount
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        excess = total - self.max_bytes
+        if excess > 0:
+            victims: list[str] = []
+            for key, size in conn.execute("SELECT key, size FROM entries ORDER BY accessed"):
+                victims.append(key)
+                excess -= size
+                if excess <= 0:
+                    break
+            conn.executemany("DELETE FROM entries WHERE key=?", [(k,) for k in victims])
+            removed += len(victims)
+        if removed:
+            self._bump(conn, "evictions", removed)
+            logger.debug("Evicted %d entries from %s", removed, self.path)
+
+    def stats(self) -> Dict[str, int]:
+        """Вернуть число записей, их объём и счётчики попаданий/промахов."""
+        with self._lock:
+            conn = self._get_conn()
+            entries, size = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+            ).fetchone()
+            counters = dict(conn.execute("SELECT name, value FROM stats").fetchall())
+        return {
+            "entries": entries,
+            "bytes": size,
+            "hits": counters.get("hits", 0),
+            "misses": counters.get("misses", 0),
+            "expired": counters.get("expired", 0),
+            "evictions": counters.get("evictions", 0),
+        }
+
+    def clear(self) -> None:
+        """Удалить все записи и обнулить статистику."""
+        with self._lock:
+            conn = self._get_conn()
+            with conn:
+                conn.execute("DELETE FROM entries")
+                conn.execute("DELETE FROM stats")
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+__all__ = ["SQLiteLRU"]
@@ -0,0 +1,220 @@
+"""Подготовка текста документа для промптов LLM в пределах бюджета токенов.
+
+Текст сначала очищается от типичного шума OCR (:func:`normalize_text`), а
+если он всё равно не помещается в бюджет, из него собираются окна
+(:func:`fit_text`): начало документа, его конец и фрагменты с наибольшей
+плотностью ключевых слов, дат и сумм. Для задач, где нужен весь текст
+(перевод), :func:`split_text` делит его на части по бюджету.
+"""
+
+from __future__ import annotations
+
+import re
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set
+
+from utils.tokens import estimate_tokens
+
+# Перенос слова в конце строки: «доку-\nмент» → «документ»
+_HYPHEN_RE = re.compile(r"(?<=\w)-\n(?=[a-zа-яё])")
+_SPACES_RE = re.compile(r"[ \t\u00a0\u200b]+")
+_BLANK_LINES_RE = re.compile(r"\n{3,}")
+_DIGITS_RE = re.compile(r"\d+")
+_WORD_RE = re.compile(r"\w+")
+# Даты, суммы, номера документов — то, за чем обычно приходят к документу
+_SIGNAL_RE = re.compile(
+    r"\b\d{1,2}[./-]\d{1,2}[./-]\d{2,4}\b"
+    r"|\b\d{4}-\d{2}-\d{2}\b"
+    r"|\d[\d \u00a0]*[.,]\d{2}\b"
+    r"|№\s*\S+"
+    r"|\b\d{5,}\b"
+)
+
+# Колонтитулы: короткие строки, повторяющиеся не меньше этого числа раз
+_REPEAT_MIN = 3
+_REPEAT_MAX_LENGTH = 80
+_STEM_LENGTH = 5
+_WINDOW_TOKENS = 200
+_HEAD_SHARE = 0.4
+_TAIL_SHARE = 0.2
+GAP_MARKER = "[…]"
+
+
+def _numbers(line: str) -> List[int]:
+    return [int(number) for number in _DIGITS_RE.findall(line)]
+
+
+def _is_page_counter(lines: List[str]) -> bool:
+    """Отличаются ли строки только счётчиком, растущим на единицу.
+
+    Так выглядят номера страниц («Страница 2 из 10»); у строк таблиц и
+    выписок обычно меняется несколько чисел сразу.
+    """
+    for previous, current in zip(lines, lines[1:]):
+        before, after = _numbers(previous), _numbers(current)
+        if len(before) != len(after):
+            return False
+        changed = [b - a for a, b in zip(before, after) if a != b]
+        if changed != [1]:
+            return False
+    return True
+
+
+def normalize_text(text: str) -> str:
+    """Очистить извлечённый текст от шума OCR.
+
+    Склеиваются слова, разорванные переносом, схлопываются пробелы и пустые
+    строки, а из колонтитулов остаётся только первый: короткие строки,
+    повторяющиеся дословно, и разнесённые по тексту строки, которые
+    отличаются только номером страницы («Страница 3 из 10»). Строки таблиц,
+    отличающиеся датами и суммами, сохраняются.
+    """
+    text = text.replace("\r\n", "\n").replace("\r", "\n").replace("\f", "\n")
+    text = _HYPHEN_RE.sub("", text)
+    lines = [_SPACES_RE.sub(" ", line).strip() for line in text.split("\n")]
+
+    positions: Dict[str, List[int]] = defaultdict(list)
+    for index, line in enumerate(lines):
+        if line and len(line) <= _REPEAT_MAX_LENGTH:
+            positions[_DIGITS_RE.sub("#", line.lower())].append(index)
+    dropped: Set[int] = set()
+    for indexes in positions.values():
+        if len(indexes) < _REPEAT_MIN:
+            continue
+        group = [lines[index] for index in indexes]
+        exact = len(set(group)) == 1
+        # Колонтитулы стоят по одному на страницу, а не строками подряд
+        spread = all(b - a > 1 for a, b in zip(indexes, indexes[1:]))
+        if exact or (spread and _is_page_counter(group)):
+            dropped.update(indexes[1:])
+    if dropped:
+        lines = [line for index, line in enumerate(lines) if index not in dropped]
+    return _BLANK_LINES_RE.sub("\n\n", "\n".join(lines)).strip()
+
+
+def _hard_split(line: str, max_tokens: int) -> List[str]:
+    """Разрезать строку длиннее *max_tokens* по словам, а слово — по символам."""
+    parts: List[str] = []
+    current = ""
+    for word in line.split(" "):
+        candidate = f"{current} {word}" if current else word
+        if estimate_tokens(candidate) <= max_tokens:
+            current = candidate
+            continue
+        if current:
+            parts.append(current)
+        # Одно слово длиннее бюджета (например, без пробелов)
+        while estimate_tokens(word) > max_tokens:
+            size = max(1, len(word) * max_tokens // estimate_tokens(word))
+            parts.append(word[:size])
+            word = word[size:]
+        current = word
+    if current:
+        parts.append(current)
+    return parts
+
+
+def split_text(text: str, max_tokens: int) -> List[str]:
+    """Разделить *text* на части не больше *max_tokens*, не теряя текста.
+
+    Части собираются из целых строк; строка длиннее бюджета режется по
+    словам. Склеенные через ``"\\n"`` части дают исходный текст (с точностью
+    до разрезанных длинных строк).
+    """
+    max_tokens = max(1, max_tokens)
+    chunks: List[str] = []
+    current: List[str] = []
+    used = 0
+    for line in text.split("\n"):
+        pieces = [line] if estimate_tokens(line) <= max_tokens else _hard_split(line, max_tokens)
+        for piece in pieces:
+            cost = estimate_tokens(piece) + 1
+            if current and used + cost > max_tokens:
+                chunks.append("\n".join(current))
+                current, used = [], 0
+            current.append(piece)
+            used += cost
+    if current:
+        chunks.append("\n".join(current))
+    return [chunk for chunk in chunks if chunk.strip()]
+
+
+def _stems(words: Iterable[str]) -> Set[str]:
+    return {
+        word[:_STEM_LENGTH]
+        for word in (w.lower() for w in words)
+        if len(word) >= 3 and not word.isdigit()
+    }
+
+
+def _density(window: str, cost: int, stems: Set[str]) -> float:
+    hits = len(_SIGNAL_RE.findall(window))
+    if stems:
+        hits += 2 * sum(1 for w in _WORD_RE.findall(window.lower()) if w[:_STEM_LENGTH] in stems)
+    return hits / cost
+
+
+def fit_text(
+    text: str,
+    max_tokens: int,
+    *,
+    keywords: Optional[Iterable[str]] = None,
+    normalize: bool = True,
+) -> str:
+    """Уложить *text* в *max_tokens* токенов.
+
+    Текст нормализуется (:func:`normalize_text`); если он всё равно длиннее
+    бюджета, он режется на окна примерно по 200 токенов, и из них
+    выбираются начало документа (40 % бюджета), конец (20 %) и окна с
+    наибольшей плотностью *keywords* (например, слов вопроса в чате), дат,
+    сумм и номеров. Окна выдаются в исходном порядке, пропуски помечаются
+    :data:`GAP_MARKER`.
+    """
+    if normalize:
+        text = normalize_text(text)
+    if estimate_tokens(text) <= max_tokens:
+        return text
+
+    windows = split_text(text, min(_WINDOW_TOKENS, max(1, max_tokens // 4)))
+    costs = [estimate_tokens(w) + estimate_tokens(GAP_MARKER) + 2 for w in windows]
+    chosen: Set[int] = set()
+    used = 0
+
+    def take(index: int, limit: float) -> bool:
+        nonlocal used
+        if index in chosen or used + costs[index] > limit:
+            return False
+        chosen.add(index)
+        used += costs[index]
+        return True
+
+    head_limit = max_tokens * _HEAD_SHARE
+    for index in range(len(windows)):
+        if not take(index, head_limit):
+            break
+    tail_limit = used + max_tokens * _TAIL_SHARE
+    for index in reversed(range(len(windows))):
+        if not take(index, tail_limit):
+            break
+
+    stems = _stems(_WORD_RE.findall(" ".join(keywords or ())))
+    middle = sorted(
+        (i for i in range(len(windows)) if i not in chosen),
+        key=lambda i: (-_density(windows[i], costs[i], stems), i),
+    )
+    for index in middle:
+        take(index, max_tokens)
+
+    parts: List[str] = []
+    previous = -1
+    for index in sorted(chosen):
+        if index != previous + 1:
+            parts.append(GAP_MARKER)
+        parts.append(windows[index])
+        previous = index
+    if previous != len(windows) - 1:
+        parts.append(GAP_MARKER)
+    return "\n".join(parts)
+
+
+__all__ = ["GAP_MARKER", "fit_text", "normalize_text", "split_text"]
@@ -0,0 +1,17 @@
+"""Грубая оценка числа токенов текста для бюджетов промптов."""
+
+from __future__ import annotations
+
+# Токенизаторы OpenAI-подобных моделей дают около 4 байт UTF-8 на токен:
+# примерно 4 латинских символа или 2 кириллических
+_BYTES_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Оценить число токенов *text* без загрузки токенизатора модели."""
+    if not text:
+        return 0
+    return len(text.encode("utf-8")) // _BYTES_PER_TOKEN + 1
+
+
+__all__ = ["estimate_tokens"]
@@ -1,12 +1,17 @@
 from __future__ import annotations
 
 import logging
+from typing import Optional
+
 from fastapi import APIRouter, HTTPException, Body, Query
 
-from .. import db as database
-from ..db import run_db
+from config import config
 from services import openrouter
 from services.openrouter import OpenRouterError
+from utils.text_budget import fit_text
+from .. import db as database
+from ..db import run_db
+from .files import ensure_full_text
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -16,18 +21,24 @@ logger = logging.getLogger(__name__)
 async def chat(
     file_id: str,
     message: str = Body(..., embed=True),
-    max_context: int = Query(3000, gt=0),
+    max_context: Optional[int] = Query(None, gt=0),
 ):
-    """Простой чат с учётом текста файла."""
+    """Простой чат с учётом текста файла.
+
+    Текст укладывается в ``config.llm_chat_text_tokens`` токенов: кроме
+    начала и конца документа берутся фрагменты, похожие на вопрос
+    (см. :func:`utils.text_budget.fit_text`). *max_context* дополнительно
+    ограничивает контекст числом символов.
+    """
     record = await run_db(database.get_file, file_id)
     if not record:
         raise HTTPException(status_code=404, detail="File not found")
 
-    text = record.metadata.extracted_text or ""
-    original_len = len(text)
-    if original_len > max_context:
+    text = await ensure_full_text(file_id, record)
+    text = fit_text(text, config.llm_chat_text_tokens, keywords=[message])
+    if max_context is not None and len(text) > max_context:
         logger.info(
-            "Truncating extracted text from %s to %s characters", original_len, max_context
+            "Truncating extracted text from %s to %s characters", len(text), max_context
         )
         text = text[:max_context]
 
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import asyncio
 import json
 import logging
 import mimetypes
@@ -17,13 +18,14 @@ except Exception:  # pragma: no cover - optional dependency
 from fastapi import APIRouter, HTTPException, Body
 from fastapi.responses import FileResponse, PlainTextResponse
 
-from file_sorter import place_file
+from file_sorter import add_archive_text_layer, place_file
 from models import Metadata, FileRecord
 from .. import db as database, server
 from ..db import run_db
-from .upload import UPLOAD_DIR
+from .upload import UPLOAD_DIR, LANG_MAP
 from .folders import _resolve_in_output
 from services.openrouter import OpenRouterError
+from services.extraction import ExtractionTimeout, run_extraction
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -32,6 +34,54 @@ SCAN_CACHE_TTL = 5.0  # seconds
 _last_scan_time = 0.0
 _last_upload_mtime = 0.0
 
+# Фоновые задачи дочитывания текста, по одной на файл
+_full_text_tasks: dict[str, asyncio.Task] = {}
+
+
+async def _load_full_text(file_id: str, path: Path, language: str | None) -> str:
+    """Извлечь документ целиком и сохранить текст в БД."""
+    lang_display = language or server.config.tesseract_lang
+    lang_ocr = LANG_MAP.get(lang_display, lang_display)
+    text = await run_extraction(server.extract_text, path, language=lang_ocr)
+    record = await run_db(database.get_file, file_id)
+    if record is not None:
+        metadata = record.metadata
+        metadata.extracted_text = text
+        metadata.text_complete = True
+        await run_db(database.update_file, file_id, metadata=metadata)
+    logger.info("Loaded full text for %s (%d characters)", file_id, len(text))
+    return text
+
+
+async def ensure_full_text(file_id: str, record: FileRecord) -> str:
+    """Вернуть полный текст документа.
+
+    Если при загрузке извлечение было ограничено бюджетом, документ
+    дочитывается в пуле извлечения при первом обращении. Параллельные
+    запросы к одному файлу ждут одну и ту же задачу. При ошибке
+    возвращается уже имеющийся частичный текст.
+    """
+    metadata = record.metadata
+    if metadata.text_complete:
+        return metadata.extracted_text or ""
+    path = Path(record.path)
+    if not path.exists():
+        return metadata.extracted_text or ""
+
+    task = _full_text_tasks.get(file_id)
+    if task is None:
+        task = asyncio.create_task(_load_full_text(file_id, path, metadata.language))
+        _full_text_tasks[file_id] = task
+        task.add_done_callback(lambda _task: _full_text_tasks.pop(file_id, None))
+    try:
+        text = await asyncio.shield(task)
+    except Exception:
+        logger.exception("Failed to load full text for %s", file_id)
+        return metadata.extracted_text or ""
+    metadata.extracted_text = text
+    metadata.text_complete = True
+    return text
+
 
 def _latest_upload_mtime() -> float:
     """Вернуть максимальное время изменения в каталоге загрузок."""
@@ -153,7 +203,7 @@ async def download_file(file_id: str, lang: str | None = None):
         raise HTTPException(status_code=404, detail="File not found")
 
     if lang:
-        extracted = record.metadata.extracted_text or ""
+        extracted = await ensure_full_text(file_id, record)
         orig_lang = record.metadata.language
         if lang == orig_lang:
             text = extracted
@@ -210,7 +260,7 @@ async def get_file_details(file_id: str, lang: str | None = None):
     if not record:
         raise HTTPException(status_code=404, detail="File not found")
     if lang:
-        extracted = record.metadata.extracted_text or ""
+        extracted = await ensure_full_text(file_id, record)
         orig_lang = record.metadata.language
         if lang == orig_lang:
             text = extracted
@@ -243,7 +293,7 @@ async def get_file_text(file_id: str):
     record = await run_db(database.get_file, file_id)
     if not record:
         raise HTTPException(status_code=404, detail="File not found")
-    return record.metadata.extracted_text or ""
+    return await ensure_full_text(file_id, record)
 
 
 @router.get("/files", response_model=list[FileRecord])
@@ -309,7 +359,8 @@ async def update_file(file_id: str, data: dict = Body(...)):
         old_json = old_path.with_suffix(old_path.suffix + ".json")
         if old_json.exists():
             old_json.unlink()
-        dest_path, _, confirmed = place_file(
+        dest_path, _, confirmed = await asyncio.to_thread(
+            place_file,
             old_path,
             new_metadata_dict,
             server.config.output_dir,
@@ -317,6 +368,7 @@ async def update_file(file_id: str, data: dict = Body(...)):
             needs_new_folder=True,
             confirm_callback=lambda _: True,
         )
+        await asyncio.to_thread(add_archive_text_layer, dest_path, new_metadata_dict)
         new_metadata = Metadata(**new_metadata_dict)
     elif path_param:
         old_json = old_path.with_suffix(old_path.suffix + ".json")
@@ -372,7 +424,8 @@ async def finalize_file(file_id: str, data: dict | None = Body(None)):
         )
         return {"missing": missing}
 
-    dest_path, missing, confirmed = place_file(
+    dest_path, missing, confirmed = await asyncio.to_thread(
+        place_file,
         record.path,
         meta_dict,
         server.config.output_dir,
@@ -380,6 +433,8 @@ async def finalize_file(file_id: str, data: dict | None = Body(None)):
         needs_new_folder=meta_dict.get("needs_new_folder", False),
         confirm_callback=lambda _: True,
     )
+    if not missing:
+        await asyncio.to_thread(add_archive_text_layer, dest_path, meta_dict)
     metadata = Metadata(**meta_dict)
 
     await run_db(
@@ -409,20 +464,46 @@ async def review_file(file_id: str):
 
 
 @router.post("/files/{file_id}/rerun_ocr")
-async def rerun_ocr(file_id: str, language: str = Body(...), psm: int = Body(3)):
+async def rerun_ocr(
+    file_id: str,
+    language: str = Body(...),
+    psm: int = Body(3),
+    pages: str | None = Body(None),
+):
+    """Распознать документ заново с другим языком или режимом сегментации.
+
+    OCR выполняется в пуле извлечения; страницы, уже распознанные с теми же
+    настройками, берутся из кэша. Если задан диапазон *pages* (например,
+    ``"1-3,5"``), возвращается текст только этих страниц, а сохранённый текст
+    документа не меняется — так можно проверить настройки перед полным
+    перезапуском.
+    """
     record = await run_db(database.get_file, file_id)
     if not record or not record.path:
         raise HTTPException(status_code=404, detail="File not found")
     extract = getattr(ocr_pipeline, "extract_text", None)
     if extract is None:
         raise HTTPException(status_code=500, detail="OCR pipeline not available")
+    kwargs: dict = {"language": LANG_MAP.get(language, language), "psm": psm}
+    if pages is not None:
+        kwargs["pages"] = pages
     try:
-        text = extract(record.path, language=language, psm=psm)
+        text = await run_extraction(extract, record.path, **kwargs)
+    except FileNotFoundError as exc:
+        raise HTTPException(status_code=404, detail="File not found") from exc
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    except ExtractionTimeout as exc:
+        logger.exception("OCR rerun timed out for %s", file_id)
+        raise HTTPException(status_code=504, detail=str(exc)) from exc
     except Exception as exc:  # pragma: no cover - depends on OCR setup
         logger.exception("OCR rerun failed for %s", file_id)
         raise HTTPException(status_code=500, detail=str(exc)) from exc
+    if pages is not None:
+        return {"extracted_text": text, "pages": pages}
     metadata = record.metadata
     metadata.extracted_text = text
+    metadata.text_complete = True
     metadata.language = language
     await run_db(database.update_file, file_id, metadata=metadata, status="draft")
     return {"extracted_text": text}
@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import asyncio
+import contextlib
 import logging
 import mimetypes
 import os
@@ -7,12 +9,15 @@ import shutil
 import tempfile
 import uuid
 from pathlib import Path
+from typing import Awaitable
 
 from fastapi import APIRouter, UploadFile, File, HTTPException, Form
 
-from file_sorter import place_file, get_folder_tree, sanitize_filename
+from file_sorter import add_archive_text_layer, place_file, get_folder_tree, sanitize_filename
+from utils.languages import LANG_MAP, REV_LANG_MAP
 from models import Metadata, UploadResponse
 from services.openrouter import OpenRouterError
+from services.extraction import ExtractionTimeout, run_extraction
 from .. import db as database
 from ..db import run_db
 from config import config
@@ -30,10 +35,6 @@ except PermissionError:
     UPLOAD_DIR = Path(tempfile.gettempdir()) / "uploads"
     UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 
-# Сопоставление пользовательских кодов языков с кодами tesseract
-LANG_MAP = {"en": "eng", "ru": "rus", "de": "deu"}
-REV_LANG_MAP = {v: k for k, v in LANG_MAP.items()}
-
 
 def _check_tesseract() -> bool:
     """Проверить доступность бинарника tesseract."""
@@ -57,19 +58,136 @@ def _check_tesseract() -> bool:
 OCR_AVAILABLE = _check_tesseract()
 
 
-async def process_uploaded(
-    path: Path, language: str | None, dry_run: bool
-) -> tuple[Metadata, Path, list[str], dict]:
-    """Обработать загруженный файл и вернуть метаданные."""
+async def extract_uploaded_text(
+    path: Path, language: str, content: bytes | None = None
+) -> tuple[str, bool]:
+    """Извлечь текст в пуле процессов с учётом бюджета из настроек.
+
+    Если передано содержимое *content*, файл не читается с диска, а *path*
+    служит только подсказкой для определения типа. Возвращает текст и признак
+    того, что документ прочитан целиком.
+    """
+    from .. import server
+    from file_utils import ExtractionBudget
+
+    source: Path | bytes = path
+    kwargs: dict = {"language": language}
+    if content is not None:
+        source = content
+        kwargs["filename"] = path.name
+    budget = ExtractionBudget.from_config()
+    if budget is None:
+        text = await run_extraction(server.extract_text, source, **kwargs)
+        return text, True
+    result = await run_extraction(server.extract_document, source, budget=budget, **kwargs)
+    return result.text, result.complete
+
+
+async def extract_images_text(paths: list[Path], language: str) -> tuple[str, bool]:
+    """Распознать исходные изображения параллельно, по задаче на изображение.
+
+    Используется для ``/upload/images``: снимки распознаются в полном
+    разрешении, а не после сборки в PDF и повторной отрисовки страниц.
+    Бюджет из настроек ограничивает число изображений (``max_pages``) и
+    длину итогового текста. Возвращает текст в порядке изображений и признак
+    того, что распознаны все.
+    """
+    from .. import server
+    from file_utils import ExtractionBudget
+
+    budget = ExtractionBudget.from_config()
+    selected = paths
+    if budget is not None and budget.max_pages is not None:
+        selected = paths[: budget.max_pages]
+    complete = len(selected) == len(paths)
+    if budget is None:
+        texts = await asyncio.gather(
+            *(run_extraction(server.extract_text, path, language=language) for path in selected)
+        )
+    else:
+        results = await asyncio.gather(
+            *(
+                run_extraction(server.extract_document, path, budget=budget, language=language)
+                for path in selected
+            )
+        )
+        texts = [result.text for result in results]
+        complete = complete and all(result.complete for result in results)
+    text = "\n".join(t for t in texts if t.strip())
+    if budget is not None and budget.max_chars is not None and len(text) > budget.max_chars:
+        text = text[: budget.max_chars]
+        complete = False
+    return text, complete
+
+
+def _ocr_language(language: str | None) -> tuple[str, str]:
+    """Язык для отображения и соответствующий код Tesseract."""
     from .. import server
-    from file_utils import UnsupportedFileType
 
     lang_display = language or REV_LANG_MAP.get(
         server.config.tesseract_lang, server.config.tesseract_lang
     )
-    lang_ocr = LANG_MAP.get(lang_display, lang_display)
+    return lang_display, LANG_MAP.get(lang_display, lang_display)
+
+
+async def _read_upload(file: UploadFile, dest_path: Path) -> bytes | None:
+    """Прочитать загрузку блоками по 1 МБ.
+
+    Небольшие файлы (не больше ``config.upload_in_memory_max_bytes``)
+    остаются в памяти и возвращаются вызывающему коду, который сам сохраняет
+    их на диск. Остальные записываются в *dest_path*, и функция возвращает
+    ``None``.
+    """
+    limit = config.upload_in_memory_max_bytes
+    buffer = bytearray()
+    dest = None
     try:
-        text = server.extract_text(path, language=lang_ocr)
+        while True:
+            chunk = await file.read(1024 * 1024)
+            if not chunk:
+                break
+            if dest is None and len(buffer) + len(chunk) <= limit:
+                buffer.extend(chunk)
+                continue
+            if dest is None:
+                dest = open(dest_path, "wb")
+                dest.write(buffer)
+                buffer = bytearray()
+            dest.write(chunk)
+    finally:
+        if dest is not None:
+            dest.close()
+    if dest is not None:
+        return None
+    if limit <= 0:
+        # Режим в памяти выключен: пустой файл всё равно создаём на диске
+        dest_path.write_bytes(b"")
+        return None
+    return bytes(buffer)
+
+
+async def process_uploaded(
+    path: Path,
+    language: str | None,
+    dry_run: bool,
+    content: bytes | None = None,
+    text_task: Awaitable[tuple[str, bool]] | None = None,
+) -> tuple[Metadata, Path, list[str], dict]:
+    """Обработать загруженный файл и вернуть метаданные.
+
+    *content* — содержимое файла, если оно уже есть в памяти. *text_task* —
+    уже запущенное извлечение текста (текст и признак полноты); тогда сам
+    файл не разбирается.
+    """
+    from .. import server
+    from file_utils import UnsupportedFileType
+
+    lang_display, lang_ocr = _ocr_language(language)
+    try:
+        if text_task is not None:
+            text, text_complete = await text_task
+        else:
+            text, text_complete = await extract_uploaded_text(path, lang_ocr, content)
         folder_tree, folder_index = get_folder_tree(server.config.output_dir)
         meta_result = await server.metadata_generation.generate_metadata(
             text, folder_tree=folder_tree, folder_index=folder_index
@@ -77,10 +195,12 @@ async def process_uploaded(
         raw_meta = meta_result["metadata"]
         metadata = Metadata(**raw_meta) if isinstance(raw_meta, dict) else raw_meta
         metadata.extracted_text = text
+        metadata.text_complete = text_complete
         metadata.language = lang_display
         meta_dict = metadata.model_dump()
         meta_dict["summary"] = metadata.summary
-        dest_path, missing, _ = place_file(
+        dest_path, missing, _ = await asyncio.to_thread(
+            place_file,
             str(path),
             meta_dict,
             server.config.output_dir,
@@ -88,6 +208,8 @@ async def process_uploaded(
             needs_new_folder=metadata.needs_new_folder,
             confirm_callback=lambda _paths: False,
         )
+        if not dry_run and not missing:
+            await asyncio.to_thread(add_archive_text_layer, dest_path, meta_dict)
         metadata = Metadata(**meta_dict)
     except OpenRouterError as exc:
         logger.exception("Metadata generation failed for %s", path.name)
@@ -95,6 +217,9 @@ async def process_uploaded(
     except UnsupportedFileType as exc:
         logger.exception("Upload/processing failed for %s", path.name)
         raise HTTPException(status_code=400, detail=str(exc)) from exc
+    except ExtractionTimeout as exc:
+        logger.exception("Text extraction timed out for %s", path.name)
+        raise HTTPException(status_code=504, detail=str(exc)) from exc
     except RuntimeError as exc:
         logger.exception("Upload/processing failed for %s", path.name)
         raise HTTPException(status_code=503, detail=str(exc)) from exc
@@ -124,16 +249,21 @@ async def upload_file(
         guessed_ext = mimetypes.guess_extension(file.content_type or "") or ""
         filename = sanitize_filename(f"upload{guessed_ext}")
     temp_path = UPLOAD_DIR / f"{file_id}_{filename}"
-    with open(temp_path, "wb") as dest:
-        while True:
-            chunk = await file.read(1024 * 1024)
-            if not chunk:
-                break
-            dest.write(chunk)
+    content = await _read_upload(file, temp_path)
 
-    metadata, dest_path, missing, meta_result = await process_uploaded(
-        temp_path, language, True
-    )
+    if content is None:
+        metadata, dest_path, missing, meta_result = await process_uploaded(
+            temp_path, language, True
+        )
+    else:
+        # Небольшой файл обрабатывается из памяти, а на диск пишется параллельно
+        persist = asyncio.create_task(asyncio.to_thread(temp_path.write_bytes, content))
+        try:
+            metadata, dest_path, missing, meta_result = await process_uploaded(
+                temp_path, language, True, content
+            )
+        finally:
+            await persist
     sources = [file.filename]
 
     await run_db(
@@ -170,6 +300,29 @@ async def upload_file(
     ).model_dump()
 
 
+def _normalize_images(paths: list[Path], output_dir: Path) -> list[Path]:
+    """Нормализовать изображения перед сборкой PDF.
+
+    Результаты пишутся в *output_dir*: исходные снимки в это время
+    распознаются и должны остаться нетронутыми. Экономию по каждому файлу
+    пишет в лог :func:`normalize_image_file`, общую — эта функция.
+    """
+    from dataclasses import replace
+
+    from file_utils.normalize import NormalizeSettings, normalize_image_file
+
+    settings = replace(NormalizeSettings.from_config(), keep_original=False)
+    result_paths: list[Path] = []
+    before = after = 0
+    for path in paths:
+        result = normalize_image_file(path, settings, output_dir=output_dir)
+        before += result.original_bytes
+        after += result.bytes
+        result_paths.append(result.path)
+    logger.info("Images for PDF: %d -> %d bytes", before, after)
+    return result_paths
+
+
 @router.post("/upload/images", response_model=UploadResponse)
 async def upload_images(
     files: list[UploadFile] = File(...),
@@ -199,20 +352,43 @@ async def upload_images(
                 dest.write(chunk)
         image_paths.append(temp_img)
 
+    # Исходные снимки распознаются в полном разрешении, пока собирается PDF
+    _, lang_ocr = _ocr_language(language)
+    ocr_task = asyncio.ensure_future(extract_images_text(image_paths, lang_ocr))
     try:
-        tmp_pdf = server.merge_images_to_pdf(image_paths)
-        pdf_path = UPLOAD_DIR / f"{file_id}.pdf"
-        shutil.move(tmp_pdf, pdf_path)
-    except Exception as exc:  # pragma: no cover
-        shutil.rmtree(temp_dir, ignore_errors=True)
-        logger.exception("Failed to merge images: %s", [f.filename for f in files])
-        raise HTTPException(status_code=500, detail=str(exc)) from exc
+        try:
+            pdf_sources = image_paths
+            if config.image_normalize:
+                pdf_sources = await asyncio.to_thread(
+                    _normalize_images, image_paths, temp_dir / "pdf"
+                )
+            tmp_pdf = await asyncio.to_thread(server.merge_images_to_pdf, pdf_sources)
+            pdf_path = UPLOAD_DIR / f"{file_id}.pdf"
+            shutil.move(tmp_pdf, pdf_path)
+        except Exception as exc:  # pragma: no cover
+            ocr_task.cancel()
+            logger.exception("Failed to merge images: %s", [f.filename for f in files])
+            raise HTTPException(status_code=500, detail=str(exc)) from exc
 
-    shutil.rmtree(temp_dir, ignore_errors=True)
+        metadata, dest_path, missing, meta_result = await process_uploaded(
+            pdf_path, language, True, text_task=ocr_task
+        )
+    finally:
+        if not ocr_task.done():
+            ocr_task.cancel()
+            # Снимки удаляются только после остановки распознавания
+            with contextlib.suppress(asyncio.CancelledError):
+                await ocr_task
+        shutil.rmtree(temp_dir, ignore_errors=True)
 
-    metadata, dest_path, missing, meta_result = await process_uploaded(
-        pdf_path, language, True
-    )
+    if metadata.text_complete:
+        # Текст PDF уже известен: полное извлечение не будет отрисовывать страницы
+        try:
+            await asyncio.to_thread(
+                server.store_document_text, pdf_path, metadata.extracted_text or "", lang_ocr
+            )
+        except Exception:  # кэш не должен ломать загрузку
+            logger.warning("Failed to cache text of %s", pdf_path, exc_info=True)
     sources = [f.filename for f in sorted_files]
 
     await run_db(
@@ -20,6 +20,8 @@ except Exception:  # pragma: no cover
 
 from config import config  # type: ignore  # noqa: F401
 from . import db as database
+from services.extraction import shutdown_extraction_service
+from services import openrouter
 from .routes import upload, files, folders, chat
 
 app = FastAPI()
@@ -45,14 +47,18 @@ def _load_metadata_generation() -> ModuleType:
     return _metadata_generation
 
 
-def extract_text(*args, **kwargs):
-    return _load_file_utils().extract_text(*args, **kwargs)
+# extract_text и extract_document отдаёт __getattr__ ниже: в пул процессов
+# уходит сама функция file_utils, и дочерний процесс не импортирует приложение
 
 
 def merge_images_to_pdf(*args, **kwargs):
     return _load_file_utils().merge_images_to_pdf(*args, **kwargs)
 
 
+def store_document_text(*args, **kwargs):
+    return _load_file_utils().store_document_text(*args, **kwargs)
+
+
 async def translate_text(*args, **kwargs):
     return await _load_file_utils().translate_text(*args, **kwargs)
 
@@ -99,7 +105,13 @@ logger = logging.getLogger(__name__)
 
 def __getattr__(name: str):
     """Лениво импортировать тяжёлые зависимости при обращении."""
-    if name in {"extract_text", "merge_images_to_pdf", "translate_text"}:
+    if name in {
+        "extract_text",
+        "extract_document",
+        "merge_images_to_pdf",
+        "store_document_text",
+        "translate_text",
+    }:
         utils = importlib.import_module("file_utils")
         return getattr(utils, name)
     if name == "metadata_generation":
@@ -111,8 +123,10 @@ def __getattr__(name: str):
 
 @app.on_event("startup")
 async def startup() -> None:
-    """Инициализировать базу данных и отложенно загрузить плагины."""
+    """Инициализировать базу данных, пул соединений с OpenRouter и отложенно загрузить плагины."""
     await database.run_db(database.init_db)
+    if openrouter.get_client() is None:
+        openrouter.set_client(openrouter.create_client())
 
     def _load_plugins() -> None:
         try:
@@ -127,7 +141,11 @@ async def startup() -> None:
 
 
 @app.on_event("shutdown")
-def _shutdown() -> None:
+async def _shutdown() -> None:
+    client = openrouter.set_client(None)
+    if client is not None:
+        await client.aclose()
+    shutdown_extraction_service()
     database.close_db()
 
 # --------- Подключение маршрутов ----------
@@ -1,5 +1,53 @@
+import os
+import shutil
 import sys
+import tempfile
 from pathlib import Path
 
 # Ensure the src directory is on the Python path
 sys.path.insert(0, str(Path(__file__).resolve().parents[1] / 'src'))
+
+import pytest
+
+
+def pytest_configure(config):
+    # UPLOAD_DIR is read when web_app.routes.upload is imported, before any
+    # fixture runs; keep that directory out of the source tree
+    config._upload_dir = tempfile.mkdtemp(prefix="docrouter-uploads-")
+    os.environ["UPLOAD_DIR"] = config._upload_dir
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(getattr(config, "_upload_dir", ""), ignore_errors=True)
+
+
+@pytest.fixture(autouse=True)
+def _isolated_storage(tmp_path_factory, monkeypatch):
+    """Keep the web app database and uploads in per-test temporary directories."""
+    uploads = tmp_path_factory.mktemp("uploads")
+    monkeypatch.setenv("UPLOAD_DIR", str(uploads))
+    db = sys.modules.get("web_app.db")
+    if db is not None:
+        monkeypatch.setattr(db, "_DB_PATH", tmp_path_factory.mktemp("db") / "db.sqlite")
+    for name in ("web_app.routes.upload", "web_app.routes.files"):
+        module = sys.modules.get(name)
+        if module is not None:
+            monkeypatch.setattr(module, "UPLOAD_DIR", uploads)
+
+
+@pytest.fixture(autouse=True)
+def _no_llm_cache(monkeypatch):
+    """Keep tests away from the shared on-disk LLM response cache."""
+    from config import config
+
+    monkeypatch.setattr(config, "llm_cache_enabled", False)
+
+
+@pytest.fixture(autouse=True)
+def _no_extraction_cache(monkeypatch):
+    """Keep tests away from the shared on-disk extraction cache."""
+    from config import config
+
+    monkeypatch.setattr(config, "extraction_cache_enabled", False)
+    # Extraction worker processes read the setting from the environment
+    monkeypatch.setenv("EXTRACTION_CACHE_ENABLED", "false")
@@ -5,6 +5,7 @@ from pathlib import Path
 
 import pytest
 
+from file_utils import ExtractionBudget, ExtractionResult
 from services import directory_processor as dp
 
 
@@ -54,3 +55,99 @@ def test_process_input_directory_uses_semaphore_and_threads(tmp_path, monkeypatc
     main_thread = threading.current_thread().name
     assert max_active <= 5
     assert all(t != main_thread for t in threads)
+
+
+def test_process_input_directory_batches_metadata(tmp_path, monkeypatch):
+    input_dir = tmp_path / "in"
+    dest_dir = tmp_path / "out"
+    input_dir.mkdir()
+    for i in range(5):
+        (input_dir / f"f{i}.txt").write_text("content")
+    (input_dir / "broken.txt").write_text("content")
+
+    monkeypatch.setattr(dp.config, "metadata_batch_size", 3)
+
+    async def fake_extract(func, path, **kwargs):
+        if path.name == "broken.txt":
+            raise RuntimeError("unreadable")
+        if func is dp.extract_text:
+            return path.name
+        return ExtractionResult(path.name, complete=True)
+
+    calls = []
+
+    async def fake_batch(documents, folder_tree=None, folder_index=None):
+        calls.append(sorted(documents.values()))
+        return {
+            doc_id: {"metadata": {"category": text}, "prompt": None, "raw_response": None}
+            for doc_id, text in documents.items()
+        }
+
+    placed = {}
+    errors = []
+
+    def fake_place_file(path, meta_dict, dest_base, dry_run, needs_new_folder, confirm_callback):
+        placed[path.name] = meta_dict["category"]
+        return dest_dir / path.name, [], True
+
+    monkeypatch.setattr(dp, "run_extraction", fake_extract)
+    monkeypatch.setattr(dp.metadata_generation, "generate_metadata_batch", fake_batch)
+    monkeypatch.setattr(dp, "get_folder_tree", lambda dest_root: ({}, {}))
+    monkeypatch.setattr(dp, "place_file", fake_place_file)
+    monkeypatch.setattr(dp, "handle_error", lambda path, exc: errors.append(path.name))
+    monkeypatch.setattr(dp.database, "add_file", lambda *args, **kwargs: None)
+
+    # Без ограничений текст читается через extract_text, с бюджетом — через extract_document
+    monkeypatch.setattr(dp.ExtractionBudget, "from_config", classmethod(lambda cls: None))
+    for budget in (None, ExtractionBudget(max_chars=1000)):
+        calls.clear()
+        placed.clear()
+        errors.clear()
+        asyncio.run(dp.process_input_directory(input_dir, dest_dir, budget=budget))
+
+        assert calls == [[f"f{i}.txt" for i in range(5)]]
+        assert placed == {f"f{i}.txt": f"f{i}.txt" for i in range(5)}
+        assert errors == ["broken.txt"]
+
+
+def test_failed_metadata_batch_falls_back_to_single_requests(tmp_path, monkeypatch):
+    input_dir = tmp_path / "in"
+    input_dir.mkdir()
+    for i in range(3):
+        (input_dir / f"f{i}.txt").write_text("content")
+
+    monkeypatch.setattr(dp.config, "metadata_batch_size", 3)
+
+    async def fake_extract(func, path, **kwargs):
+        if path.name == "f2.txt":
+            raise RuntimeError("unreadable")
+        return path.name
+
+    async def failing_batch(documents, folder_tree=None, folder_index=None):
+        raise RuntimeError("network down")
+
+    async def fake_generate(text, folder_tree=None, folder_index=None):
+        if text == "f1.txt":
+            raise RuntimeError("bad reply")
+        return {"metadata": {"category": text}, "prompt": None, "raw_response": None}
+
+    placed = {}
+    errors = []
+
+    def fake_place_file(path, meta_dict, dest_base, dry_run, needs_new_folder, confirm_callback):
+        placed[path.name] = meta_dict["category"]
+        return tmp_path / "out" / path.name, [], True
+
+    monkeypatch.setattr(dp, "run_extraction", fake_extract)
+    monkeypatch.setattr(dp.metadata_generation, "generate_metadata_batch", failing_batch)
+    monkeypatch.setattr(dp.metadata_generation, "generate_metadata", fake_generate)
+    monkeypatch.setattr(dp, "get_folder_tree", lambda dest_root: ({}, {}))
+    monkeypatch.setattr(dp, "place_file", fake_place_file)
+    monkeypatch.setattr(dp, "handle_error", lambda path, exc: errors.append(path.name))
+    monkeypatch.setattr(dp.database, "add_file", lambda *args, **kwargs: None)
+    monkeypatch.setattr(dp.ExtractionBudget, "from_config", classmethod(lambda cls: None))
+
+    asyncio.run(dp.process_input_directory(input_dir, tmp_path / "out"))
+
+    assert placed == {"f0.txt": "f0.txt"}
+    assert sorted(errors) == ["f1.txt", "f2.txt"]
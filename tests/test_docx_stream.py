@@ -0,0 +1,68 @@
+import io
+
+import pytest
+
+docx = pytest.importorskip("docx")
+
+import file_utils  # noqa: E402
+from file_utils import UnsupportedFileType, extract_text, iter_text_docx  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def no_cache(monkeypatch):
+    monkeypatch.setattr(file_utils, "get_extraction_cache", lambda: None)
+
+
+def _invoice(path):
+    doc = docx.Document()
+    section = doc.sections[0]
+    section.header.paragraphs[0].text = "ACME Corp"
+    section.footer.paragraphs[0].text = "Page footer"
+    doc.add_paragraph("Invoice 42")
+    table = doc.add_table(rows=2, cols=2)
+    table.cell(0, 0).text = "Item"
+    table.cell(0, 1).text = "Price"
+    table.cell(1, 0).text = "Total"
+    table.cell(1, 1).text = "100 EUR"
+    inner = table.cell(1, 0).add_table(rows=1, cols=2)
+    inner.cell(0, 0).text = "net"
+    inner.cell(0, 1).text = "84"
+    paragraph = doc.add_paragraph("Pay ")
+    paragraph.add_run("until\tFriday")
+    doc.add_paragraph("")
+    doc.add_paragraph("Thanks")
+    doc.save(path)
+    return path
+
+
+def test_document_order_with_tables_headers_and_footers(tmp_path):
+    path = _invoice(tmp_path / "invoice.docx")
+    assert list(iter_text_docx(path)) == [
+        "ACME Corp",
+        "Invoice 42",
+        "Item\tPrice",
+        "Total net\t84\t100 EUR",
+        "Pay until\tFriday",
+        "",
+        "Thanks",
+        "Page footer",
+    ]
+
+
+def test_python_docx_backend_kept_for_comparison(tmp_path):
+    path = _invoice(tmp_path / "invoice.docx")
+    legacy = list(file_utils.iter_text_docx_python(path))
+    assert "100 EUR" not in "\n".join(legacy)
+    assert "100 EUR" in extract_text(path)
+
+
+def test_docx_from_memory(tmp_path):
+    path = _invoice(tmp_path / "invoice.docx")
+    assert extract_text(io.BytesIO(path.read_bytes())) == extract_text(path)
+
+
+def test_broken_docx_rejected(tmp_path):
+    path = tmp_path / "broken.docx"
+    path.write_bytes(b"not a zip")
+    with pytest.raises(UnsupportedFileType):
+        extract_text(path)
@@ -0,0 +1,139 @@
+import asyncio
+import io
+import os
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+
+os.environ["DB_URL"] = ":memory:"
+
+import file_utils  # noqa: E402
+from file_utils import UnsupportedFileType, extract_document, extract_text  # noqa: E402
+from file_utils.cache import ExtractionCache  # noqa: E402
+from models import Metadata  # noqa: E402
+from web_app import server  # noqa: E402
+from web_app.routes import upload  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def no_cache(monkeypatch):
+    monkeypatch.setattr(file_utils, "get_extraction_cache", lambda: None)
+
+
+def _pdf_bytes(text):
+    fitz = pytest.importorskip("fitz")
+    doc = fitz.open()
+    doc.new_page().insert_text((50, 50), text)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def test_pdf_bytes_and_memoryview(tmp_path):
+    data = _pdf_bytes("in memory")
+    assert "in memory" in extract_text(data)
+    assert "in memory" in extract_text(memoryview(data))
+
+
+def test_file_object_uses_name_hint():
+    buffer = io.BytesIO(b"a,b\n1,2\n")
+    buffer.name = "table.csv"
+    assert extract_text(buffer) == "a,b\n1,2"
+    assert extract_text(b"plain text\n") == "plain text\n"
+
+
+def test_office_formats_sniffed_from_zip():
+    docx = pytest.importorskip("docx")
+    openpyxl = pytest.importorskip("openpyxl")
+
+    doc = docx.Document()
+    doc.add_paragraph("hello docx")
+    doc_buffer = io.BytesIO()
+    doc.save(doc_buffer)
+    assert extract_text(doc_buffer.getvalue()) == "hello docx"
+
+    wb = openpyxl.Workbook()
+    wb.active.append(["x", 1])
+    xlsx_buffer = io.BytesIO()
+    wb.save(xlsx_buffer)
+    assert extract_text(xlsx_buffer.getvalue()) == "x,1"
+
+
+def test_image_bytes_go_to_ocr(monkeypatch):
+    seen = []
+
+    def fake_extract_text_image(source, language="eng"):
+        with Image.open(source) as img:
+            seen.append(img.size)
+        return "ocr"
+
+    monkeypatch.setattr(file_utils, "extract_text_image", fake_extract_text_image)
+    buffer = io.BytesIO()
+    Image.new("L", (30, 20), color=0).save(buffer, format="PNG")
+    assert extract_text(buffer.getvalue(), language="rus") == "ocr"
+    assert seen == [(30, 20)]
+
+
+def test_unknown_bytes_rejected():
+    with pytest.raises(UnsupportedFileType):
+        extract_text(b"\x00\xff\xfe\x01" * 10)
+
+
+def test_plugin_parser_receives_temp_file(monkeypatch):
+    seen = []
+
+    def parser(path):
+        seen.append(path)
+        return path.read_text()
+
+    monkeypatch.setitem(file_utils._PARSER_REGISTRY, ".log", parser)
+    assert extract_text(b"log line", filename="app.log") == "log line"
+    assert seen and not seen[0].exists()
+
+
+def test_bytes_and_path_share_cache_entry(tmp_path, monkeypatch):
+    cache = ExtractionCache(tmp_path / "cache.sqlite", max_bytes=1 << 20)
+    monkeypatch.setattr(file_utils, "get_extraction_cache", lambda: cache)
+    data = _pdf_bytes("cached")
+    path = tmp_path / "doc.pdf"
+    path.write_bytes(data)
+
+    extract_document(path)
+    extract_document(data)
+    assert cache.stats()["hits"] == 1
+    cache.close()
+
+
+def test_small_upload_extracted_from_memory(tmp_path, monkeypatch):
+    asyncio.run(server.database.run_db(server.database.init_db))
+    server.config.output_dir = str(tmp_path / "out")
+    monkeypatch.setattr(upload, "UPLOAD_DIR", tmp_path)
+    monkeypatch.setattr(upload, "OCR_AVAILABLE", True)
+    monkeypatch.setattr(server.config, "upload_in_memory_max_bytes", 1024)
+    received = []
+
+    def fake_extract_text(source, language="eng", filename=None):
+        received.append((type(source), filename))
+        if isinstance(source, bytes):
+            return source.decode()
+        return Path(source).read_text()
+
+    async def fake_generate_metadata(text, folder_tree=None, folder_index=None):
+        return {"metadata": Metadata(), "prompt": "", "raw_response": ""}
+
+    monkeypatch.setattr(server, "extract_text", fake_extract_text)
+    monkeypatch.setattr(server.metadata_generation, "generate_metadata", fake_generate_metadata)
+
+    with TestClient(server.app) as client:
+        small = client.post("/upload", files={"file": ("note.txt", b"small")})
+        large = client.post("/upload", files={"file": ("big.txt", b"x" * 2048)})
+
+    assert small.status_code == 200 and large.status_code == 200
+    assert small.json()["metadata"]["extracted_text"] == "small"
+    assert received[0][0] is bytes and received[0][1].endswith("_note.txt")
+    assert tmp_path.joinpath(small.json()["path"]).read_bytes() == b"small"
+    # Большой файл читается с диска, как раньше
+    assert received[1][1] is None
+    assert large.json()["metadata"]["extracted_text"] == "x" * 2048
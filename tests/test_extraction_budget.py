@@ -0,0 +1,98 @@
+import asyncio
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+
+os.environ["DB_URL"] = ":memory:"
+
+import file_utils  # noqa: E402
+from file_utils import ExtractionBudget, extract_document  # noqa: E402
+from file_utils.cache import ExtractionCache  # noqa: E402
+from models import Metadata  # noqa: E402
+from web_app import server  # noqa: E402
+from web_app.routes import upload  # noqa: E402
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = ExtractionCache(tmp_path / "cache.sqlite", max_bytes=1 << 20)
+    monkeypatch.setattr(file_utils, "get_extraction_cache", lambda: cache)
+    yield cache
+    cache.close()
+
+
+def _scanned_pdf(tmp_path, pages):
+    fitz = pytest.importorskip("fitz")
+    img_path = tmp_path / "page.png"
+    Image.linear_gradient("L").resize((20, 20)).convert("RGB").save(img_path)
+    doc = fitz.open()
+    for _ in range(pages):
+        page = doc.new_page(width=50, height=50)
+        page.insert_image(page.rect, filename=str(img_path))
+    path = tmp_path / "scan.pdf"
+    doc.save(path)
+    doc.close()
+    return path
+
+
+def test_max_chars_truncates_and_skips_cache(tmp_path, cache):
+    path = tmp_path / "rows.csv"
+    path.write_text("\n".join(f"row{i},value" for i in range(100)), encoding="utf-8")
+
+    result = extract_document(path, budget=ExtractionBudget(max_chars=25))
+    assert not result.complete
+    assert result.text == "row0,value\nrow1,value\nrow"
+    assert cache.stats()["entries"] == 0
+
+    full = extract_document(path)
+    assert full.complete and full.text.count("\n") == 99
+    assert cache.stats()["entries"] == 1
+
+
+def test_max_pages_stops_ocr(tmp_path, cache, monkeypatch):
+    pdf = _scanned_pdf(tmp_path, 6)
+    calls = []
+
+    def fake_ocr(image, language="eng"):
+        calls.append(1)
+        return f"page {len(calls)}"
+
+    monkeypatch.setattr(file_utils, "ocr_image", fake_ocr)
+
+    result = extract_document(pdf, budget=ExtractionBudget(max_pages=2))
+    assert not result.complete
+    assert len(calls) == 2
+
+    result = extract_document(pdf, budget=ExtractionBudget(max_pages=10))
+    assert result.complete
+    assert len(calls) == 8
+
+
+def test_text_endpoint_loads_full_text_lazily(tmp_path, monkeypatch):
+    asyncio.run(server.database.run_db(server.database.init_db))
+    doc_path = tmp_path / "doc.pdf"
+    doc_path.write_bytes(b"%PDF")
+    server.database.add_file(
+        "budget1",
+        "doc.pdf",
+        Metadata(extracted_text="first page", text_complete=False, language="ru"),
+        str(doc_path),
+    )
+    calls = []
+
+    def fake_extract_text(path, language="eng"):
+        calls.append(language)
+        return "first page\nsecond page"
+
+    monkeypatch.setattr(server, "extract_text", fake_extract_text)
+    monkeypatch.setattr(upload, "OCR_AVAILABLE", True)
+
+    with TestClient(server.app) as client:
+        assert client.get("/files/budget1/text").text == "first page\nsecond page"
+        assert client.get("/files/budget1/text").text == "first page\nsecond page"
+        record = server.database.get_file("budget1")
+
+    assert calls == ["rus"]
+    assert record.metadata.text_complete
@@ -0,0 +1,77 @@
+import pytest
+
+import file_utils
+from file_utils.cache import ExtractionCache, make_key
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = ExtractionCache(tmp_path / "cache.sqlite", max_bytes=1024)
+    monkeypatch.setattr(file_utils, "get_extraction_cache", lambda: cache)
+    yield cache
+    cache.close()
+
+
+def _counting_parser(monkeypatch, ext):
+    calls = []
+
+    def parser(path):
+        calls.append(path)
+        return f"parsed {path.read_text()}"
+
+    monkeypatch.setitem(file_utils._PARSER_REGISTRY, ext, parser)
+    return calls
+
+
+def test_same_content_hits_cache(tmp_path, cache, monkeypatch):
+    calls = _counting_parser(monkeypatch, ".csv")
+    first = tmp_path / "a.csv"
+    first.write_text("x,y")
+    duplicate = tmp_path / "copy.csv"
+    duplicate.write_text("x,y")
+
+    assert file_utils.extract_text(first) == "parsed x,y"
+    assert file_utils.extract_text(duplicate) == "parsed x,y"
+
+    assert len(calls) == 1
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 1 and stats["entries"] == 1
+
+
+def test_text_formats_bypass_cache(tmp_path, cache):
+    path = tmp_path / "note.txt"
+    path.write_text("hello", encoding="utf-8")
+    assert file_utils.extract_text(path) == "hello"
+    assert cache.stats()["misses"] == 0
+
+
+def test_key_depends_on_language_and_params():
+    base = make_key("abc", version="1", language="rus")
+    assert base != make_key("abc", version="1", language="eng")
+    assert base != make_key("abc", version="2", language="rus")
+    assert base != make_key("abc", version="1", language="rus", dpi=200)
+
+
+def test_lru_eviction(tmp_path):
+    cache = ExtractionCache(tmp_path / "lru.sqlite", max_bytes=10)
+    cache.put("a", "aaaa")
+    cache.put("b", "bbbb")
+    assert cache.get("a") == "aaaa"  # «a» становится свежее «b»
+    cache.put("c", "cccc")
+    assert cache.get("b") is None
+    assert cache.get("a") == "aaaa"
+    assert cache.get("c") == "cccc"
+    assert cache.stats()["evictions"] == 1
+    cache.close()
+
+
+def test_stored_text_is_reused_for_pdf(tmp_path, cache, monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("PDF should not be parsed")
+
+    monkeypatch.setattr(file_utils, "iter_text_pdf", fail)
+    pdf = tmp_path / "merged.pdf"
+    pdf.write_bytes(b"%PDF-1.4 merged images")
+
+    file_utils.store_document_text(pdf, "page1\npage2", language="rus")
+    assert file_utils.extract_text(pdf, language="rus") == "page1\npage2"
@@ -0,0 +1,48 @@
+import asyncio
+import os
+import time
+
+import pytest
+
+from services.extraction import ExtractionService, ExtractionTimeout
+
+
+def test_runs_job_in_worker_process():
+    service = ExtractionService(workers=1, timeout=60)
+    try:
+        pid = asyncio.run(service.run(os.getpid))
+    finally:
+        service.shutdown()
+    assert pid != os.getpid()
+
+
+def test_timeout_recycles_pool():
+    service = ExtractionService(workers=1, timeout=0.5)
+    try:
+        with pytest.raises(ExtractionTimeout):
+            asyncio.run(service.run(time.sleep, 30))
+        # Новый пул продолжает принимать задания
+        assert asyncio.run(service.run(os.getpid, timeout=60)) != os.getpid()
+    finally:
+        service.shutdown()
+
+
+def test_unpicklable_callable_runs_in_thread():
+    service = ExtractionService(workers=2)
+    result = asyncio.run(service.run(lambda value: value * 2, 21))
+    assert result == 42
+    assert service._executor is None
+
+
+def test_zero_workers_uses_thread():
+    service = ExtractionService(workers=0)
+    assert asyncio.run(service.run(os.getpid)) == os.getpid()
+
+
+def test_server_extractors_do_not_pull_in_the_app():
+    import pickle
+
+    from web_app import server
+
+    for name in ("extract_text", "extract_document"):
+        assert b"web_app" not in pickle.dumps(getattr(server, name))
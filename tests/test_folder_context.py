@@ -0,0 +1,63 @@
+import folder_context
+from folder_context import build_folder_context, folder_structure
+from file_sorter import get_folder_tree
+from utils.tokens import estimate_tokens
+
+
+def _node(name, *children, files=()):
+    return {
+        "name": name,
+        "children": list(children),
+        "files": [{"name": f, "path": f} for f in files],
+    }
+
+
+TREE = [
+    _node(
+        "Иванов Иван",
+        _node("Финансы", _node("Банки"), _node("Налоги"), files=["a.pdf"]),
+        _node("Медицина", _node("Анализы")),
+    ),
+    _node("Петров Пётр", _node("Авто", _node("Страховка"))),
+    _node("Shared", _node("Дом", _node("Коммунальные"))),
+]
+
+
+def test_relevant_folders_first_without_files():
+    context = build_folder_context(
+        "Налоговое уведомление Иванову Ивану", TREE, top_k=2, max_tokens=500
+    )
+    assert context.splitlines() == [
+        "- Иванов Иван",
+        "  - Финансы: Налоги, Банки",
+        "  - Медицина: Анализы",
+        "- Петров Пётр",
+        "- Shared",
+        "(… 2 more folders not shown)",
+    ]
+    assert "a.pdf" not in context
+
+
+def test_token_budget_trims_context():
+    context = build_folder_context("Страховка автомобиля", TREE, top_k=10, max_tokens=20)
+    assert estimate_tokens(context) <= 30
+    assert context.startswith("- Петров Пётр\n  - Авто: Страховка")
+    assert "more folders not shown" in context
+
+
+def test_structure_from_index_and_cache(tmp_path):
+    (tmp_path / "Иванов Иван" / "Финансы" / "Банки").mkdir(parents=True)
+    (tmp_path / "Иванов Иван" / "Финансы" / "Банки" / "doc.pdf").write_text("x")
+    tree, index = get_folder_tree(tmp_path)
+
+    assert folder_structure(tree) == (("Иванов Иван", (("Финансы", ("Банки",)),)),)
+    assert folder_structure(None, index) == (("Иванов Иван", (("Финансы", ()),)),)
+
+    folder_context._prepare.cache_clear()
+    build_folder_context("a", tree)
+    build_folder_context("b", get_folder_tree(tmp_path)[0])
+    assert folder_context._prepare.cache_info().hits == 1
+
+
+def test_empty_archive():
+    assert build_folder_context("text", [], {}) == "(no folders yet)"
@@ -0,0 +1,122 @@
+import io
+import json
+
+import pytest
+from PIL import Image, ImageDraw
+
+from file_sorter import place_file
+from file_utils.normalize import (
+    NormalizeSettings,
+    classify_content,
+    detect_paper,
+    normalize_image_file,
+    target_size,
+)
+
+SETTINGS = NormalizeSettings(target_dpi=50, jpeg_quality=70)
+
+
+def _gray_photo(path, size=(827, 1169)):
+    image = Image.linear_gradient("L").resize(size).convert("RGB")
+    image.save(path, format="JPEG", quality=95)
+    return path
+
+
+def _text_scan(path, size=(827, 1169), fmt="JPEG"):
+    image = Image.new("RGB", size, "white")
+    draw = ImageDraw.Draw(image)
+    for y in range(100, size[1] - 100, 40):
+        draw.rectangle((80, y, size[0] - 80, y + 12), fill="black")
+    image.save(path, format=fmt)
+    return path
+
+
+def test_target_size_uses_paper_or_dpi():
+    assert detect_paper(2480, 3508) == "a4"
+    assert detect_paper(3508, 2480) == "a4"
+    assert detect_paper(2550, 3300) == "letter"
+    assert detect_paper(4000, 3000) is None
+
+    assert target_size((2480, 3508), None, 200) == ((1653, 2338), "a4")
+    assert target_size((3000, 4000), 600, 200) == ((1000, 1333), None)
+    assert target_size((800, 1000), None, 200) == ((800, 1000), None)
+
+
+def test_classify_content():
+    color = Image.new("RGB", (100, 100), "white")
+    color.paste((255, 0, 0), (0, 0, 50, 100))
+    assert classify_content(color)[0] == "color"
+    assert classify_content(Image.linear_gradient("L").convert("RGB"))[0] == "gray"
+    buf = _text_scan(io.BytesIO(), fmt="PNG")
+    buf.seek(0)
+    mode, threshold = classify_content(Image.open(buf))
+    assert mode == "bilevel" and 0 < threshold < 255
+
+
+def test_gray_photo_is_downscaled_once(tmp_path):
+    path = _gray_photo(tmp_path / "photo.jpg")
+
+    result = normalize_image_file(path, SETTINGS)
+    assert result.changed and result.path == path
+    assert (result.mode, result.paper) == ("gray", "a4")
+    assert result.size == (414, 584)
+    assert 0 < result.bytes < result.original_bytes
+    assert result.saved_bytes == result.original_bytes - path.stat().st_size
+    with Image.open(path) as img:
+        assert (img.format, img.mode, img.size) == ("JPEG", "L", (414, 584))
+        assert img.info["dpi"] == pytest.approx((50, 50), abs=0.5)
+
+    again = normalize_image_file(path, SETTINGS)
+    assert not again.changed and again.bytes == result.bytes
+
+
+def test_clean_scan_becomes_bilevel_png(tmp_path):
+    path = _text_scan(tmp_path / "scan.jpg")
+
+    result = normalize_image_file(path, SETTINGS)
+    assert result.changed and result.mode == "bilevel"
+    assert result.path == tmp_path / "scan.png"
+    assert not path.exists()
+    with Image.open(result.path) as img:
+        assert img.mode == "1"
+
+
+def test_keep_original(tmp_path):
+    path = _gray_photo(tmp_path / "photo.jpg")
+    original = path.read_bytes()
+    settings = NormalizeSettings(target_dpi=50, keep_original=True)
+
+    result = normalize_image_file(path, settings, original_dir=tmp_path / "orig")
+    assert result.original_path == tmp_path / "orig" / "photo.original.jpg"
+    assert result.original_path.read_bytes() == original
+
+
+def test_place_file_normalizes_and_reports(tmp_path, monkeypatch):
+    import file_utils.normalize as normalize
+
+    monkeypatch.setattr(normalize.config, "image_target_dpi", 50)
+    monkeypatch.setattr(normalize.config, "image_keep_original", True)
+    src = _gray_photo(tmp_path / "upload.jpg")
+    metadata = {"category": "Счета", "date": "2024-01-02", "suggested_name": "Чек"}
+
+    dest, missing, _ = place_file(
+        src, metadata, tmp_path / "Archive", needs_new_folder=True,
+        confirm_callback=lambda _: True, normalize=True,
+    )
+    assert not missing and dest.exists() and not src.exists()
+    original = dest.with_name(f"{dest.stem}.original.jpg")
+    assert original.exists()
+    report = json.loads(dest.with_suffix(".jpg.json").read_text(encoding="utf-8"))["normalization"]
+    assert report["path"] == str(dest)
+    assert report["original_path"] == str(original)
+    assert report["saved_bytes"] == report["original_bytes"] - dest.stat().st_size
+
+
+def test_place_file_skips_normalization_by_default(tmp_path):
+    src = _gray_photo(tmp_path / "upload.jpg")
+    data = src.read_bytes()
+    dest, _, _ = place_file(
+        src, {"date": "2024-01-02"}, tmp_path / "Archive", needs_new_folder=True,
+        confirm_callback=lambda _: True,
+    )
+    assert dest.read_bytes() == data
@@ -36,6 +36,9 @@ def test_extract_text_image_tesseract_not_found(monkeypatch, tmp_path):
     image.save(image_path)
 
     import pytesseract
+    from file_utils import image_ocr
+
+    monkeypatch.setattr(image_ocr, 'engine_available', lambda: False)
 
     def fake_image_to_string(*_args, **_kwargs):
         raise pytesseract.TesseractNotFoundError()
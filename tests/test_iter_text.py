@@ -0,0 +1,59 @@
+import pytest
+from PIL import Image
+
+import file_utils
+from file_utils import extract_text, iter_text
+
+
+@pytest.fixture(autouse=True)
+def no_cache(monkeypatch):
+    monkeypatch.setattr(file_utils, "get_extraction_cache", lambda: None)
+
+
+def test_csv_yields_rows(tmp_path):
+    path = tmp_path / "data.csv"
+    path.write_text("a,b\n1,2\n3,4\n", encoding="utf-8")
+    chunks = list(iter_text(path))
+    assert chunks == ["a,b", "1,2", "3,4"]
+    assert "\n".join(chunks) == extract_text(path)
+
+
+def test_txt_roundtrip_keeps_trailing_newline(tmp_path):
+    path = tmp_path / "note.txt"
+    path.write_text("first\nsecond\n", encoding="utf-8")
+    assert extract_text(path) == path.read_text(encoding="utf-8")
+
+
+def test_plugin_returning_string_still_supported(tmp_path, monkeypatch):
+    monkeypatch.setitem(file_utils._PARSER_REGISTRY, ".foo", lambda p: "whole text")
+    path = tmp_path / "x.foo"
+    path.write_text("ignored")
+    assert list(iter_text(path)) == ["whole text"]
+    assert extract_text(path) == "whole text"
+
+
+def test_pdf_early_stop_skips_remaining_ocr(tmp_path, monkeypatch):
+    fitz = pytest.importorskip("fitz")
+    img_path = tmp_path / "scan.png"
+    Image.linear_gradient("L").resize((20, 20)).convert("RGB").save(img_path)
+    doc = fitz.open()
+    for _ in range(10):
+        page = doc.new_page(width=50, height=50)
+        page.insert_image(page.rect, filename=str(img_path))
+    pdf = tmp_path / "scan.pdf"
+    doc.save(pdf)
+    doc.close()
+
+    calls = []
+
+    def fake_ocr(image, language="eng"):
+        calls.append(1)
+        return f"page {len(calls)}"
+
+    monkeypatch.setattr(file_utils, "ocr_image", fake_ocr)
+    monkeypatch.setattr(file_utils.config, "ocr_workers", 1)
+
+    chunks = iter_text(pdf)
+    assert next(chunks).startswith("page")
+    chunks.close()
+    assert len(calls) < 10
@@ -0,0 +1,96 @@
+import asyncio
+
+import httpx
+import pytest
+
+from services import llm_cache, openrouter
+from utils import sqlite_lru
+from services.llm_cache import LLMCache, make_key
+
+
+MESSAGES = [{"role": "user", "content": "Классифицируй документ"}]
+
+
+def test_put_get_survives_reopen(tmp_path):
+    cache = LLMCache(tmp_path / "llm.sqlite", max_bytes=1024)
+    key = make_key("m", MESSAGES, 0.1, {"type": "json_object"})
+    assert cache.get(key) is None
+    cache.put(key, '{"category": "Счета"}', 42, 0.01)
+    cache.close()
+
+    reopened = LLMCache(tmp_path / "llm.sqlite", max_bytes=1024)
+    assert reopened.get(key) == ('{"category": "Счета"}', 42, 0.01)
+    stats = reopened.stats()
+    assert (stats["entries"], stats["hits"], stats["misses"]) == (1, 1, 1)
+
+
+def test_key_depends_on_request():
+    base = make_key("m", MESSAGES, 0.1)
+    assert base == make_key("m", [dict(m) for m in MESSAGES], 0.1)
+    assert base != make_key("other", MESSAGES, 0.1)
+    assert base != make_key("m", MESSAGES, 0.7)
+    assert base != make_key("m", MESSAGES, 0.1, {"type": "json_object"})
+
+
+def test_expired_entries_are_dropped(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(sqlite_lru.time, "time", lambda: now[0])
+    cache = LLMCache(tmp_path / "llm.sqlite", max_bytes=1024, ttl=60)
+    cache.put("k", "reply")
+    now[0] += 30
+    assert cache.get("k") == ("reply", None, None)
+    now[0] += 31
+    assert cache.get("k") is None
+    assert cache.stats()["expired"] == 1
+
+
+def test_size_limit_evicts_least_recently_used(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(sqlite_lru.time, "time", lambda: now[0])
+    cache = LLMCache(tmp_path / "llm.sqlite", max_bytes=10)
+    cache.put("a", "aaaa")
+    now[0] += 1
+    cache.put("b", "bbbb")
+    now[0] += 1
+    cache.get("a")
+    now[0] += 1
+    cache.put("c", "cccc")
+    assert cache.get("b") is None
+    assert cache.get("a") and cache.get("c")
+    assert cache.stats()["evictions"] == 1
+
+
+@pytest.fixture
+def shared_cache(tmp_path, monkeypatch):
+    cache = LLMCache(tmp_path / "llm.sqlite", max_bytes=1024 * 1024)
+    monkeypatch.setattr(openrouter, "get_llm_cache", lambda: cache)
+    return cache
+
+
+def _client(calls):
+    def handler(request):
+        calls.append(request)
+        data = {"choices": [{"message": {"content": "ok"}}], "usage": {"total_tokens": 5, "total_cost": 0.2}}
+        return httpx.Response(200, json=data)
+
+    return openrouter.create_client(transport=httpx.MockTransport(handler))
+
+
+def test_chat_reuses_cached_reply(shared_cache):
+    calls = []
+
+    async def run():
+        async with openrouter.client_session(_client(calls)) as client:
+            first = await openrouter.chat(MESSAGES, api_key="key")
+            second = await openrouter.chat(MESSAGES, api_key="key")
+            other = await openrouter.chat(MESSAGES, api_key="key", temperature=0.5)
+            fresh = await openrouter.chat(MESSAGES, api_key="key", use_cache=False)
+        await client.aclose()
+        return first, second, other, fresh
+
+    first, second, other, fresh = asyncio.run(run())
+    assert first == ("ok", 5, 0.2)
+    assert second == ("ok", 5, 0.0)
+    assert other == fresh == ("ok", 5, 0.2)
+    assert len(calls) == 3
+    assert shared_cache.stats()["hits"] == 1
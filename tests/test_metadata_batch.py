@@ -0,0 +1,153 @@
+import asyncio
+import json
+from typing import Any, Dict
+
+import pytest
+
+import metadata_generation
+from config import config
+from metadata_generation import (
+    MetadataAnalyzer,
+    OpenRouterError,
+    generate_metadata_batch,
+    plan_batches,
+)
+from models import Metadata
+
+
+class BatchAnalyzer(MetadataAnalyzer):
+    def __init__(self, batch_replies=None, fail_batch=False):
+        self.batch_replies = batch_replies
+        self.fail_batch = fail_batch
+        self.single_calls: list[str] = []
+        self.batch_calls: list[list[str]] = []
+
+    async def analyze(
+        self,
+        text: str,
+        folder_tree: Dict[str, Any] | None = None,
+        folder_index: Dict[str, Any] | None = None,
+        file_info: Dict[str, Any] | None = None,
+    ) -> Dict[str, Any]:
+        self.single_calls.append(text)
+        return {"prompt": "single", "raw_response": None, "metadata": {"category": f"single {text}"}}
+
+    async def analyze_batch(self, documents, folder_tree=None, folder_index=None):
+        self.batch_calls.append(list(documents))
+        if self.fail_batch:
+            raise OpenRouterError("boom")
+        if self.batch_replies is not None:
+            return self.batch_replies
+        return {
+            doc_id: {"prompt": "batch", "raw_response": None, "metadata": {"category": f"batch {text}"}}
+            for doc_id, text in documents.items()
+        }
+
+
+@pytest.fixture
+def batching(monkeypatch):
+    monkeypatch.setattr(config, "metadata_batch_size", 4)
+    monkeypatch.setattr(config, "metadata_batch_max_tokens", 6000)
+    monkeypatch.setattr(config, "metadata_batch_doc_tokens", 1000)
+
+
+def test_plan_batches_respects_size_and_tokens(batching, monkeypatch):
+    monkeypatch.setattr(config, "metadata_batch_max_tokens", 60)
+    monkeypatch.setattr(config, "metadata_batch_doc_tokens", 50)
+    docs = {
+        "1": "a" * 80,  # 21 токен
+        "2": "b" * 80,
+        "3": "c" * 80,
+        "4": "d" * 400,  # длинный — отдельно
+        "5": "e" * 8,
+        "6": "f" * 8,
+        "7": "g" * 8,
+        "8": "h" * 8,
+    }
+    assert plan_batches(docs) == [["1", "2"], ["4"], ["3", "5", "6", "7"], ["8"]]
+
+
+def test_plan_batches_disabled_with_size_one(monkeypatch):
+    monkeypatch.setattr(config, "metadata_batch_size", 1)
+    assert plan_batches({"1": "a", "2": "b"}) == [["1"], ["2"]]
+
+
+def test_batch_results_are_finalized(batching):
+    analyzer = BatchAnalyzer()
+    docs = {"1": "first", "2": "second", "3": "third"}
+    results = asyncio.run(generate_metadata_batch(docs, analyzer))
+
+    assert analyzer.batch_calls == [["1", "2", "3"]]
+    assert analyzer.single_calls == []
+    assert list(results) == ["1", "2", "3"]
+    meta = results["2"]["metadata"]
+    assert isinstance(meta, Metadata)
+    assert meta.category == "batch second"
+    assert "batch second" in meta.tags
+
+
+def test_missing_and_malformed_entries_fall_back(batching):
+    replies = {
+        "1": {"prompt": "batch", "raw_response": None, "metadata": {"category": "ok"}},
+        "2": {"prompt": "batch", "raw_response": None, "metadata": {"tags": 5}},
+    }
+    analyzer = BatchAnalyzer(batch_replies=replies)
+    docs = {"1": "first", "2": "second", "3": "third"}
+    results = asyncio.run(generate_metadata_batch(docs, analyzer))
+
+    assert results["1"]["metadata"].category == "ok"
+    assert sorted(analyzer.single_calls) == ["second", "third"]
+    assert results["2"]["metadata"].category == "single second"
+    assert results["3"]["metadata"].category == "single third"
+
+
+def test_failed_batch_request_falls_back(batching):
+    analyzer = BatchAnalyzer(fail_batch=True)
+    results = asyncio.run(generate_metadata_batch({"1": "a", "2": "b"}, analyzer))
+
+    assert sorted(analyzer.single_calls) == ["a", "b"]
+    assert results["1"]["metadata"].category == "single a"
+
+
+def test_single_failures_are_returned(batching):
+    class Broken(BatchAnalyzer):
+        async def analyze(self, text, folder_tree=None, folder_index=None, file_info=None):
+            raise OpenRouterError("down")
+
+    results = asyncio.run(generate_metadata_batch({"1": "a", "2": "b"}, Broken(fail_batch=True)))
+    assert all(isinstance(result, OpenRouterError) for result in results.values())
+
+
+def test_openrouter_batch_prompt_and_parsing(batching, monkeypatch):
+    captured: dict[str, str] = {}
+
+    async def fake_chat(messages, **kwargs):
+        captured["prompt"] = messages[0]["content"]
+        reply = {
+            "documents": [
+                {"id": "2", "category": "Банки"},
+                {"id": "1", "category": "Налоги"},
+                "garbage",
+            ]
+        }
+        return "```json\n" + json.dumps(reply, ensure_ascii=False) + "\n```", 0, 0.0
+
+    monkeypatch.setattr("metadata_generation.OPENROUTER_API_KEY", "test")
+    monkeypatch.setattr("metadata_generation.chat", fake_chat)
+
+    tree = [{"name": "Финансы", "children": [{"name": "Банки", "children": []}]}]
+    results = asyncio.run(
+        generate_metadata_batch({"1": "налог", "2": "выписка"}, folder_tree=tree)
+    )
+
+    prompt = captured["prompt"]
+    assert "=== Document 1 ===\nналог\n" in prompt
+    assert "=== Document 2 ===\nвыписка\n" in prompt
+    assert "- Финансы\n  - Банки\n" in prompt
+    assert results["1"]["metadata"].category == "Налоги"
+    assert results["2"]["metadata"].category == "Банки"
+
+
+def test_batch_entries_accept_id_mapping():
+    entries = metadata_generation._batch_entries({"1": {"category": "A"}, "2": "bad"})
+    assert entries == [("1", {"category": "A"})]
@@ -48,14 +48,13 @@ def test_prompt_includes_context(monkeypatch):
         )
     )
     prompt = captured["prompt"]
-    tree_json = json.dumps(tree, ensure_ascii=False)
-    index_json = json.dumps(index, ensure_ascii=False)
+    folders = "- Финансы\n  - Банки\n"
     instruction_part1 = "Если ни одна папка не подходит, предложи новую category/subcategory."
     instruction_part2 = (
-        "Выбирай person/category строго из Existing folders index, если совпадение найдено; needs_new_folder=true только при полном отсутствии."
+        "Выбирай person/category строго из Existing folders, если совпадение найдено; needs_new_folder=true только при полном отсутствии."
     )
-    assert tree_json in prompt
-    assert index_json in prompt
+    assert folders in prompt
+    assert "(JSON)" not in prompt
     assert file_info["name"] in prompt
     assert file_info["extension"] in prompt
     assert str(file_info["size"]) in prompt
@@ -63,8 +62,7 @@ def test_prompt_includes_context(monkeypatch):
     assert "contracts" in prompt
     assert instruction_part1 in prompt
     assert instruction_part2 in prompt
-    assert tree_json in result["prompt"]
-    assert index_json in result["prompt"]
+    assert folders in result["prompt"]
     assert result["metadata"].needs_new_folder is True
 
 
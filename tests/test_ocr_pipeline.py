@@ -1,3 +1,5 @@
+from pathlib import Path
+
 import pytest
 
 np = pytest.importorskip("numpy")
@@ -38,3 +40,339 @@ def test_run_ocr_unreadable_image(tmp_path):
     file_path.write_text("not an image")
     with pytest.raises(ValueError):
         run_ocr(file_path)
+
+
+def _text_image(skew=0):
+    from PIL import Image, ImageDraw
+
+    image = Image.new("L", (400, 200), color=255)
+    draw = ImageDraw.Draw(image)
+    for row in range(4):
+        draw.rectangle((20, 30 + row * 40, 380, 45 + row * 40), fill=0)
+    return image.rotate(skew, fillcolor=255) if skew else image
+
+
+def test_plan_stages_clean_image_only_binarizes():
+    import ocr_pipeline
+
+    array = np.asarray(_text_image())
+    assert ocr_pipeline.plan_stages(array) == ["binarize"]
+    assert ocr_pipeline.plan_stages(array, source_dpi=96)[0] == "resize"
+
+
+def test_plan_stages_detects_skew_and_low_contrast():
+    import ocr_pipeline
+
+    array = np.asarray(_text_image(skew=5))
+    assert "deskew" in ocr_pipeline.plan_stages(array)
+    flat = (np.asarray(_text_image()) // 4 + 150).astype(np.uint8)
+    assert "contrast" in ocr_pipeline.plan_stages(flat)
+
+
+def test_tiered_ocr_skips_preprocessing_when_confident(monkeypatch):
+    import ocr_pipeline
+    from file_utils.image_ocr import OcrResult
+
+    calls = []
+
+    def fake_result(image, language="eng", psm=3, detect=None, words=False):
+        calls.append(detect)
+        return OcrResult("clean", 91.0, "rus+eng")
+
+    monkeypatch.setattr(ocr_pipeline, "ocr_image_result", fake_result)
+    monkeypatch.setattr(
+        ocr_pipeline, "preprocess", lambda *a, **k: pytest.fail("must not preprocess")
+    )
+    result = ocr_pipeline.ocr_tiered(_text_image(), "rus", min_confidence=60)
+    assert (result.text, result.tier, result.stages) == ("clean", "raw", ())
+    assert calls == [None]
+
+
+def test_tiered_ocr_escalates_on_low_confidence(monkeypatch):
+    import ocr_pipeline
+    from file_utils.image_ocr import OcrResult
+
+    calls = []
+
+    def fake_result(image, language="eng", psm=3, detect=None, words=False):
+        calls.append((language, detect, image.mode))
+        if len(calls) == 1:
+            return OcrResult("n0isy", 35.0, "rus+eng")
+        return OcrResult("noisy", 80.0, language)
+
+    monkeypatch.setattr(ocr_pipeline, "ocr_image_result", fake_result)
+    result = ocr_pipeline.ocr_tiered(_text_image(skew=5), "rus", min_confidence=60)
+    assert result.text == "noisy" and result.confidence == 80.0
+    assert result.tier == "preprocessed"
+    assert result.stages[-1] == "binarize" and "deskew" in result.stages
+    assert calls == [("rus", None, "L"), ("rus+eng", False, "L")]
+
+
+def test_tiered_ocr_keeps_raw_result_when_preprocessing_is_worse(monkeypatch):
+    import ocr_pipeline
+    from file_utils.image_ocr import OcrResult
+
+    results = iter([OcrResult("raw text", 50.0, "rus+eng"), OcrResult("w0rse", 30.0, "rus+eng")])
+    monkeypatch.setattr(ocr_pipeline, "ocr_image_result", lambda *a, **k: next(results))
+    result = ocr_pipeline.ocr_tiered(_text_image(skew=5), "rus", min_confidence=60)
+    assert (result.text, result.tier, result.stages) == ("raw text", "raw", ())
+
+
+def test_page_dpi_uses_plausible_stored_value():
+    from ocr_pipeline import page_dpi
+
+    page = np.zeros((3508, 2480), dtype=np.uint8)
+    assert page_dpi(page, 300) == 300
+    # 72 dpi on an A4 scan would mean a 48-inch page: estimate instead
+    assert page_dpi(page, 72) == pytest.approx(300, rel=0.01)
+    assert page_dpi(page) == pytest.approx(300, rel=0.01)
+
+
+def test_read_dpi_from_file(tmp_path):
+    from ocr_pipeline import read_dpi
+
+    path = tmp_path / "scan.png"
+    _text_image().save(path, dpi=(200, 200))
+    assert read_dpi(path) == 200
+    _text_image().save(path)
+    assert read_dpi(path) is None
+
+
+def test_run_ocr_keeps_resolution_of_300_dpi_scan(tmp_path, monkeypatch):
+    import ocr_pipeline
+
+    path = tmp_path / "scan.png"
+    _text_image().save(path, dpi=(300, 300))
+    seen = []
+    monkeypatch.setattr(
+        ocr_pipeline, "ocr_image", lambda image, language: seen.append(image.size) or "ok"
+    )
+    assert run_ocr(path) == "ok"
+    # Only margins are cropped, the page is not upscaled
+    assert seen == [(360, 180)]
+
+
+def test_skew_angle_estimated_on_downsampled_copy():
+    from ocr_pipeline import skew_angle
+
+    small = np.asarray(_text_image(skew=4))
+    large = _upscale(small, 8)
+    assert abs(skew_angle(small)) == pytest.approx(4, abs=1)
+    assert abs(skew_angle(large, max_side=400)) == pytest.approx(4, abs=1)
+
+
+def _upscale(image, factor):
+    import cv2
+
+    h, w = image.shape[:2]
+    return cv2.resize(image, (w * factor, h * factor), interpolation=cv2.INTER_NEAREST)
+
+
+def test_preprocessor_reuses_buffers_between_pages():
+    from ocr_pipeline import FULL_PIPELINE, Preprocessor
+
+    page = np.asarray(_text_image(skew=3))
+    preprocessor = Preprocessor()
+    first = preprocessor.run(page, FULL_PIPELINE, source_dpi=300).copy()
+    assert first.ndim == 2 and set(np.unique(first)) <= {0, 255}
+    # The cropped binarized page fits into the buffer of the full page
+    assert preprocessor.allocations == 2
+    second = preprocessor.run(page, FULL_PIPELINE, source_dpi=300)
+    assert preprocessor.allocations == 2
+    assert np.array_equal(first, second)
+
+
+def _fake_run_ocr(calls):
+    import threading
+    import time
+
+    def fake(path, preprocessor=None, **kwargs):
+        calls.append((path.name, threading.get_ident(), id(preprocessor), kwargs))
+        if path.name.startswith("bad"):
+            raise ValueError(f"Unable to load image: {path}")
+        time.sleep(0.01 * (int(path.stem[-1]) % 3))
+        return f"text {path.stem}"
+
+    return fake
+
+
+def _image_dir(tmp_path, names):
+    for name in names:
+        (tmp_path / name).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / name).write_bytes(b"")
+    return tmp_path
+
+
+def test_run_ocr_batch_keeps_order_and_reports_errors(tmp_path, monkeypatch):
+    import ocr_pipeline
+
+    calls = []
+    monkeypatch.setattr(ocr_pipeline, "run_ocr", _fake_run_ocr(calls))
+    folder = _image_dir(tmp_path, [f"scan{i}.png" for i in range(8)] + ["sub/bad1.jpg", "notes.txt"])
+
+    stats = ocr_pipeline.BatchStats()
+    items = list(
+        ocr_pipeline.run_ocr_batch(ocr_pipeline.iter_images(folder), jobs=3, stats=stats, lang="eng")
+    )
+
+    assert [item.path.name for item in items] == [f"scan{i}.png" for i in range(8)] + ["bad1.jpg"]
+    assert items[0].text == "text scan0" and items[0].error is None
+    assert items[-1].text == "" and "Unable to load image" in items[-1].error
+    assert all(kwargs == {"lang": "eng"} for *_, kwargs in calls)
+    # Each thread reuses one Preprocessor
+    per_thread = {}
+    for _, thread, preprocessor, _ in calls:
+        per_thread.setdefault(thread, set()).add(preprocessor)
+    assert len(per_thread) <= 3 and all(len(ids) == 1 for ids in per_thread.values())
+    assert (stats.done, stats.failed) == (9, 1)
+    assert stats.percentile(50) <= stats.percentile(95)
+    assert "pages/s" in stats.describe()
+
+
+def test_batch_stats_percentiles():
+    from ocr_pipeline import BatchItem, BatchStats
+
+    stats = BatchStats(elapsed=10.0)
+    for seconds in range(1, 21):
+        stats.add(BatchItem(Path(f"{seconds}.png"), seconds=float(seconds)))
+    assert stats.percentile(50) == 10.0
+    assert stats.percentile(95) == 19.0
+    assert stats.pages_per_second == 2.0
+
+
+def test_cli_input_dir_writes_text_files_and_jsonl(tmp_path, monkeypatch, capsys):
+    import json
+
+    import ocr_pipeline
+
+    monkeypatch.setattr(ocr_pipeline, "run_ocr", _fake_run_ocr([]))
+    folder = _image_dir(tmp_path / "in", ["a1.png", "b2.tiff", "bad3.png"])
+
+    ocr_pipeline.main(["--input-dir", str(folder), "--jobs", "2"])
+    assert (folder / "a1.png.txt").read_text(encoding="utf-8") == "text a1"
+    assert (folder / "b2.tiff.txt").read_text(encoding="utf-8") == "text b2"
+    assert not (folder / "bad3.png.txt").exists()
+    assert "3 images (1 failed)" in capsys.readouterr().err
+
+    out = tmp_path / "result.jsonl"
+    ocr_pipeline.main(["--input-dir", str(folder), "--output", str(out)])
+    records = [json.loads(line) for line in out.read_text(encoding="utf-8").splitlines()]
+    assert [Path(r["path"]).name for r in records] == ["a1.png", "b2.tiff", "bad3.png"]
+    assert records[0]["text"] == "text a1" and "error" in records[2]
+
+
+def test_cli_text_files_do_not_collide(tmp_path, monkeypatch, capsys):
+    import ocr_pipeline
+
+    def fake(path, preprocessor=None, **kwargs):
+        return f"text {path.relative_to(folder)}"
+
+    monkeypatch.setattr(ocr_pipeline, "run_ocr", fake)
+    folder = _image_dir(tmp_path / "in", ["a.png", "a.tiff", "x/a.png"])
+    out = tmp_path / "out"
+
+    ocr_pipeline.main(["--input-dir", str(folder), "--output-dir", str(out)])
+    written = sorted(str(p.relative_to(out)) for p in out.rglob("*.txt"))
+    assert written == ["a.png.txt", "a.tiff.txt", str(Path("x") / "a.png.txt")]
+    assert (out / "x" / "a.png.txt").read_text(encoding="utf-8") == f"text {Path('x') / 'a.png'}"
+    assert (out / "a.tiff.txt").read_text(encoding="utf-8") == "text a.tiff"
+
+
+def test_parse_pages():
+    from ocr_pipeline import parse_pages
+
+    assert parse_pages(None, 3) == [1, 2, 3]
+    assert parse_pages("1-3, 5,8-", 9) == [1, 2, 3, 5, 8, 9]
+    assert parse_pages([2, 2, 1], 4) == [1, 2]
+    for bad in ("0", "3-1", "x", "10", ""):
+        with pytest.raises(ValueError):
+            parse_pages(bad, 9)
+
+
+@pytest.fixture
+def page_cache(tmp_path, monkeypatch):
+    import ocr_pipeline
+    from file_utils.cache import ExtractionCache
+
+    cache = ExtractionCache(tmp_path / "cache.sqlite", max_bytes=1 << 20)
+    monkeypatch.setattr(ocr_pipeline, "get_extraction_cache", lambda: cache)
+    monkeypatch.setattr(ocr_pipeline.config, "ocr_min_confidence", None)
+    yield cache
+    cache.close()
+
+
+def _counting_ocr(monkeypatch, calls):
+    import ocr_pipeline
+
+    def fake_ocr(image, language="eng", psm=3):
+        calls.append((image.size, language, psm))
+        return f"{language}/{psm}/{image.size[0]}"
+
+    monkeypatch.setattr(ocr_pipeline, "ocr_image", fake_ocr)
+
+
+def test_extract_text_multipage_tiff_reuses_cached_pages(tmp_path, monkeypatch, page_cache):
+    from PIL import Image
+
+    import ocr_pipeline
+
+    path = tmp_path / "scan.tiff"
+    frames = [Image.new("L", (100 + i, 50), color=255) for i in range(4)]
+    frames[0].save(path, save_all=True, append_images=frames[1:])
+    calls = []
+    _counting_ocr(monkeypatch, calls)
+
+    assert ocr_pipeline.extract_text(path, "rus", psm=6, pages="2-3") == "rus/6/101\nrus/6/102"
+    assert len(calls) == 2
+
+    text = ocr_pipeline.extract_text(path, "rus", psm=6)
+    assert text.splitlines() == [f"rus/6/{100 + i}" for i in range(4)]
+    assert [size[0] for size, *_ in calls[2:]] == [100, 103]
+
+    ocr_pipeline.extract_text(path, "rus", psm=4, pages=[1])
+    assert calls[-1] == ((100, 50), "rus", 4)
+
+
+def test_extract_text_stretches_fax_frames(tmp_path, monkeypatch, page_cache):
+    from PIL import Image
+
+    import ocr_pipeline
+
+    path = tmp_path / "fax.tiff"
+    Image.new("L", (204, 98), color=255).save(path, dpi=(204, 98))
+    calls = []
+    _counting_ocr(monkeypatch, calls)
+
+    ocr_pipeline.extract_text(path, "rus")
+    assert calls == [((204, 204), "rus", 3)]
+
+
+def test_extract_text_pdf_keeps_text_layer(tmp_path, monkeypatch, page_cache):
+    fitz = pytest.importorskip("fitz")
+    from PIL import Image
+
+    import ocr_pipeline
+
+    img_path = tmp_path / "scan.png"
+    Image.linear_gradient("L").resize((40, 20)).save(img_path)
+    doc = fitz.open()
+    doc.new_page(width=200, height=100).insert_text((20, 50), "text page")
+    doc.new_page(width=200, height=100).insert_image(fitz.Rect(0, 0, 200, 100), filename=str(img_path))
+    path = tmp_path / "mixed.pdf"
+    doc.save(path)
+    doc.close()
+    calls = []
+    _counting_ocr(monkeypatch, calls)
+
+    text = ocr_pipeline.extract_text(path, "eng", dpi=72)
+    assert text.splitlines() == ["text page", "eng/3/200"]
+    assert len(calls) == 1
+
+
+def test_extract_text_rejects_unknown_type(tmp_path):
+    import ocr_pipeline
+
+    path = tmp_path / "notes.docx"
+    path.write_bytes(b"PK")
+    with pytest.raises(ValueError):
+        ocr_pipeline.extract_text(path)
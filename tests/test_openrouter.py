@@ -68,3 +68,64 @@ def test_chat_exhausts_retries(monkeypatch):
         )
     assert "3 attempts" in str(exc.value)
     assert client.calls == 3
+
+
+def _reply(request):
+    data = {"choices": [{"message": {"content": "ok"}}], "usage": {"total_tokens": 3}}
+    return httpx.Response(200, json=data)
+
+
+def test_shared_client_is_reused(monkeypatch):
+    paths = []
+
+    def handler(request):
+        paths.append(request.url.path)
+        return _reply(request)
+
+    def no_new_client(**kwargs):
+        raise AssertionError("a new client must not be created")
+
+    async def run():
+        client = openrouter.create_client(transport=httpx.MockTransport(handler))
+        monkeypatch.setattr(openrouter, "create_client", no_new_client)
+        async with openrouter.client_session(client) as session:
+            assert session is client
+            assert openrouter.get_client() is client
+            for _ in range(3):
+                reply, tokens, _ = await openrouter.chat(
+                    [{"role": "user", "content": "hi"}],
+                    api_key="key",
+                    base_url="http://stand-in/api/v1",
+                )
+                assert (reply, tokens) == ("ok", 3)
+        assert openrouter.get_client() is None
+        assert not client.is_closed
+        await client.aclose()
+
+    asyncio.run(run())
+    assert paths == ["/api/v1/chat/completions"] * 3
+
+
+def test_client_session_owns_and_closes_its_client():
+    async def run():
+        async with openrouter.client_session() as client:
+            async with openrouter.client_session() as inner:
+                assert inner is client
+            assert openrouter.get_client() is client
+        return client
+
+    client = asyncio.run(run())
+    assert client.is_closed
+    assert openrouter.get_client() is None
+
+
+def test_create_client_uses_config(monkeypatch):
+    monkeypatch.setattr(openrouter.config, "openrouter_http2", False)
+    monkeypatch.setattr(openrouter.config, "openrouter_connect_timeout", 2.0)
+    monkeypatch.setattr(openrouter.config, "openrouter_read_timeout", 5.0)
+    client = openrouter.create_client()
+    try:
+        assert client.timeout.connect == 2.0
+        assert client.timeout.read == 5.0
+    finally:
+        asyncio.run(client.aclose())
@@ -0,0 +1,91 @@
+import pytest
+from PIL import Image
+
+fitz = pytest.importorskip("fitz")
+
+import file_utils
+
+
+def _make_pdf(path, pages):
+    """Создать PDF: строка — текстовая страница, ``None`` — страница-картинка."""
+    doc = fitz.open()
+    for idx, content in enumerate(pages):
+        page = doc.new_page(width=200, height=100)
+        if content is None:
+            img = Image.linear_gradient("L").resize((40 + idx, 20)).convert("RGB")
+            img_path = path.parent / f"img{idx}.png"
+            img.save(img_path)
+            page.insert_image(fitz.Rect(0, 0, 200, 100), filename=str(img_path))
+        else:
+            page.insert_text((20, 50), content)
+    doc.save(path)
+    doc.close()
+    return path
+
+
+def test_scanned_pages_ocr_in_memory_in_order(tmp_path, monkeypatch):
+    pdf = _make_pdf(tmp_path / "mixed.pdf", [None, "text page", None, None])
+    seen = []
+
+    def fake_ocr(image, language="eng"):
+        seen.append((image.mode, image.size))
+        return f"ocr {image.size[0]}"
+
+    def no_tempfile(*args, **kwargs):
+        raise AssertionError("temp files must not be used")
+
+    monkeypatch.setattr(file_utils, "ocr_image", fake_ocr)
+    monkeypatch.setattr(file_utils.tempfile, "NamedTemporaryFile", no_tempfile)
+    monkeypatch.setattr(file_utils.config, "ocr_workers", 3)
+
+    text = file_utils.extract_text_pdf(pdf, dpi=144)
+
+    lines = [line for line in text.splitlines() if line]
+    assert lines == ["ocr 400", "text page", "ocr 400", "ocr 400"]
+    assert len(seen) == 3
+    assert all(mode == "L" and size == (400, 200) for mode, size in seen)
+
+
+def test_pdf_ocr_errors_propagate(tmp_path, monkeypatch):
+    pdf = _make_pdf(tmp_path / "scan.pdf", [None])
+
+    def failing_ocr(image, language="eng"):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(file_utils, "ocr_image", failing_ocr)
+    with pytest.raises(RuntimeError):
+        file_utils.extract_text_pdf(pdf)
+
+
+def test_blank_pages_skipped_and_reported(tmp_path, monkeypatch):
+    pdf = _make_pdf(tmp_path / "mixed.pdf", ["cover", None, "text page", None])
+    doc = fitz.open(pdf)
+    doc.insert_page(1, width=200, height=100)  # пустой разделитель
+    blank_scan = tmp_path / "white.png"
+    Image.new("RGB", (40, 20), color="white").save(blank_scan)
+    page = doc.new_page(width=200, height=100)
+    page.insert_image(page.rect, filename=str(blank_scan))
+    doc.saveIncr()
+    doc.close()
+    calls = []
+
+    def fake_ocr(image, language="eng"):
+        calls.append(image.size)
+        return "scanned"
+
+    monkeypatch.setattr(file_utils, "ocr_image", fake_ocr)
+    monkeypatch.setattr(file_utils, "get_extraction_cache", lambda: None)
+
+    result = file_utils.extract_document(pdf)
+
+    assert result.text.split("\n") == ["cover", "", "scanned", "text page", "", "scanned"]
+    assert len(calls) == 2
+    assert [(p.number, p.kind) for p in result.pages] == [
+        (1, "text"),
+        (2, "blank"),
+        (3, "image"),
+        (4, "text"),
+        (5, "image"),
+        (6, "blank"),
+    ]
+    assert result.pages[2].chars == len("scanned")
@@ -0,0 +1,95 @@
+import pytest
+from PIL import Image
+
+from file_utils import PdfImageWriter, merge_images_to_pdf
+
+
+def _jpeg(path, size, color, **kwargs):
+    Image.new("RGB", size, color=color).save(path, format="JPEG", **kwargs)
+    return path
+
+
+def test_jpeg_is_embedded_without_recompression(tmp_path):
+    photo = _jpeg(tmp_path / "photo.jpg", (64, 48), "red", quality=60)
+    scan = tmp_path / "scan.png"
+    Image.new("RGBA", (30, 40), color=(0, 255, 0, 128)).save(scan)
+
+    pdf = merge_images_to_pdf([photo, scan])
+    try:
+        data = pdf.read_bytes()
+        assert photo.read_bytes() in data
+        assert data.count(b"/Type /Page ") == 2
+        assert b"/MediaBox [0 0 64 48]" in data
+        assert b"/MediaBox [0 0 30 40]" in data
+        assert data.rstrip().endswith(b"%%EOF")
+    finally:
+        pdf.unlink()
+
+
+def test_native_size_follows_dpi(tmp_path):
+    scan = _jpeg(tmp_path / "scan.jpg", (300, 600), "white", dpi=(150, 150))
+    with PdfImageWriter(tmp_path / "out.pdf") as writer:
+        writer.add_image(scan)
+    assert b"/MediaBox [0 0 144 288]" in (tmp_path / "out.pdf").read_bytes()
+
+
+def test_multipage_tiff_frames_become_pages(tmp_path):
+    fax = tmp_path / "fax.tiff"
+    first = Image.new("1", (408, 196), 1)
+    first.save(fax, save_all=True, append_images=[Image.new("1", (408, 196), 0)], dpi=(204, 98))
+    with PdfImageWriter(tmp_path / "out.pdf") as writer:
+        writer.add_image(fax)
+    data = (tmp_path / "out.pdf").read_bytes()
+    assert writer.pages == 2
+    assert data.count(b"/MediaBox [0 0 144 144]") == 2
+    assert data.count(b"/BitsPerComponent 1") == 2
+
+
+def test_fit_to_page_size(tmp_path):
+    fitz = pytest.importorskip("fitz")
+    wide = _jpeg(tmp_path / "wide.jpg", (400, 100), "blue")
+    tall = _jpeg(tmp_path / "tall.jpg", (100, 400), "blue")
+
+    pdf = merge_images_to_pdf([wide, tall], page_size="a4")
+    try:
+        with fitz.open(pdf) as doc:
+            assert doc.page_count == 2
+            for page in doc:
+                assert page.rect.width == pytest.approx(595.28, abs=0.01)
+                assert page.rect.height == pytest.approx(841.89, abs=0.01)
+            [info] = doc[0].get_image_info()
+            x0, y0, x1, y1 = info["bbox"]
+            assert x1 - x0 == pytest.approx(595.28, abs=0.1)
+            assert y1 - y0 == pytest.approx(148.82, abs=0.1)
+    finally:
+        pdf.unlink()
+
+
+def test_exif_orientation_is_applied(tmp_path):
+    fitz = pytest.importorskip("fitz")
+    image = Image.new("RGB", (80, 40), color="blue")
+    image.paste((255, 0, 0), (0, 0, 40, 40))
+    exif = Image.Exif()
+    exif[0x0112] = 6  # повернуть на 90° по часовой стрелке
+    path = tmp_path / "rotated.jpg"
+    image.save(path, format="JPEG", exif=exif, quality=95)
+
+    pdf = merge_images_to_pdf([path])
+    try:
+        with fitz.open(pdf) as doc:
+            page = doc[0]
+            assert (page.rect.width, page.rect.height) == (40, 80)
+            pix = page.get_pixmap()
+            top = pix.pixel(20, 10)
+            bottom = pix.pixel(20, 70)
+        assert top[0] > 200 and top[2] < 60
+        assert bottom[2] > 200 and bottom[0] < 60
+    finally:
+        pdf.unlink()
+
+
+def test_unknown_page_size_and_empty_input(tmp_path):
+    with pytest.raises(ValueError):
+        merge_images_to_pdf([])
+    with pytest.raises(ValueError):
+        PdfImageWriter(tmp_path / "out.pdf", page_size="b7")
@@ -57,3 +57,44 @@ def test_rerun_ocr_updates_text_and_status(tmp_path, monkeypatch):
         data = file_resp.json()
         assert data["metadata"]["extracted_text"] == "new text"
         assert data["status"] == "draft"
+
+
+def test_rerun_ocr_pages_preview_keeps_metadata(tmp_path, monkeypatch):
+    asyncio.run(server.database.run_db(server.database.init_db))
+    server.config.output_dir = str(tmp_path / "archive")
+    upload_dir = tmp_path / "uploads"
+    upload_dir.mkdir()
+    monkeypatch.setattr(upload, "UPLOAD_DIR", upload_dir)
+    monkeypatch.setattr(upload, "OCR_AVAILABLE", True)
+
+    monkeypatch.setattr(server, "extract_text", lambda path, language="eng": "old text")
+    monkeypatch.setattr(server.metadata_generation, "generate_metadata", _mock_generate_metadata)
+
+    calls = []
+
+    def fake_extract(path, language, psm, pages=None):
+        calls.append((language, psm, pages))
+        if pages == "9":
+            raise ValueError("Pages must be between 1 and 1")
+        return "page text"
+
+    with TestClient(app) as client:
+        resp = client.post("/upload", files={"file": ("test.pdf", b"data")})
+        file_id = resp.json()["id"]
+
+        monkeypatch.setattr(files, "ocr_pipeline", SimpleNamespace(extract_text=fake_extract))
+        rerun_resp = client.post(
+            f"/files/{file_id}/rerun_ocr",
+            json={"language": "rus", "psm": 6, "pages": "1"},
+        )
+        assert rerun_resp.status_code == 200
+        assert rerun_resp.json() == {"extracted_text": "page text", "pages": "1"}
+        assert calls == [("rus", 6, "1")]
+
+        bad_resp = client.post(
+            f"/files/{file_id}/rerun_ocr", json={"language": "rus", "pages": "9"}
+        )
+        assert bad_resp.status_code == 400
+
+        data = client.get(f"/files/{file_id}").json()
+        assert data["metadata"]["extracted_text"] == "old text"
@@ -0,0 +1,90 @@
+import json
+import shutil
+
+import pytest
+from PIL import Image, ImageDraw
+
+fitz = pytest.importorskip("fitz")
+
+import file_utils.searchable as searchable  # noqa: E402
+from file_sorter import add_archive_text_layer, place_file  # noqa: E402
+from file_utils import merge_images_to_pdf  # noqa: E402
+
+
+def _scan_pdf(tmp_path):
+    image = Image.new("RGB", (200, 100), "white")
+    ImageDraw.Draw(image).rectangle((20, 40, 180, 60), fill="black")
+    path = tmp_path / "scan.png"
+    image.save(path)
+    pdf = merge_images_to_pdf([path])
+    dest = tmp_path / "scan.pdf"
+    shutil.move(pdf, dest)
+    return dest
+
+
+@pytest.fixture
+def fake_layer(monkeypatch):
+    calls = []
+
+    def _layer(image, language, psm):
+        calls.append((image.size, language, psm))
+        with fitz.open() as doc:
+            page = doc.new_page(width=image.width, height=image.height)
+            page.insert_text((10, 30), "hidden words", render_mode=3)
+            return doc.tobytes(), 0
+
+    monkeypatch.setattr(searchable, "_text_layer", _layer)
+    return calls
+
+
+def test_text_layer_is_added_once(tmp_path, fake_layer):
+    pdf = _scan_pdf(tmp_path)
+    with fitz.open(pdf) as doc:
+        doc.new_page(width=200, height=100).insert_text((10, 30), "typed page")
+        doc.save(doc.name, incremental=True, encryption=fitz.PDF_ENCRYPT_KEEP)
+
+    assert searchable.add_text_layer(pdf, language="rus", dpi=72) == 1
+    assert fake_layer == [((200, 100), "rus", 3)]
+    with fitz.open(pdf) as doc:
+        assert doc.page_count == 2
+        assert "hidden words" in doc[0].get_text()
+        assert doc[1].get_text().strip() == "typed page"
+        assert doc[0].get_images()
+
+    assert searchable.add_text_layer(pdf, dpi=72) == 0
+    assert len(fake_layer) == 1
+
+
+def test_cached_words_skip_ocr(tmp_path, fake_layer, monkeypatch):
+    pdf = _scan_pdf(tmp_path)
+    layer = {1: {"rotate": 0, "words": [[0.1, 0.4, 0.5, 0.6, "Привет"], [0.55, 0.4, 0.9, 0.6, "мир"]]}}
+    monkeypatch.setattr(searchable, "load_text_layer", lambda path: layer)
+
+    assert searchable.add_text_layer(pdf, dpi=72) == 1
+    assert fake_layer == []
+    with fitz.open(pdf) as doc:
+        assert doc[0].get_text().split() == ["Привет", "мир"]
+        x0, y0, x1, y1 = doc[0].get_text("words")[0][:4]
+        assert 15 <= x0 < x1 <= 105 and 35 <= y0 < y1 <= 65
+
+
+def test_archive_text_layer_updates_metadata(tmp_path, fake_layer):
+    pdf = _scan_pdf(tmp_path)
+    metadata = {"date": "2024-01-02", "suggested_name": "Скан", "language": "ru"}
+
+    dest, missing, _ = place_file(
+        pdf, metadata, tmp_path / "Archive", needs_new_folder=True,
+        confirm_callback=lambda _: True,
+    )
+    assert not missing
+    assert fake_layer == []
+
+    assert add_archive_text_layer(dest, metadata, searchable=True) == 1
+    assert metadata["text_layer_pages"] == 1
+    assert fake_layer[0][1] == "rus"
+    with fitz.open(dest) as doc:
+        assert "hidden words" in doc[0].get_text()
+    sidecar = json.loads(dest.with_suffix(".pdf.json").read_text(encoding="utf-8"))
+    assert sidecar["text_layer_pages"] == 1
+
+    assert add_archive_text_layer(dest, metadata, searchable=False) == 0
@@ -0,0 +1,78 @@
+import pytest
+
+import file_utils
+from file_utils import ExtractionBudget, extract_document, extract_text
+from file_utils.spreadsheet import sample_sheet
+
+
+@pytest.fixture(autouse=True)
+def no_cache(monkeypatch):
+    monkeypatch.setattr(file_utils, "get_extraction_cache", lambda: None)
+
+
+def _rows(count):
+    yield ("name", "amount", "note")
+    for i in range(count):
+        yield (f"row{i}", str(i * 10), "" if i % 2 else "x")
+
+
+def test_sample_sheet_keeps_head_tail_and_middle():
+    lines, summary = sample_sheet("Sheet1", _rows(1000), 3)
+    assert summary.rows == 1000 and summary.columns == 3
+    assert summary.numeric_columns == ["amount"]
+    assert summary.sampled
+    assert lines[0] == summary.describe()
+    assert lines[1] == "name,amount,note"
+    assert lines[2:5] == ["row0,0,x", "row1,10,", "row2,20,x"]
+    assert lines[-3:] == ["row997,9970,", "row998,9980,x", "row999,9990,"]
+    middle = lines[6:9]
+    assert len(middle) == 3
+    numbers = [int(line.split(",")[0][3:]) for line in middle]
+    assert numbers == sorted(numbers) and all(3 <= n < 997 for n in numbers)
+    assert lines[5] == "… пропущено строк: 991, случайная выборка:"
+
+
+def test_small_sheet_is_returned_whole():
+    lines, summary = sample_sheet("Sheet1", _rows(8), 3)
+    assert not summary.sampled
+    assert lines == ["name,amount,note"] + [
+        f"row{i},{i * 10},{'' if i % 2 else 'x'}" for i in range(8)
+    ]
+
+
+def test_csv_budget_samples_rows(tmp_path):
+    path = tmp_path / "export.csv"
+    path.write_text(
+        "id,price\n" + "\n".join(f"{i},{i}.5" for i in range(500)), encoding="utf-8"
+    )
+    result = extract_document(path, budget=ExtractionBudget(sample_rows=2))
+    assert not result.complete
+    [sheet] = result.sheets
+    assert (sheet.name, sheet.rows, sheet.columns) == ("export.csv", 500, 2)
+    assert sheet.numeric_columns == ["id", "price"]
+    assert "0,0.5" in result.text and "499,499.5" in result.text
+    assert len(result.text.splitlines()) == 10
+
+    assert extract_text(path).count("\n") == 500
+
+
+def test_xlsx_budget_reports_every_sheet(tmp_path):
+    openpyxl = pytest.importorskip("openpyxl")
+    wb = openpyxl.Workbook()
+    wb.active.title = "Small"
+    wb.active.append(["a", "b"])
+    wb.active.append(["x", 1])
+    big = wb.create_sheet("Big")
+    big.append(["date", "sum"])
+    for i in range(100):
+        big.append([f"2024-01-{i % 28 + 1:02d}", i])
+    path = tmp_path / "book.xlsx"
+    wb.save(path)
+
+    result = extract_document(path, budget=ExtractionBudget(sample_rows=5))
+    assert [(s.name, s.rows, s.sampled) for s in result.sheets] == [
+        ("Small", 1, False),
+        ("Big", 100, True),
+    ]
+    assert result.sheets[1].numeric_columns == ["sum"]
+    assert result.text.startswith("a,b\nx,1\n[Лист «Big»")
@@ -0,0 +1,167 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from PIL import Image, ImageDraw
+
+from file_utils import image_ocr, tesseract_engine
+from file_utils.tesseract_engine import EnginePool, TesseractEngineError
+
+
+class FakeEngine:
+    created = []
+
+    def __init__(self, language, psm=3):
+        if language == "xyz":
+            raise TesseractEngineError("Failed loading language 'xyz'")
+        self.language = language
+        self.psm = psm
+        self.calls = 0
+        self.closed = False
+        FakeEngine.created.append(self)
+
+    def recognize(self, image, dpi=None):
+        self.calls += 1
+        return f"{self.language}:{image.size[0]}"
+
+    def detect_orientation_script(self, image):
+        self.calls += 1
+        return 90, 6.0, "Cyrillic", 2.5
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def fake_pool(monkeypatch):
+    FakeEngine.created = []
+    pool = EnginePool()
+    monkeypatch.setattr(tesseract_engine, "TesseractEngine", FakeEngine)
+    monkeypatch.setattr(tesseract_engine, "_pool", pool)
+    monkeypatch.setattr(image_ocr, "engine_available", lambda: True)
+    monkeypatch.setattr(image_ocr, "installed_languages", lambda: frozenset({"eng", "rus"}))
+    monkeypatch.setattr(image_ocr.config, "ocr_detect_layout", False)
+    yield pool
+    pool.close()
+
+
+def test_engine_reused_across_calls(fake_pool):
+    image = Image.new("L", (30, 10), color=255)
+    for _ in range(5):
+        assert image_ocr.ocr_image(image, language="rus") == "rus:30"
+
+    assert len(FakeEngine.created) == 1
+    assert FakeEngine.created[0].calls == 5
+
+
+def test_engines_keyed_by_language_and_psm(fake_pool):
+    image = Image.new("L", (10, 10), color=255)
+    image_ocr.ocr_image(image, language="eng")
+    image_ocr.ocr_image(image, language="eng", psm=6)
+    image_ocr.ocr_image(image, language="rus+eng")
+    image_ocr.ocr_image(image, language="eng")
+
+    assert [(e.language, e.psm) for e in FakeEngine.created] == [
+        ("eng", 3),
+        ("eng", 6),
+        ("rus+eng", 3),
+    ]
+
+
+def test_parallel_threads_bounded_by_concurrency(fake_pool):
+    image = Image.new("L", (10, 10), color=255)
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        list(executor.map(lambda _: image_ocr.ocr_image(image), range(30)))
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        list(executor.map(lambda _: image_ocr.ocr_image(image), range(30)))
+
+    assert 1 <= len(FakeEngine.created) <= 3
+    assert sum(e.calls for e in FakeEngine.created) == 60
+
+
+def test_unknown_language_falls_back_to_eng(fake_pool):
+    image = Image.new("L", (12, 10), color=255)
+    assert image_ocr.ocr_image(image, language="xyz") == "eng:12"
+
+
+def test_layout_detected_once_before_recognition(fake_pool, monkeypatch):
+    monkeypatch.setattr(
+        image_ocr, "installed_languages", lambda: frozenset({"eng", "rus", "osd"})
+    )
+    image = Image.new("L", (40, 10), color=255)
+    assert image_ocr.ocr_image(image, language="eng", detect=True) == "rus+eng:10"
+
+    assert [(e.language, e.psm, e.calls) for e in FakeEngine.created] == [
+        ("osd", 0, 1),
+        ("rus+eng", 3, 1),
+    ]
+
+
+def test_layout_skipped_without_osd_data(fake_pool):
+    image = Image.new("L", (40, 10), color=255)
+    assert image_ocr.ocr_image(image, language="rus", detect=True) == "rus:40"
+    assert [e.language for e in FakeEngine.created] == ["rus"]
+
+
+def test_failed_engine_is_discarded(fake_pool):
+    with pytest.raises(ValueError):
+        with tesseract_engine.acquire_engine("eng") as engine:
+            raise ValueError("boom")
+    assert engine.closed
+    with tesseract_engine.acquire_engine("eng") as other:
+        assert other is not engine
+
+
+def test_cli_fallback_without_library(monkeypatch):
+    monkeypatch.setattr(image_ocr, "engine_available", lambda: False)
+    monkeypatch.setattr(image_ocr, "installed_languages", lambda: None)
+    monkeypatch.setattr(image_ocr.config, "ocr_detect_layout", False)
+    calls = []
+
+    def fake_image_to_string(image, lang, config=""):
+        calls.append((lang, config))
+        return "cli"
+
+    monkeypatch.setattr(image_ocr.pytesseract, "image_to_string", fake_image_to_string)
+    image = Image.new("L", (10, 10), color=255)
+    assert image_ocr.ocr_image(image, language="deu") == "cli"
+    assert image_ocr.ocr_image(image, language="deu", psm=6) == "cli"
+    assert calls == [("deu", ""), ("deu", "--psm 6")]
+
+
+@pytest.mark.skipif(
+    not tesseract_engine.engine_available(), reason="libtesseract not installed"
+)
+def test_real_engine_recognizes_text():
+    image = Image.new("L", (400, 120), color=255)
+    ImageDraw.Draw(image).text((20, 40), "HELLO 42", fill=0, font_size=48)
+    with tesseract_engine.acquire_engine("eng") as engine:
+        text = engine.recognize(image)
+        assert "HELLO" in text
+        assert 0 <= engine.mean_confidence() <= 100
+
+
+def test_text_and_confidence_from_cli_data():
+    data = {
+        "text": ["", "Hello", "world", "", "second", "para"],
+        "conf": ["-1", "90", "70", "-1", "80.5", "60"],
+        "block_num": [1, 1, 1, 1, 1, 2],
+        "par_num": [1, 1, 1, 1, 1, 1],
+        "line_num": [1, 1, 1, 2, 2, 1],
+    }
+    text, confidence = image_ocr._text_from_data(data)
+    assert text == "Hello world\nsecond\n\npara"
+    assert confidence == pytest.approx(75.125)
+
+
+def test_word_boxes_from_tsv():
+    tsv = (
+        "1\t1\t0\t0\t0\t0\t0\t0\t200\t100\t-1\t\n"
+        "5\t1\t1\t1\t1\t1\t20\t40\t60\t20\t91.5\tHello\n"
+        "5\t1\t1\t1\t1\t2\t100\t40\t80\t20\t88\tworld\n"
+    )
+    data = tesseract_engine._parse_tsv(tsv)
+    assert data["text"] == ["", "Hello", "world"]
+    assert image_ocr.words_from_data(data, (200, 100)) == (
+        (0.1, 0.4, 0.4, 0.6, "Hello"),
+        (0.5, 0.4, 0.9, 0.6, "world"),
+    )
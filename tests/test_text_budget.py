@@ -0,0 +1,108 @@
+import asyncio
+import random
+
+import file_utils
+from services import openrouter
+from utils.text_budget import GAP_MARKER, fit_text, normalize_text, split_text
+from utils.tokens import estimate_tokens
+
+
+def _contract(lines=400):
+    rnd = random.Random(1)
+    words = ["договор", "поставка", "товар", "стороны", "обязуются", "оплата"]
+    body = [" ".join(rnd.choice(words) for _ in range(12)) for _ in range(lines)]
+    body[lines // 2] = "Штраф 12 500,00 руб. по счёту № 4711 от 01.02.2024"
+    return "\n".join(body)
+
+
+def test_normalize_removes_ocr_noise():
+    text = (
+        "ООО Ромашка\nСтраница 1 из 3\nДоку-\nмент   важный\n\n\n\n"
+        "Санкт-\nПетербург\nООО Ромашка\nСтраница 2 из 3\nтекст\n"
+        "ООО Ромашка\nСтраница 3 из 3"
+    )
+    assert normalize_text(text) == (
+        "ООО Ромашка\nСтраница 1 из 3\nДокумент важный\n\nСанкт-\nПетербург\nтекст"
+    )
+
+
+def test_normalize_keeps_rows_that_differ_in_digits():
+    rows = [
+        "02.03.2024 Оплата 230.50",
+        "03.03.2024 Оплата 99.99",
+        "04.03.2024 Оплата 1200.00",
+        "05.03.2024 Оплата 15.00",
+    ]
+    text = "Выписка по счёту\n" + "\n".join(rows) + "\nИтого"
+    assert normalize_text(text) == text
+    assert fit_text(text, 1000) == text
+
+
+def test_short_text_is_returned_whole():
+    assert fit_text("Счёт  №1\r\nна оплату", 100) == "Счёт №1\nна оплату"
+
+
+def test_fit_text_keeps_head_tail_and_keyword_windows():
+    text = _contract()
+    result = fit_text(text, 600, keywords=["Какой штраф?"])
+    assert estimate_tokens(result) <= 600
+    assert result.startswith(text.splitlines()[0])
+    assert result.rstrip().endswith(text.splitlines()[-1])
+    assert "Штраф 12 500,00" in result
+    assert GAP_MARKER in result
+
+
+def test_split_text_keeps_everything():
+    text = _contract(200) + "\n" + "x" * 3000
+    chunks = split_text(text, 300)
+    assert all(estimate_tokens(chunk) <= 300 for chunk in chunks)
+    assert "".join(chunks).replace("\n", "") == text.replace("\n", "")
+
+
+def test_translate_text_sends_chunks_in_parallel(monkeypatch):
+    prompts = []
+
+    async def fake_chat(messages, **kwargs):
+        prompts.append(messages[0]["content"])
+        number = len(prompts)
+        await asyncio.sleep(0)
+        return f"part{number}", None, None
+
+    monkeypatch.setattr(openrouter, "chat", fake_chat)
+    monkeypatch.setattr(file_utils.config, "llm_translate_chunk_tokens", 500)
+
+    result = asyncio.run(file_utils.translate_text(_contract(), "en"))
+
+    assert len(prompts) > 1
+    assert all(estimate_tokens(p) <= 520 for p in prompts)
+    assert result.splitlines() == [f"part{i}" for i in range(1, len(prompts) + 1)]
+
+
+def test_translate_text_limits_concurrent_requests(monkeypatch):
+    active = []
+    peak = []
+
+    async def fake_chat(messages, **kwargs):
+        active.append(1)
+        peak.append(len(active))
+        await asyncio.sleep(0)
+        active.pop()
+        return "part", None, None
+
+    monkeypatch.setattr(openrouter, "chat", fake_chat)
+    monkeypatch.setattr(file_utils.config, "llm_translate_chunk_tokens", 500)
+    monkeypatch.setattr(file_utils.config, "openrouter_max_connections", 2)
+
+    asyncio.run(file_utils.translate_text(_contract(), "en"))
+
+    assert len(peak) > 2
+    assert max(peak) == 2
+
+
+def test_translate_text_skips_empty_text(monkeypatch):
+    async def fake_chat(messages, **kwargs):  # pragma: no cover - не должен вызываться
+        raise AssertionError("unexpected request")
+
+    monkeypatch.setattr(openrouter, "chat", fake_chat)
+
+    assert asyncio.run(file_utils.translate_text("  \n\t ", "en")) == ""
@@ -0,0 +1,74 @@
+from PIL import Image
+import pytest
+
+import file_utils
+from file_utils import ExtractionBudget, extract_document
+
+
+@pytest.fixture(autouse=True)
+def no_cache(monkeypatch):
+    monkeypatch.setattr(file_utils, "get_extraction_cache", lambda: None)
+    monkeypatch.setattr(file_utils.config, "ocr_min_confidence", None)
+
+
+@pytest.fixture
+def seen(monkeypatch):
+    calls = []
+
+    def fake_ocr(image, language="eng"):
+        calls.append((image.mode, image.size))
+        return f"ocr {image.size[0]}"
+
+    monkeypatch.setattr(file_utils, "ocr_image", fake_ocr)
+    monkeypatch.setattr(file_utils.config, "ocr_workers", 2)
+    return calls
+
+
+def _make_tiff(path, frames, **params):
+    """``None`` — пустой белый кадр, число — кадр-градиент такой ширины."""
+    images = [
+        Image.new("L", (50, 20), 255) if width is None
+        else Image.linear_gradient("L").resize((width, 20))
+        for width in frames
+    ]
+    images[0].save(path, save_all=True, append_images=images[1:], **params)
+    return path
+
+
+def test_every_frame_is_recognized_in_order(tmp_path, seen):
+    path = _make_tiff(tmp_path / "fax.tif", [40, 41, None, 43, 44])
+
+    result = extract_document(path)
+
+    assert result.text.splitlines() == ["ocr 40", "ocr 41", "ocr 43", "ocr 44"]
+    assert result.complete
+    assert [(p.number, p.kind) for p in result.pages] == [
+        (1, "image"), (2, "image"), (3, "blank"), (4, "image"), (5, "image")
+    ]
+    assert len(seen) == 4
+
+
+def test_max_pages_stops_before_remaining_frames(tmp_path, seen):
+    path = _make_tiff(tmp_path / "fax.tiff", [40, 41, 42, 43])
+
+    result = extract_document(path, budget=ExtractionBudget(max_pages=2))
+
+    assert result.text.splitlines() == ["ocr 40", "ocr 41"]
+    assert not result.complete
+    assert len(seen) == 2
+
+
+def test_fax_resolution_is_stretched_to_square_pixels(tmp_path, seen):
+    path = _make_tiff(tmp_path / "fax.tiff", [60], dpi=(204, 98))
+
+    file_utils.extract_text(path)
+
+    assert seen == [("L", (60, 42))]
+
+
+def test_tiff_from_memory(tmp_path, seen):
+    path = _make_tiff(tmp_path / "scan.tiff", [40, 41])
+
+    text = file_utils.extract_text(path.read_bytes())
+
+    assert text.splitlines() == ["ocr 40", "ocr 41"]
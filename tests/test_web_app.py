@@ -4,6 +4,7 @@ import sys
 import threading
 import time
 from pathlib import Path
+from types import SimpleNamespace
 import asyncio
 
 import uvicorn
@@ -333,7 +334,8 @@ def test_upload_images_download_and_metadata(tmp_path, monkeypatch):
 
     def _mock_extract_text(path, language="eng"):
         captured["language"] = language
-        return "page1\npage2"
+        captured.setdefault("ocr", []).append(Path(path).name)
+        return {"000_a.jpg": "page1", "001_b.jpg": "page2"}[Path(path).name]
 
     import file_utils, sys
     monkeypatch.setattr("web_app.server.merge_images_to_pdf", _mock_merge)
@@ -368,6 +370,8 @@ def test_upload_images_download_and_metadata(tmp_path, monkeypatch):
         assert data["filename"].endswith(".pdf")
         assert data["sources"] == ["a.jpg", "b.jpg"]
         assert data["metadata"]["extracted_text"] == "page1\npage2"
+        # Распознаются исходные снимки, а не собранный PDF
+        assert sorted(captured["ocr"]) == ["000_a.jpg", "001_b.jpg"]
 
         file_id = data["id"]
 
@@ -428,3 +432,24 @@ def test_details_endpoint_returns_full_record(tmp_path, monkeypatch):
         expected["review_comment"] = None
         expected["sources"] = None
     assert details_json == expected
+
+
+def test_extract_images_text_respects_page_budget(tmp_path, monkeypatch):
+    from web_app.routes import upload
+
+    calls = []
+
+    # Подменяется сам запуск в пуле: модуль server, который видит upload,
+    # может быть перезагружен другими тестами
+    async def _fake_run_extraction(func, path, budget=None, language="eng"):
+        calls.append((func.__name__, path.name))
+        return SimpleNamespace(text=f"text of {path.name}", complete=True)
+
+    monkeypatch.setattr(upload, "run_extraction", _fake_run_extraction)
+    monkeypatch.setattr(server.config, "extract_max_pages", 2)
+    paths = [tmp_path / f"{idx:03d}.jpg" for idx in range(3)]
+
+    text, complete = asyncio.run(upload.extract_images_text(paths, "eng"))
+    assert text == "text of 000.jpg\ntext of 001.jpg"
+    assert not complete
+    assert sorted(calls) == [("extract_document", "000.jpg"), ("extract_document", "001.jpg")]